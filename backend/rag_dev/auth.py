@@ -9,10 +9,12 @@ This module handles user authentication via Auth0, including:
 """
 
 import json
+import asyncio
+import hashlib
 import logging
-import requests
 import os
-from typing import Optional, List, Dict, Any
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Tuple
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, jwk, jwe
@@ -20,14 +22,21 @@ from jose.exceptions import JWTError, JWEError
 from jose.utils import base64url_decode
 import time
 
+import http_client
+
 # Configure logging
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger("auth")
 
 # Auth0 configuration
-AUTH0_DOMAIN = "ai-chef.uk.auth0.com"  # Auth0 tenant domain
+AUTH0_DOMAIN = os.environ.get("AUTH0_DOMAIN", "ai-chef.uk.auth0.com")  # Auth0 tenant domain
+# Where JWKS and userinfo are fetched from; overridable to point at a local stub
+AUTH0_BASE_URL = os.environ.get("AUTH0_BASE_URL", f"https://{AUTH0_DOMAIN}")
 API_AUDIENCE = "https://ai-chef-api"   # API identifier in Auth0
 ALGORITHMS = ["RS256", "HS256", "dir"]  # Supported JWT algorithms
+# Tokens verified locally against the JWKS must be RS256; accepting HS256 there
+# would let the public key be used as an HMAC secret
+JWKS_ALGORITHMS = ["RS256"]
 
 # Development mode flag - set to True to bypass authentication
 DEV_MODE = os.environ.get("AUTH_DEV_MODE", "true").lower() == "true"
@@ -37,6 +46,20 @@ if DEV_MODE:
 # Cache for JSON Web Key Set (JWKS)
 _jwks_cache = {"keys": [], "timestamp": 0}
 _CACHE_TTL = 3600  # Cache TTL in seconds (1 hour)
+# An unknown kid triggers a refresh (key rotation), at most this often
+_JWKS_MIN_REFRESH_INTERVAL = 60
+_jwks_refresh_task: Optional[asyncio.Task] = None
+
+# Verified tokens by SHA-256 of the token, each kept until its exp
+TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", "10000"))
+# Tokens only userinfo can validate (opaque or encrypted) carry no readable exp
+USERINFO_CACHE_TTL = float(os.environ.get("AUTH_USERINFO_CACHE_TTL", "300"))
+# A verified token whose profile lookup failed is kept only this long, then userinfo is asked again
+USERINFO_RETRY_TTL = float(os.environ.get("AUTH_USERINFO_RETRY_TTL", "30"))
+_token_cache: "OrderedDict[str, Tuple[User, float]]" = OrderedDict()
+
+# Auth sits on every request path; fail fast rather than use the shared default
+HTTP_TIMEOUT = float(os.environ.get("AUTH_HTTP_TIMEOUT", "5"))
 
 # JWT token security scheme for FastAPI
 security = HTTPBearer(auto_error=False)
@@ -61,11 +84,11 @@ def get_jwks() -> Dict[str, Any]:
         return _jwks_cache
     
     # Fetch fresh JWKS
-    jwks_url = f"https://{AUTH0_DOMAIN}/.well-known/jwks.json"
+    jwks_url = f"{AUTH0_BASE_URL}/.well-known/jwks.json"
     logger.info(f"Fetching JWKS from {jwks_url}")
     
     try:
-        response = requests.get(jwks_url)
+        response = http_client.get(jwks_url, timeout=HTTP_TIMEOUT)
         response.raise_for_status()
         jwks = response.json()
         _jwks_cache = {"keys": jwks["keys"], "timestamp": now}
@@ -76,6 +99,102 @@ def get_jwks() -> Dict[str, Any]:
         # Return empty JWKS if request fails
         return {"keys": []}
 
+async def _refresh_jwks() -> Dict[str, Any]:
+    
+    #Fetch the JWKS without blocking the event loop; on failure keep the old keys
+    global _jwks_cache
+    jwks_url = f"{AUTH0_BASE_URL}/.well-known/jwks.json"
+    logger.info(f"Fetching JWKS from {jwks_url}")
+    try:
+        response = await http_client.aget(jwks_url, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        jwks = response.json()
+        _jwks_cache = {"keys": jwks["keys"], "timestamp": time.time()}
+        logger.info(f"JWKS updated with {len(jwks['keys'])} keys")
+    except Exception as e:
+        logger.error(f"Failed to fetch JWKS: {str(e)}")
+    return _jwks_cache
+
+def _start_jwks_refresh() -> asyncio.Task:
+    # One refresh at a time; concurrent callers share it
+    global _jwks_refresh_task
+    if _jwks_refresh_task is None or _jwks_refresh_task.done():
+        _jwks_refresh_task = asyncio.create_task(_refresh_jwks())
+    return _jwks_refresh_task
+
+async def aget_jwks(kid: Optional[str] = None) -> Dict[str, Any]:
+    
+    #Async JWKS lookup with stale-while-revalidate: a stale cache is served while
+    #a background refresh runs; only an empty cache, or a kid missing from it
+    #(key rotation), makes the caller wait for the fetch
+    now = time.time()
+    age = now - _jwks_cache["timestamp"]
+    if not _jwks_cache["keys"]:
+        return await asyncio.shield(_start_jwks_refresh())
+    if kid is not None and not any(key.get("kid") == kid for key in _jwks_cache["keys"]):
+        if age >= _JWKS_MIN_REFRESH_INTERVAL:
+            return await asyncio.shield(_start_jwks_refresh())
+        return _jwks_cache
+    if age >= _CACHE_TTL:
+        _start_jwks_refresh()
+    return _jwks_cache
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _cached_user(token_key: str) -> Optional[User]:
+    entry = _token_cache.get(token_key)
+    if entry is None:
+        return None
+    user, expires_at = entry
+    if time.time() >= expires_at:
+        del _token_cache[token_key]
+        return None
+    _token_cache.move_to_end(token_key)
+    return user
+
+def _cache_user(token_key: str, user: User, expires_at: float):
+    if expires_at <= time.time():
+        return
+    _token_cache[token_key] = (user, expires_at)
+    _token_cache.move_to_end(token_key)
+    while len(_token_cache) > TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+
+async def verify_token_locally(token: str) -> Optional[Dict[str, Any]]:
+    
+    #Verify an RS256 token against the (cached) JWKS and return its claims.
+    #Returns None when the token cannot be checked locally (an opaque or
+    #encrypted token, or no kid); raises JWTError when it is invalid.
+    if token.count(".") != 2:
+        return None
+    header = jwt.get_unverified_header(token)
+    kid = header.get("kid")
+    if not kid:
+        return None
+    jwks = await aget_jwks(kid)
+    rsa_key = next((key for key in jwks.get("keys", []) if key.get("kid") == kid), None)
+    if rsa_key is None:
+        raise JWTError(f"No JWKS key matches kid {kid}")
+    return jwt.decode(
+        token,
+        key=json.dumps(rsa_key),
+        algorithms=JWKS_ALGORITHMS,
+        audience=API_AUDIENCE,
+        issuer=f"https://{AUTH0_DOMAIN}/"
+    )
+
+async def fetch_userinfo(token: str) -> Optional[Dict[str, Any]]:
+    
+    #Ask Auth0's userinfo endpoint about the token; None if it is rejected
+    userinfo_url = f"{AUTH0_BASE_URL}/userinfo"
+    logger.info(f"Validating token using userinfo endpoint: {userinfo_url}")
+    response = await http_client.aget(userinfo_url, headers={"Authorization": f"Bearer {token}"}, timeout=HTTP_TIMEOUT)
+    if response.status_code != 200:
+        logger.warning(f"Token validation failed via userinfo: {response.status_code}")
+        return None
+    return response.json()
+
 async def get_token_from_header(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)) -> Optional[str]:
     
     #Extract the JWT token from the authorization header
@@ -103,98 +222,64 @@ async def get_user(request: Request, token: Optional[str] = Depends(get_token_fr
                 detail="Authentication required"
             )
     
+    # Tokens already verified are served from memory until they expire
+    token_key = _token_key(token)
+    cached = _cached_user(token_key)
+    if cached is not None:
+        return cached
+    
     try:
         logger.info(f"Received token starting with: {token[:10]}...")
         
-        # Try with userinfo endpoint first
+        # Verify the signature locally against the cached JWKS (no network round trip)
         try:
-            userinfo_url = f"https://{AUTH0_DOMAIN}/userinfo"
-            headers = {"Authorization": f"Bearer {token}"}
-            logger.info(f"Validating token using userinfo endpoint: {userinfo_url}")
-            
-            response = requests.get(userinfo_url, headers=headers)
-            if response.status_code == 200:
-                userinfo = response.json()
-                logger.info(f"Token validated via userinfo endpoint: {userinfo}")
-                
-                # Extract user information from userinfo response
-                user = User(
-                    sub=userinfo.get("sub"),
-                    email=userinfo.get("email"),
-                    name=userinfo.get("name")
-                )
-                
-                logger.info(f"Authenticated user: {user.id}")
-                return user
-            else:
-                logger.warning(f"Token validation failed via userinfo: {response.status_code}")
-                # Continue with other methods if userinfo fails
-        except Exception as e:
-            logger.warning(f"Error validating token via userinfo: {str(e)}")
-            # Continue with other methods
+            payload = await verify_token_locally(token)
+        except JWTError as e:
+            logger.error(f"JWT verification failed: {str(e)}")
+            payload = {}
         
-        # Try to parse token header
-        try:
-            header = jwt.get_unverified_header(token)
-            logger.info(f"Token header: {header}")
-        except Exception as e:
-            logger.error(f"Failed to parse token header: {str(e)}")
-            if DEV_MODE:
-                # In development mode, provide a default user
-                logger.warning("Token header parsing failed, but using development mode fallback")
-                return User(
-                    sub="dev-user-123",
-                    email="dev@example.com",
-                    name="Development User"
-                )
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid token format"
-                )
+        if payload and payload.get("sub"):
+            logger.info("Token successfully verified")
+            user = User(
+                sub=payload["sub"],
+                email=payload.get("email"),
+                name=payload.get("name")
+            )
+            expires_at = float(payload.get("exp", 0))
+            # Access tokens usually carry no profile claims; ask userinfo once per token
+            if user.email is None or user.name is None:
+                profile_loaded = False
+                try:
+                    userinfo = await fetch_userinfo(token)
+                    if userinfo and userinfo.get("sub") == user.id:
+                        user.email = user.email or userinfo.get("email")
+                        user.name = user.name or userinfo.get("name")
+                        profile_loaded = True
+                except Exception as e:
+                    logger.warning(f"Error fetching userinfo: {str(e)}")
+                if not profile_loaded:
+                    # Don't pin a user without an email to the token for its whole lifetime
+                    expires_at = min(expires_at, time.time() + USERINFO_RETRY_TTL)
+            _cache_user(token_key, user, expires_at)
+            logger.info(f"Authenticated user: {user.id}")
+            return user
         
-        # Try standard JWT validation for tokens with 'kid'
-        if 'kid' in header:
+        # Tokens that cannot be verified locally (opaque or encrypted) are checked by userinfo
+        if payload is None:
             try:
-                # Get JWKS
-                jwks = get_jwks()
-                
-                # Find key in JWKS
-                rsa_key = {}
-                for key in jwks.get("keys", []):
-                    if key["kid"] == header["kid"]:
-                        rsa_key = key
-                        break
-                
-                if rsa_key:
-                    try:
-                        # Decode and verify JWT
-                        payload = jwt.decode(
-                            token,
-                            key=json.dumps(rsa_key),
-                            algorithms=ALGORITHMS,
-                            audience=API_AUDIENCE,
-                            issuer=f"https://{AUTH0_DOMAIN}/"
-                        )
-                        logger.info("Token successfully verified")
-                        
-                        # Extract user information
-                        sub = payload.get("sub")
-                        if sub:
-                            # Create user object
-                            user = User(
-                                sub=sub,
-                                email=payload.get("email"),
-                                name=payload.get("name")
-                            )
-                            logger.info(f"Authenticated user: {sub}")
-                            return user
-                    except Exception as e:
-                        logger.error(f"JWT verification failed: {str(e)}")
-                        # Fall through to next validation method
+                userinfo = await fetch_userinfo(token)
+                if userinfo and userinfo.get("sub"):
+                    logger.info(f"Token validated via userinfo endpoint: {userinfo}")
+                    user = User(
+                        sub=userinfo.get("sub"),
+                        email=userinfo.get("email"),
+                        name=userinfo.get("name")
+                    )
+                    _cache_user(token_key, user, time.time() + USERINFO_CACHE_TTL)
+                    logger.info(f"Authenticated user: {user.id}")
+                    return user
             except Exception as e:
-                logger.error(f"Error in JWT validation with JWKS: {str(e)}")
-                # Fall through to development mode check
+                logger.warning(f"Error validating token via userinfo: {str(e)}")
         
         # If we get here, all validation methods have failed
         if DEV_MODE:
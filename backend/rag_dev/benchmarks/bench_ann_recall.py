@@ -0,0 +1,106 @@
+#Recall-vs-latency benchmark of the ANN index types against the flat baseline.
+#
+#Uses the vectors of an existing index when --index points at a faiss_index
+#directory (every segment's vectors.npy, or the flat index itself), otherwise a
+#synthetic clustered corpus that roughly mimics sentence embeddings.
+#
+#Usage (from backend/rag_dev):
+#  python benchmarks/bench_ann_recall.py --n 200000 --dim 256 --queries 500
+#  python benchmarks/bench_ann_recall.py --index faiss_index
+
+import os
+import sys
+import time
+import argparse
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from index_factory import FLAT, IVF_FLAT, HNSW, IVF_PQ, build_index, tune_index, factory_string
+from segmented_index import read_manifest, VECTORS_FILE
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    assignments = rng.integers(0, clusters, size=n)
+    vectors = centers[assignments] + 0.35 * rng.normal(size=(n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def load_index_vectors(root: str) -> np.ndarray:
+    parts = []
+    for name in read_manifest(root)["segments"]:
+        path = os.path.normpath(os.path.join(root, name))
+        vectors_path = os.path.join(path, VECTORS_FILE)
+        if os.path.exists(vectors_path):
+            parts.append(np.load(vectors_path))
+        else:
+            index = faiss.read_index(os.path.join(path, "index.faiss"))
+            parts.append(index.reconstruct_n(0, index.ntotal))
+    return np.vstack(parts).astype(np.float32)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row) & set(truth_row)) for row, truth_row in zip(found, truth))
+    return hits / truth.size
+
+
+def timed_search(index, queries: np.ndarray, k: int):
+    # One query at a time, as the retriever issues them
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1e3)
+        found[i] = ids[0]
+    latencies.sort()
+    return found, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN recall vs latency benchmark")
+    parser.add_argument("--index", help="faiss_index directory to take vectors from")
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    vectors = load_index_vectors(args.index) if args.index else synthetic_corpus(args.n, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+    n, dim = vectors.shape
+    print(f"Corpus: {n} x {dim}, {args.queries} queries, k={args.k}")
+
+    flat = build_index(vectors, FLAT)
+    truth, p50, p99 = timed_search(flat, queries, args.k)
+    print(f"{'flat':<32} recall=1.000  p50={p50:7.3f} ms  p99={p99:7.3f} ms")
+
+    sweeps = {
+        IVF_FLAT: [("nprobe", v) for v in (1, 4, 16, 64)],
+        HNSW: [("efSearch", v) for v in (16, 32, 64, 128)],
+        IVF_PQ: [("nprobe", v) for v in (4, 16, 64)],
+    }
+    for index_type, settings in sweeps.items():
+        start = time.perf_counter()
+        index = build_index(vectors, index_type, min_ann_vectors=0)
+        build_seconds = time.perf_counter() - start
+        print(f"-- {factory_string(index_type, n, dim)} (built in {build_seconds:.1f}s)")
+        for knob, value in settings:
+            if knob == "nprobe":
+                tune_index(index, nprobe=value)
+            else:
+                tune_index(index, ef_search=value)
+            found, p50, p99 = timed_search(index, queries, args.k)
+            label = f"{index_type} {knob}={value}"
+            print(f"{label:<32} recall={recall_at_k(found, truth):.3f}  p50={p50:7.3f} ms  p99={p99:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#Latency of BM25 lookups over the per-segment inverted index.
+#
+#Uses the chunks of an existing index when --index points at a faiss_index
+#directory, otherwise a synthetic corpus with a Zipf-like vocabulary.
+#
+#Usage (from backend/rag_dev):
+#  python benchmarks/bench_bm25_lookup.py --docs 100000
+#  python benchmarks/bench_bm25_lookup.py --index faiss_index
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexical_index import BM25Segment, bm25_search, tokenize
+
+
+def synthetic_texts(docs: int, words: int = 150, vocab_size: int = 50000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"term{i}" for i in range(vocab_size)])
+    weights = 1.0 / np.arange(1, vocab_size + 1)
+    weights /= weights.sum()
+    return [" ".join(vocab[rng.choice(vocab_size, words, p=weights)]) for _ in range(docs)]
+
+
+def index_segments(root: str):
+    from segmented_index import SegmentedIndex
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    index = SegmentedIndex(root, DeterministicFakeEmbedding(size=8))
+    index.refresh()
+    with index.snapshot() as snapshot:
+        return list(snapshot.lexical.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 lookup latency benchmark")
+    parser.add_argument("--index", help="faiss_index directory to take chunks from")
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.index:
+        segments = index_segments(args.index)
+        vocab = sorted({term for _, segment in segments for term in segment.terms.tolist()})
+    else:
+        texts = synthetic_texts(args.docs)
+        start = time.perf_counter()
+        segments = [("synthetic", BM25Segment.from_texts(texts))]
+        print(f"Built {args.docs} doc(s) in {time.perf_counter() - start:.1f}s")
+        vocab = sorted({token for text in texts[:1000] for token in tokenize(text)})
+    docs = sum(segment.num_docs for _, segment in segments)
+    print(f"{docs} doc(s) in {len(segments)} segment(s), {args.queries} queries, k={args.k}")
+
+    rng = np.random.default_rng(1)
+    latencies = []
+    for _ in range(args.queries):
+        query = " ".join(rng.choice(vocab, 3))
+        start = time.perf_counter()
+        bm25_search(segments, query, args.k)
+        latencies.append((time.perf_counter() - start) * 1e3)
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"bm25 lookup  p50={p50:.3f} ms  p99={p99:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#Microbenchmark: per-request chain construction vs. ChainRegistry lookup.
+#
+#Runs offline with a fake chat model and an in-memory retriever, so the numbers
+#only reflect chain setup overhead, not LLM or embedding latency.
+#
+#Usage (from backend/rag_dev):  python benchmarks/bench_chain_registry.py [iterations]
+
+import os
+import sys
+import time
+import statistics
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompts import ChatPromptTemplate
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain.chains import create_retrieval_chain
+
+from recipe_models import recipe_output_parser
+from recipe_prompts import FULL_RECIPE_PROMPT
+from chain_registry import ChainRegistry
+
+FAKE_ANSWER = '{"recipe_name": "Toast", "ingredients": ["bread"], "instructions": ["toast it"], "cooking_tips": []}'
+
+
+class StaticRetriever(BaseRetriever):
+    #Returns the same documents for every query
+    docs: List[Document]
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.docs
+
+
+def build_per_request(llm, retriever):
+    # Mirrors what the endpoints used to do on every call
+    chat_prompt = ChatPromptTemplate.from_template(FULL_RECIPE_PROMPT)
+    document_chain = create_stuff_documents_chain(llm, chat_prompt, output_parser=recipe_output_parser)
+    return create_retrieval_chain(retriever, document_chain)
+
+
+def time_it(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<28} p50={p50:10.1f} us   p95={p95:10.1f} us")
+    return p50
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    llm = FakeListChatModel(responses=[FAKE_ANSWER])
+    retriever = StaticRetriever(docs=[Document(page_content="Toast bread until golden.")] * 3)
+
+    registry = ChainRegistry(llm, retriever)
+    registry.register("full", FULL_RECIPE_PROMPT, recipe_output_parser)
+
+    print(f"Chain setup overhead over {iterations} iterations")
+    build_p50 = report("build per request", time_it(lambda: build_per_request(llm, retriever), iterations))
+    lookup_p50 = report("registry lookup", time_it(lambda: registry.get("full"), iterations))
+    print(f"Setup saved per request: {build_p50 - lookup_p50:.1f} us (p50)")
+
+    invoke_iterations = max(1, iterations // 10)
+    print(f"\nEnd-to-end invoke with fake LLM over {invoke_iterations} iterations")
+    report("build + invoke", time_it(
+        lambda: build_per_request(llm, retriever).invoke({"input": "toast"}), invoke_iterations))
+    report("registry + invoke", time_it(
+        lambda: registry.get("full").invoke({"input": "toast"}), invoke_iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#Tail latency of a single provider vs. the hedged LLM router, with fake chat
+#models whose latency has a heavy tail (no API keys or network needed).
+#
+#Usage (from backend/rag_dev):
+#  python benchmarks/bench_llm_router.py --requests 400 --slow-rate 0.05
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from typing import Any, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from llm_router import LLMRouter
+
+
+class SlowFakeChatModel(BaseChatModel):
+    #Answers after base seconds, or after slow seconds with probability slow_rate
+    base: float
+    slow: float
+    slow_rate: float
+    seed: int = 0
+    rng: Optional[Any] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def _delay(self) -> float:
+        if self.rng is None:
+            self.rng = random.Random(self.seed)
+        jitter = self.rng.uniform(0.8, 1.2)
+        return (self.slow if self.rng.random() < self.slow_rate else self.base) * jitter
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+
+async def measure(model, requests: int, concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await model.ainvoke("hello")
+            latencies.append((time.perf_counter() - start) * 1e3)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return sorted(latencies)
+
+
+def report(label: str, latencies: List[float]):
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:<18} p50={p50:7.1f} ms  p99={p99:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM router hedging benchmark")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--base", type=float, default=0.02, help="typical latency in seconds")
+    parser.add_argument("--slow", type=float, default=0.5, help="tail latency in seconds")
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    def provider(seed):
+        return SlowFakeChatModel(base=args.base, slow=args.slow, slow_rate=args.slow_rate, seed=seed)
+
+    single = provider(1)
+    report("single provider", asyncio.run(measure(single, args.requests, args.concurrency)))
+
+    router = LLMRouter({"a": provider(2), "b": provider(3)}, rng=random.Random(0))
+    # Warm-up fills the latency windows so hedging uses measured p95s
+    asyncio.run(measure(router.chat_model("bench"), args.requests, args.concurrency))
+    report("hedged router", asyncio.run(measure(router.chat_model("bench"), args.requests, args.concurrency)))
+    stats = router.stats()
+    print(f"hedge rate {stats['hedge_rate']:.1%}, "
+          f"hedges won {sum(p['hedges_won'] for p in stats['providers'].values())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#Benchmark: the file, SQLite and MongoDB recipe storage backends side by side.
+#
+#Each backend gets its own scratch location: a temp directory for the file
+#store, a temp database for SQLite and a bench_recipes collection (dropped
+#afterwards) for MongoDB. MongoDB is skipped if pymongo is missing or
+#MONGO_URI does not answer within a second.
+#
+#Usage (from backend/rag_dev):  python benchmarks/bench_storage_backends.py [recipes] [lookups]
+
+import os
+import sys
+import time
+import random
+import logging
+import tempfile
+import importlib
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.config import MONGO_URI
+from database.models import Recipe
+from database.storage_factory import ModuleStorage
+
+USER_ID = "bench|user"
+
+
+def file_backend(tmp_dir):
+    module = importlib.import_module("database.recipe_storage")
+    module.USER_RECIPES_DIR = Path(tmp_dir) / "user_recipes"
+    module.USER_RECIPES_DIR.mkdir()
+    return ModuleStorage("file", module), lambda: None
+
+
+def sqlite_backend(tmp_dir):
+    module = importlib.import_module("database.sqlite_recipe_storage")
+    module.pool = module.ConnectionPool(os.path.join(tmp_dir, "recipes.sqlite"))
+    return ModuleStorage("sqlite", module), module.pool.close_all
+
+
+def mongo_backend(tmp_dir):
+    try:
+        from pymongo import MongoClient
+        MongoClient(MONGO_URI, serverSelectionTimeoutMS=1000).admin.command("ping")
+    except Exception as e:
+        print(f"Skipping mongo: {e.__class__.__name__}: {str(e)[:80]}")
+        return None
+    module = importlib.import_module("database.mongo_recipe_storage")
+    collection = module.db["bench_recipes"]
+    collection.drop()
+    collection.create_index([("user_id", 1), ("id", 1)], unique=True)
+    module.recipes_collection = collection
+    return ModuleStorage("mongo", module), collection.drop
+
+
+def make_recipe(i):
+    return Recipe(
+        recipe_name=f"Recipe {i}",
+        ingredients=[f"ingredient {j}" for j in range(12)],
+        instructions=[f"Step {j}: stir and simmer for a few minutes." for j in range(8)],
+        cooking_tips=["Season to taste."],
+        user_id=USER_ID,
+        user_email="bench@example.com"
+    )
+
+
+def time_each(fn, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p99 = samples[max(0, int(len(samples) * 0.99) - 1)]
+    print(f"  {label:<22} p50={p50:10.1f} us   p99={p99:10.1f} us")
+
+
+def run(storage, recipes, lookups):
+    print(f"{storage.name}:")
+    saved = [storage.save_recipe(make_recipe(i)) for i in range(recipes)]
+    ids = [recipe.id for recipe in saved]
+    picks = [(USER_ID, random.choice(ids)) for _ in range(lookups)]
+
+    report("save_recipe", time_each(storage.save_recipe, [(make_recipe(recipes + i),) for i in range(lookups)]))
+    report("get_recipe_by_id", time_each(storage.get_recipe_by_id, picks))
+    report("toggle_favorite", time_each(storage.toggle_favorite, [(u, r, True) for u, r in picks]))
+    report("get_user_recipes", time_each(storage.get_user_recipes, [(USER_ID,)] * max(1, lookups // 20)))
+    report("toggle_shared", time_each(storage.toggle_shared, [(u, r, True) for u, r in picks[:lookups // 2]]))
+    report("get_shared_recipes", time_each(storage.get_shared_recipes, [()] * max(1, lookups // 20)))
+    report("delete_recipe", time_each(storage.delete_recipe, [(USER_ID, recipe_id) for recipe_id in ids[:lookups]]))
+
+
+def main():
+    recipes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    # Per-call INFO logs would dominate the numbers
+    logging.disable(logging.WARNING)
+    random.seed(0)
+
+    print(f"{recipes} recipes for one user, {lookups} operations per measurement")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for make_backend in (file_backend, sqlite_backend, mongo_backend):
+            backend = make_backend(tmp_dir)
+            if backend is None:
+                continue
+            storage, cleanup = backend
+            try:
+                run(storage, recipes, lookups)
+            finally:
+                cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#Microbenchmark: per-call dispatch overhead of storage_factory, the old
+#importlib-per-call version vs. the backend registry.
+#
+#Both dispatch to the same in-memory backend, so the numbers only reflect the
+#factory's overhead, not file or MongoDB latency. The old version also logged at
+#INFO on every call; that is measured with logging on, as it ran in the server.
+#
+#Usage (from backend/rag_dev):  python benchmarks/bench_storage_factory.py [iterations]
+
+import os
+import sys
+import time
+import types
+import logging
+import importlib
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import storage_factory
+from database.models import Recipe
+
+USER_ID = "bench-user"
+
+
+def make_memory_backend():
+    #A module exposing the storage functions over a dict, like a real backend module
+    module = types.ModuleType("bench_memory_storage")
+    recipes = {}
+
+    def save_recipe(recipe):
+        recipes[(recipe.user_id, recipe.id)] = recipe
+        return recipe
+
+    def get_recipe_by_id(user_id, recipe_id):
+        return recipes.get((user_id, recipe_id))
+
+    def unused(*args, **kwargs):
+        raise AssertionError("not benchmarked")
+
+    module.Recipe = Recipe
+    for operation in storage_factory.STORAGE_OPERATIONS:
+        setattr(module, operation, unused)
+    module.save_recipe = save_recipe
+    module.get_recipe_by_id = get_recipe_by_id
+    sys.modules[module.__name__] = module
+    return module
+
+
+def old_get_storage_module(logger):
+    # Mirrors the previous get_storage_module, with the backend swapped for the in-memory one
+    logger.info("Using in-memory recipe storage")
+    return importlib.import_module("bench_memory_storage")
+
+
+def old_get_recipe_by_id(logger, user_id, recipe_id):
+    module = old_get_storage_module(logger)
+    return module.get_recipe_by_id(user_id, recipe_id)
+
+
+def time_it(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{label:<34} p50={p50:8.2f} us   p99={p99:8.2f} us")
+    return p50
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    module = make_memory_backend()
+    recipe = module.save_recipe(Recipe("Toast", ["bread"], ["toast it"], user_id=USER_ID))
+
+    # The server configures INFO logging to stderr; send it nowhere so the terminal is not the bottleneck
+    logger = logging.getLogger("bench_storage_factory")
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    print(f"get_recipe_by_id dispatch overhead over {iterations} iterations")
+    direct_p50 = report("direct backend call", time_it(
+        lambda: module.get_recipe_by_id(USER_ID, recipe.id), iterations))
+    old_p50 = report("importlib + INFO log per call", time_it(
+        lambda: old_get_recipe_by_id(logger, USER_ID, recipe.id), iterations))
+    with storage_factory.use_storage(storage_factory.ModuleStorage("memory", module)):
+        assert storage_factory.get_recipe_by_id(USER_ID, recipe.id) is recipe
+        new_p50 = report("registry (bound storage)", time_it(
+            lambda: storage_factory.get_recipe_by_id(USER_ID, recipe.id), iterations))
+    print(f"Dispatch overhead per call: {old_p50 - direct_p50:.2f} us -> {new_p50 - direct_p50:.2f} us (p50)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#Registry of retrieval chains built once at startup and reused per request.
+
+import threading
+from operator import itemgetter
+from typing import Any, Dict, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain.chains import create_retrieval_chain
+
+
+class ChainRegistry:
+
+    #Builds each document chain once per (prompt, output parser, llm) and binds it
+    #to the current retriever. Swapping the retriever replaces every retrieval chain
+    #in a single assignment, so a request always sees one consistent set of chains.
+    #With a context_packer, retrieved documents are packed to its token budget
+    #before the prompt, and the result carries a "packing" report next to "context".
+    def __init__(self, llm, retriever=None, context_packer=None):
+        self.llm = llm
+        self.context_packer = context_packer
+        self._lock = threading.Lock()
+        self._specs: Dict[str, Tuple[str, Any, Any]] = {}
+        self._document_chains: Dict[Tuple[str, int, int], Any] = {}
+        self._retriever = retriever
+        self._chains: Dict[str, Any] = {}
+
+    def _document_chain(self, prompt: str, output_parser, llm):
+        # Endpoints that share a prompt and parser share the same document chain
+        key = (prompt, id(output_parser), id(llm))
+        chain = self._document_chains.get(key)
+        if chain is None:
+            chat_prompt = ChatPromptTemplate.from_template(prompt)
+            chain = create_stuff_documents_chain(llm, chat_prompt, output_parser=output_parser)
+            self._document_chains[key] = chain
+        return chain
+
+    def _retrieval_chain(self, retriever, document_chain):
+        if self.context_packer is None:
+            # create_retrieval_chain hands non-BaseRetriever runnables (e.g. a retriever
+            # with configurable_fields) the whole input dict; they expect the query
+            if not isinstance(retriever, BaseRetriever):
+                retriever = itemgetter("input") | retriever
+            return create_retrieval_chain(retriever, document_chain)
+
+        # Same shape as create_retrieval_chain, with packing between retrieval and prompt
+        packer = self.context_packer
+        retrieve_and_pack = (
+            RunnablePassthrough.assign(documents=itemgetter("input") | retriever)
+            | RunnableLambda(lambda inputs: packer.pack(inputs["input"], inputs["documents"]))
+        ).with_config(run_name="retrieve_documents")
+        return (
+            RunnablePassthrough.assign(packed=retrieve_and_pack)
+            | RunnableLambda(lambda inputs: {**{k: v for k, v in inputs.items() if k != "packed"}, **inputs["packed"]})
+            | RunnablePassthrough.assign(answer=document_chain)
+        ).with_config(run_name="retrieval_chain")
+
+    def register(self, name: str, prompt: str, output_parser, llm=None):
+        #Register a named chain; it is built immediately if a retriever is set
+        with self._lock:
+            llm = llm or self.llm
+            self._specs[name] = (prompt, output_parser, llm)
+            document_chain = self._document_chain(prompt, output_parser, llm)
+            if self._retriever is not None:
+                chains = dict(self._chains)
+                chains[name] = self._retrieval_chain(self._retriever, document_chain)
+                self._chains = chains
+
+    def set_retriever(self, retriever):
+        #Bind every registered chain to a new retriever and swap them in atomically
+        with self._lock:
+            chains = {}
+            for name, (prompt, output_parser, llm) in self._specs.items():
+                document_chain = self._document_chain(prompt, output_parser, llm)
+                chains[name] = self._retrieval_chain(retriever, document_chain)
+            self._retriever = retriever
+            self._chains = chains
+
+    @property
+    def retriever(self):
+        return self._retriever
+
+    def get(self, name: str):
+        #Return the retrieval chain registered under name
+        chain = self._chains.get(name)
+        if chain is None:
+            raise KeyError(f"No retrieval chain registered as '{name}'")
+        return chain
+
+    def get_document_chain(self, name: str):
+        #Return the document chain behind name, for callers that retrieve themselves
+        spec = self._specs.get(name)
+        if spec is None:
+            raise KeyError(f"No retrieval chain registered as '{name}'")
+        with self._lock:
+            return self._document_chain(*spec)
@@ -10,24 +10,37 @@ This file implements the FastAPI server that handles:
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from pydantic import BaseModel
-from typing import List
-from langchain_openai import OpenAIEmbeddings
-from langchain_core.prompts import ChatPromptTemplate
+from typing import List, Optional
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import ConfigurableField
 from langchain_ollama import ChatOllama
-from langchain_community.vectorstores import FAISS
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains import create_retrieval_chain
-from langchain.output_parsers import PydanticOutputParser
 from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
-from gemini_integration import extract_ingredients_from_image
+from gemini_integration import extract_ingredients_from_image_async
 from image_gen import router as image_gen_router
+from recipe_models import RecipeSuggestions, recipe_output_parser, suggestion_output_parser
+from recipe_prompts import DIRECT_PROMPT, FULL_RECIPE_PROMPT, SUGGESTIONS_PROMPT
+from chain_registry import ChainRegistry
+from llm_limiter import get_limiter, limiter_stats, LimiterOverloaded
+from llm_router import LLMRouter, ProvidersUnavailable, parse_routes
+from output_repair import repair_stats
+import http_client
+from recipe_streaming import RecipeStreamParser
+from semantic_cache import SemanticCache
+from embedding_cache import create_embedding_model
+from segmented_index import SegmentedIndex
+from recipe_metadata import build_filters
+from context_packer import ContextPacker
+from prefetch_cache import PrefetchCache, PREFETCH_TOP_K
 
 from fastapi.responses import StreamingResponse
+from sse_starlette.sse import EventSourceResponse
 from huggingface_hub import InferenceClient
 from PIL import Image
 import io
 import base64
+import json
+import asyncio
 
 import os
 from dotenv import load_dotenv
@@ -37,6 +50,7 @@ from fastapi.middleware.cors import CORSMiddleware
 # Import recipe API router
 from recipe_api import router as recipe_router
 from assistant_api import router as assistant_router  # Import the assistant router
+from database import storage_factory
 
 # Load API key from .env file
 load_dotenv()
@@ -66,38 +80,138 @@ app.include_router(recipe_router)
 # Include assistant API router
 app.include_router(assistant_router)
 
-# Initialize embedding model and load FAISS vector store
-embedding_model = OpenAIEmbeddings(model="text-embedding-3-small")
-vector_db = FAISS.load_local("faiss_index", embedding_model, allow_dangerous_deserialization=True)
-retriever = vector_db.as_retriever(search_type="similarity", search_kwargs={"k": 3})
+# Initialize embedding model (cached, shared with ingestion) and load FAISS vector store
+embedding_model = create_embedding_model()
+vector_db = SegmentedIndex("faiss_index", embedding_model)
+vector_db.refresh()
+RETRIEVAL_K = 3
+# Vector and BM25 results fused by reciprocal rank; metadata filters are set per
+# request with config={"configurable": {"retrieval_filters": ...}}
+retriever = vector_db.as_hybrid_retriever(k=RETRIEVAL_K).configurable_fields(
+    filters=ConfigurableField(id="retrieval_filters", name="Retrieval filters")
+)
 
-# Load your language model (using Google Gemini Pro here)
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-pro")
+# Near-duplicate queries are answered from this cache without calling the LLM
+semantic_cache = SemanticCache(embedding_model)
+# Full recipes generated speculatively for the top PREFETCH_TOP_K suggestions
+prefetch_cache = PrefetchCache()
+
+# Load the language models. Every chain goes through the router, which spreads
+# calls over the endpoint's providers by latency, hedges slow calls and skips
+# providers whose circuit breaker is open. LLM_PROVIDERS lists the providers to
+# load; LLM_ROUTES narrows them per endpoint, e.g. "full=gemini,openai;suggestions=gemini".
+# The router holds each provider's limiter slot per attempt, hedges and fallbacks included.
+LLM_PROVIDERS = [name.strip() for name in os.environ.get("LLM_PROVIDERS", "gemini").split(",") if name.strip()]
+
+def create_chat_model(provider: str):
+    if provider == "gemini":
+        return ChatGoogleGenerativeAI(model=os.environ.get("GEMINI_MODEL", "gemini-1.5-pro"))
+    if provider == "openai":
+        return ChatOpenAI(model=os.environ.get("OPENAI_MODEL", "gpt-4o-mini"))
+    if provider == "ollama":
+        return ChatOllama(model=os.environ.get("OLLAMA_MODEL", "llama3.1"))
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+llm_router = LLMRouter(
+    {name: create_chat_model(name) for name in LLM_PROVIDERS},
+    parse_routes(os.environ.get("LLM_ROUTES", ""))
+)
+llm = llm_router.chat_model("default")
 
 # ------------------------------
-# Pydantic Models
+# Retrieval Chains (built once, retriever swapped on reload)
 # ------------------------------
-class Recipe(BaseModel):
-   
-    #Structured representation of a complete recipe
+# Retrieved chunks are de-overlapped, stripped and fit to CONTEXT_TOKEN_BUDGET
+context_packer = ContextPacker()
+chain_registry = ChainRegistry(llm, retriever, context_packer)
+# A hedged or fallback answer only wins if it parses
+chain_registry.register("direct", DIRECT_PROMPT, recipe_output_parser,
+                        llm_router.chat_model("direct", recipe_output_parser.parse_locally))
+chain_registry.register("direct_with_image", FULL_RECIPE_PROMPT, recipe_output_parser,
+                        llm_router.chat_model("direct_with_image", recipe_output_parser.parse_locally))
+chain_registry.register("suggestions", SUGGESTIONS_PROMPT, suggestion_output_parser,
+                        llm_router.chat_model("suggestions", suggestion_output_parser.parse_locally))
+chain_registry.register("full", FULL_RECIPE_PROMPT, recipe_output_parser,
+                        llm_router.chat_model("full", recipe_output_parser.parse_locally))
+
+# Answers that cannot be repaired locally get one small fix-JSON call instead
+# of a failed request and a client retry of the whole generation
+recipe_output_parser.fixer = llm_router.chat_model("fix_json")
+suggestion_output_parser.fixer = llm_router.chat_model("fix_json")
+
+# Streaming variants return raw text so the recipe can be parsed incrementally
+chain_registry.register("direct_stream", DIRECT_PROMPT, StrOutputParser(), llm_router.chat_model("direct"))
+chain_registry.register("full_stream", FULL_RECIPE_PROMPT, StrOutputParser(), llm_router.chat_model("full"))
 
-    recipe_name: str
-    ingredients: List[str]
-    instructions: List[str]
-    cooking_tips: List[str]
+# ------------------------------
+# Async LLM Calls (bounded per provider)
+# ------------------------------
+def overloaded_error(error: LimiterOverloaded) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(error), headers={"Retry-After": "1"})
 
-recipe_output_parser = PydanticOutputParser(pydantic_object=Recipe)
+def unavailable_error(error: ProvidersUnavailable) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "5"})
 
-class RecipeSuggestion(BaseModel):
-    #Short recipe suggestion with name and brief description
-    recipe_name: str
-    description: str
+async def invoke_chain(name: str, inputs: dict, config: Optional[dict] = None):
+    
+    #Run a registered retrieval chain without blocking the event loop
+    try:
+        return await chain_registry.get(name).ainvoke(inputs, config=config)
+    except LimiterOverloaded as e:
+        raise overloaded_error(e)
+    except ProvidersUnavailable as e:
+        raise unavailable_error(e)
+
+async def generate_recipe(name: str, query: str) -> dict:
+    
+    #Serve a recipe from the semantic cache, or generate and cache it
+    cached, query_embedding = await semantic_cache.alookup(name, query)
+    if cached is not None:
+        return cached
 
-class RecipeSuggestions(BaseModel):
-    #Container for multiple recipe suggestions
-    suggestions: List[RecipeSuggestion]
+    result = await invoke_chain(name, {"input": query})
+    response = {
+        "recipe": result["answer"].dict(),
+        "context": [doc.page_content for doc in result.get("context", [])],
+        "context_tokens": result.get("packing")
+    }
+    await semantic_cache.aput(name, query, response, query_embedding)
+    return response
 
-suggestion_output_parser = PydanticOutputParser(pydantic_object=RecipeSuggestions)
+def prefetch_full_recipes(suggestions: RecipeSuggestions):
+    
+    #Start generating the top suggestions' full recipes in the background.
+    #Speculative work only uses spare capacity: nothing is started while
+    #requests are queueing for the providers.
+    for suggestion in suggestions.suggestions[:PREFETCH_TOP_K]:
+        if not llm_router.headroom("full"):
+            break
+        query = f"How to make {suggestion.recipe_name}"
+        prefetch_cache.schedule(suggestion.recipe_name, lambda query=query: generate_recipe("full", query))
+
+async def stream_recipe_events(name: str, inputs: dict):
+    
+    #Yield SSE events as recipe fields complete: context, recipe_name, each
+    #ingredient / instruction / cooking_tip, then the validated recipe
+    parser = RecipeStreamParser()
+    try:
+        async for chunk in chain_registry.get(name).astream(inputs):
+            if "context" in chunk:
+                context = [doc.page_content for doc in chunk["context"]]
+                yield {"event": "context", "data": json.dumps(context)}
+            if "packing" in chunk:
+                yield {"event": "context_tokens", "data": json.dumps(chunk["packing"])}
+            answer = chunk.get("answer")
+            if answer:
+                for event, data in parser.feed(answer):
+                    yield {"event": event, "data": json.dumps(data)}
+        yield {"event": "recipe", "data": json.dumps(parser.recipe().dict())}
+    except LimiterOverloaded as e:
+        yield {"event": "error", "data": json.dumps({"status": 429, "detail": str(e)})}
+    except ProvidersUnavailable as e:
+        yield {"event": "error", "data": json.dumps({"status": 503, "detail": str(e)})}
+    except Exception as e:
+        yield {"event": "error", "data": json.dumps({"status": 500, "detail": str(e)})}
 
 # ------------------------------
 # Helper Function for Preferences
@@ -127,32 +241,12 @@ class DirectQueryRequest(BaseModel):
     query: str
 
 @app.post("/recipe/direct")
-def direct_query(request: DirectQueryRequest):
-    direct_prompt = """
-    You are Cooking Chef, an expert culinary assistant specializing in recipe generation.
-
-    <context>{context}</context>
-    User Query: {input}
+async def direct_query(request: DirectQueryRequest):
+    return await generate_recipe("direct", request.query)
 
-    Based on the user query and provided context, generate a complete recipe in valid JSON format.
-
-    The JSON object MUST contain the following keys with appropriate values:
-    1. "recipe_name" (string): The name of the dish
-    2. "ingredients" (array of strings): Each ingredient with its measurement
-    3. "instructions" (array of strings): Step-by-step cooking instructions 
-    4. "cooking_tips" (array of strings): Helpful cooking advice
-
-    Your output MUST be a valid JSON object with all four required keys. Do not include any explanations or additional text.
-    """
-    direct_chat_prompt = ChatPromptTemplate.from_template(direct_prompt)
-    document_chain = create_stuff_documents_chain(llm, direct_chat_prompt, output_parser=recipe_output_parser)
-    retrieval_chain = create_retrieval_chain(retriever, document_chain)
-
-    result = retrieval_chain.invoke({"input": request.query})
-    return {
-        "recipe": result["answer"].dict(),
-        "context": [doc.page_content for doc in result.get("context", [])]
-    }
+@app.post("/recipe/direct/stream")
+async def direct_query_stream(request: DirectQueryRequest):
+    return EventSourceResponse(stream_recipe_events("direct_stream", {"input": request.query}))
 
 # ------------------------------
 # Endpoint: Direct Query with Image
@@ -166,40 +260,26 @@ async def direct_query_with_image(
     image_bytes = await file.read()
     
     # Extract ingredients from the image
-    ingredients_list = extract_ingredients_from_image(image_bytes)
+    try:
+        # Image extraction calls Gemini directly, outside the router
+        async with get_limiter("gemini").slot():
+            ingredients_list = await extract_ingredients_from_image_async(image_bytes)
+    except LimiterOverloaded as e:
+        raise overloaded_error(e)
     
     # Combine the user's query with the extracted ingredients as additional context
     combined_input = f"{user_query} ingredients: {ingredients_list}"
     
-    # Use the same prompt structure as the direct endpoint
-    direct_prompt = """
-    You are Cooking Chef, an expert culinary assistant specializing in recipe generation.
-
-    <context>{context}</context>
-    User Query: {input}
-
-    Based on the user query and provided context, generate a complete recipe in valid JSON format.
-
-    The JSON object MUST contain the following keys with appropriate values:
-    1. "recipe_name" (string): The name of the dish
-    2. "ingredients" (array of strings): Each ingredient with its measurement
-    3. "instructions" (array of strings): Step-by-step cooking instructions 
-    4. "cooking_tips" (array of strings): Helpful cooking advice
-
-    Your output MUST be a valid JSON object with all four required keys. Do not include any extra text.
-    """
-    direct_chat_prompt = ChatPromptTemplate.from_template(direct_prompt)
-    document_chain = create_stuff_documents_chain(llm, direct_chat_prompt, output_parser=recipe_output_parser)
-    retrieval_chain = create_retrieval_chain(retriever, document_chain)
-
-    result = retrieval_chain.invoke({"input": combined_input})
+    # Use the same prompt structure as the full recipe endpoint
+    result = await invoke_chain("direct_with_image", {"input": combined_input})
     # Return the final JSON with detected_ingredients
     return {
         "detected_ingredients": [
             ing.strip() for ing in ingredients_list.split(",") if ing.strip()
         ],
         "recipe": result["answer"].dict(),
-        "context": [doc.page_content for doc in result.get("context", [])]
+        "context": [doc.page_content for doc in result.get("context", [])],
+        "context_tokens": result.get("packing")
     }
 # ------------------------------
 # Recipe Suggestions Endpoint (Existing)
@@ -216,7 +296,7 @@ class RecipeSuggestionsRequest(BaseModel):
     difficulty: str
 
 @app.post("/recipe/suggestions")
-def recipe_suggestions(request: RecipeSuggestionsRequest):
+async def recipe_suggestions(request: RecipeSuggestionsRequest):
     retrieval_query = build_retrieval_query(
         request.ingredients,
         request.meal_type,
@@ -227,28 +307,21 @@ def recipe_suggestions(request: RecipeSuggestionsRequest):
         request.difficulty
     )
 
-    prompt = """
-        You are Cooking Chef, an expert culinary assistant specializing in recipe generation. Your task is to generate recipe suggestions.
-        
-        <context>{context}</context>
-        User Query: {input}
-
-        Generate "Recipe Suggestions" based on the provided context. Populate the JSON object as follows:
-        - "suggestions": An array of objects, each containing:
-            - "recipe_name": A string with the name of the recipe.
-            - "description": A string with a short description for the recipe.
-
-        Ensure that the JSON output is valid and includes the "suggestions" key with at least one suggestion (if available). If no suggestions are available, output an empty array.
-        """
-    chat_prompt = ChatPromptTemplate.from_template(prompt)
-    document_chain = create_stuff_documents_chain(llm, chat_prompt, output_parser=suggestion_output_parser)
-    retrieval_chain = create_retrieval_chain(retriever, document_chain)
-
-    result = retrieval_chain.invoke({"input": retrieval_query})
+    # Only chunks compatible with the requested cuisine, diet, meal type and
+    # cooking time are searched (chunks with unknown values stay eligible)
+    filters = build_filters(
+        request.meal_type, request.cuisine_type, request.dietary_preference, request.cooking_time
+    )
+    result = await invoke_chain(
+        "suggestions", {"input": retrieval_query}, config={"configurable": {"retrieval_filters": filters}}
+    )
+    if PREFETCH_TOP_K > 0:
+        prefetch_full_recipes(result["answer"])
 
     return {
         "suggestions": result["answer"].dict(),
-        "context": [doc.page_content for doc in result.get("context", [])]
+        "context": [doc.page_content for doc in result.get("context", [])],
+        "context_tokens": result.get("packing")
     }
 
 # ------------------------------
@@ -259,44 +332,177 @@ class FullRecipeRequest(BaseModel):
     selected_recipe: str
 
 @app.post("/recipe/full")
-def full_recipe(request: FullRecipeRequest):
+async def full_recipe(request: FullRecipeRequest):
+    prefetched = await prefetch_cache.take(request.selected_recipe)
+    if prefetched is not None:
+        return prefetched
+
     retrieval_query = f"How to make {request.selected_recipe}"
+    return await generate_recipe("full", retrieval_query)
 
-    prompt = """
-    You are Cooking Chef, an expert culinary assistant specializing in recipe generation.
+@app.post("/recipe/full/stream")
+async def full_recipe_stream(request: FullRecipeRequest):
+    retrieval_query = f"How to make {request.selected_recipe}"
+    return EventSourceResponse(stream_recipe_events("full_stream", {"input": retrieval_query}))
 
-    <context>{context}</context>
-    User Query: {input}
+# ------------------------------
+# Batch Full Recipe Endpoint
+# ------------------------------
+# LLM calls one batch may have in flight; the provider limiters still apply on top
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", "4"))
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "10"))
+
+class BatchRecipeRequest(BaseModel):
+    #Full recipes for the given names, and/or for the top expand_top_n suggestions
+    #generated from a suggestions request
+    recipes: List[FullRecipeRequest] = []
+    suggestions: Optional[RecipeSuggestionsRequest] = None
+    expand_top_n: int = 3
+
+async def generate_batch_item(selected_recipe: str, query: str, docs: list, semaphore: asyncio.Semaphore) -> dict:
+    
+    #Pack pre-retrieved context and run the "full" document chain on it
+    packed = context_packer.pack(query, docs)
+    async with semaphore:
+        recipe = await chain_registry.get_document_chain("full").ainvoke(
+            {"input": query, "context": packed["context"]}
+        )
+    return {
+        "recipe": recipe.dict(),
+        "context": [doc.page_content for doc in packed["context"]],
+        "context_tokens": packed["packing"]
+    }
 
-    Based on the user query and provided context, generate a complete recipe in valid JSON format.
+async def stream_batch_events(request: BatchRecipeRequest):
+    
+    #Yield a "suggestions" event (when expanding suggestions), then one "item"
+    #event per recipe as soon as it is ready, and a final "done". All queries are
+    #embedded in one call and searched in one multi-query FAISS search; cached
+    #recipes skip retrieval and the LLM entirely.
+    tasks = []
+    try:
+        selected = [item.selected_recipe for item in request.recipes]
+        if request.suggestions is not None and request.expand_top_n > 0:
+            suggestions = await recipe_suggestions(request.suggestions)
+            yield {"event": "suggestions", "data": json.dumps(suggestions)}
+            names = [s["recipe_name"] for s in suggestions["suggestions"]["suggestions"]]
+            selected += names[:request.expand_top_n]
+        selected = selected[:BATCH_MAX_ITEMS]
+        queries = [f"How to make {name}" for name in selected]
+
+        vectors = await embedding_model.aembed_documents(queries) if queries else []
+        pending = []
+        for index, (name, query, vector) in enumerate(zip(selected, queries, vectors)):
+            cached = semantic_cache.lookup_vector("full", vector)
+            if cached is not None:
+                yield {"event": "item", "data": json.dumps({"index": index, "selected_recipe": name, "cached": True, **cached})}
+            else:
+                pending.append(index)
+
+        if pending:
+            results = await asyncio.to_thread(
+                vector_db.hybrid_search_batch,
+                [queries[i] for i in pending],
+                [vectors[i] for i in pending],
+                RETRIEVAL_K
+            )
+            semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+            task_index = {}
+            for index, hits in zip(pending, results):
+                task = asyncio.create_task(
+                    generate_batch_item(selected[index], queries[index], [doc for doc, _ in hits], semaphore)
+                )
+                task_index[task] = index
+                tasks.append(task)
+
+            remaining = set(tasks)
+            while remaining:
+                done, remaining = await asyncio.wait(remaining, return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    index = task_index.pop(finished)
+                    name = selected[index]
+                    try:
+                        response = finished.result()
+                    except LimiterOverloaded as e:
+                        yield {"event": "error", "data": json.dumps({"index": index, "selected_recipe": name, "status": 429, "detail": str(e)})}
+                        continue
+                    except ProvidersUnavailable as e:
+                        yield {"event": "error", "data": json.dumps({"index": index, "selected_recipe": name, "status": 503, "detail": str(e)})}
+                        continue
+                    except Exception as e:
+                        yield {"event": "error", "data": json.dumps({"index": index, "selected_recipe": name, "status": 500, "detail": str(e)})}
+                        continue
+                    semantic_cache.put_vector("full", queries[index], vectors[index], response)
+                    yield {"event": "item", "data": json.dumps({"index": index, "selected_recipe": name, "cached": False, **response})}
+        yield {"event": "done", "data": json.dumps({"items": len(selected)})}
+    except HTTPException as e:
+        yield {"event": "error", "data": json.dumps({"status": e.status_code, "detail": e.detail})}
+    except Exception as e:
+        yield {"event": "error", "data": json.dumps({"status": 500, "detail": str(e)})}
+    finally:
+        # The client may disconnect mid-batch; don't leave LLM calls running
+        for task in tasks:
+            task.cancel()
+
+@app.post("/recipe/batch")
+async def recipe_batch(request: BatchRecipeRequest):
+    if not request.recipes and request.suggestions is None:
+        raise HTTPException(status_code=400, detail="Provide recipes and/or suggestions to expand")
+    if len(request.recipes) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ITEMS} recipes per batch")
+    return EventSourceResponse(stream_batch_events(request))
 
-    The JSON object MUST contain the following keys with appropriate values:
-    1. "recipe_name" (string): The name of the dish
-    2. "ingredients" (array of strings): Each ingredient with its measurement
-    3. "instructions" (array of strings): Step-by-step cooking instructions 
-    4. "cooking_tips" (array of strings): Helpful cooking advice
+# ------------------------------
+# Reload FAISS Index Endpoint (Existing)
+# ------------------------------
+def on_index_refreshed(result):
+    if result["loaded"] or result["dropped"]:
+        # Cached answers were generated from the old corpus
+        semantic_cache.clear()
+        prefetch_cache.clear()
 
-    Your output MUST be a valid JSON object with all four required keys. Do not include any extra text.
-    """
-    custom_chat_prompt = ChatPromptTemplate.from_template(prompt)
-    document_chain = create_stuff_documents_chain(llm, custom_chat_prompt, output_parser=recipe_output_parser)
-    retrieval_chain = create_retrieval_chain(retriever, document_chain)
+vector_db.on_refresh.append(on_index_refreshed)
 
-    result = retrieval_chain.invoke({"input": retrieval_query})
+@app.post("/reload_index")
+def reload_index():
+    # New segments are loaded (memory-mapped) and validated in a background
+    # thread, then swapped in; in-flight queries finish on the old snapshot
+    started = vector_db.request_refresh()
     return {
-        "recipe": result["answer"].dict(),
-        "context": [doc.page_content for doc in result.get("context", [])]
+        "status": "Index reload started" if started else "Index reload queued",
+        "generation": vector_db.generation,
+        "last_reload": vector_db.last_reload
     }
 
 # ------------------------------
-# Reload FAISS Index Endpoint (Existing)
+# LLM Concurrency Stats Endpoint
 # ------------------------------
-@app.post("/reload_index")
-def reload_index():
-    global retriever
-    new_vector_db = FAISS.load_local("faiss_index", embedding_model, allow_dangerous_deserialization=True)
-    retriever = new_vector_db.as_retriever(search_type="similarity", search_kwargs={"k": 3})
-    return {"status": "Index reloaded"}
+@app.get("/llm/stats")
+def llm_stats():
+    return {"limiters": limiter_stats(), "router": llm_router.stats(),
+            "output_repair": repair_stats.stats(), "context_packing": context_packer.stats()}
+
+@app.get("/http/stats")
+def http_stats():
+    # Outbound calls (JWKS, userinfo) per destination
+    return http_client.http_stats()
+
+@app.on_event("startup")
+def resolve_recipe_storage():
+    # Import and connect the configured storage backend before the first request
+    storage_factory.get_storage()
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.aclose()
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "semantic_cache": semantic_cache.stats(),
+        "prefetch": prefetch_cache.stats(),
+        "embeddings": embedding_model.stats()
+    }
 
 if __name__ == "__main__":
     import uvicorn
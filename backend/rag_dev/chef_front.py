@@ -1,9 +1,12 @@
 import streamlit as st
-import requests
+import http_client
 import re
 import base64
 import io
 
+# Generation (and image generation) can take minutes; don't give up on the backend
+BACKEND_TIMEOUT = 300
+
 st.set_page_config(page_title="AI Chef PoC", layout="wide")
 st.title("🍳 AI Chef: Recipe Generator Proof-of-Concept")
 
@@ -88,9 +91,10 @@ if active_tab == "Direct Query":
     if st.button("Generate Recipe (Direct Query)"):
         with st.spinner("Generating recipe..."):
             # Call the recipe generation endpoint
-            response = requests.post(
+            response = http_client.post(
                 "http://localhost:8000/recipe/direct", 
-                json={"query": query}
+                json={"query": query},
+                timeout=BACKEND_TIMEOUT
             )
 
             if response.ok:
@@ -137,9 +141,10 @@ if active_tab == "Direct Query":
                         )
 
 
-                image_response = requests.post(
+                image_response = http_client.post(
                     "http://localhost:8000/recipe/generate_image_gemini",
-                    json={"prompt": prompt}
+                    json={"prompt": prompt},
+                    timeout=BACKEND_TIMEOUT
                 )
 
                 if image_response.ok:
@@ -187,7 +192,7 @@ elif active_tab == "Preference-Based Recipe":
                 "cooking_time": cooking_time,
                 "difficulty": difficulty
             }
-            response = requests.post("http://localhost:8000/recipe/suggestions", json=payload)
+            response = http_client.post("http://localhost:8000/recipe/suggestions", json=payload, timeout=BACKEND_TIMEOUT)
             if response.ok:
                 data = response.json()
                 list_of_suggestions = data["suggestions"]["suggestions"]
@@ -207,7 +212,9 @@ elif active_tab == "Preference-Based Recipe":
 
         if st.button("Generate Full Recipe"):
             with st.spinner("Generating full recipe..."):
-                response = requests.post("http://localhost:8000/recipe/full", json={"selected_recipe": selected_recipe})
+                response = http_client.post(
+                    "http://localhost:8000/recipe/full", json={"selected_recipe": selected_recipe}, timeout=BACKEND_TIMEOUT
+                )
                 if response.ok:
                     data = response.json()
                     recipe = data["recipe"]
@@ -249,7 +256,9 @@ elif active_tab == "Image-based Recipe":
                 }
                 data = {"user_query": user_query}
                 # Note: update the endpoint to match your backend's image-based endpoint
-                response = requests.post("http://localhost:8000/recipe/direct_with_image", files=files, data=data)
+                response = http_client.post(
+                    "http://localhost:8000/recipe/direct_with_image", files=files, data=data, timeout=BACKEND_TIMEOUT
+                )
 
                 if response.ok:
                     result = response.json()
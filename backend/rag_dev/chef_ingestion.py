@@ -2,25 +2,32 @@
 
 import os
 import time
-import threading
+import logging
 from dotenv import load_dotenv
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
-import requests  
+import http_client
 import time
 
 # LangChain & FAISS
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.document_loaders import CSVLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
+
+from embedding_cache import create_embedding_model
+from ingestion_pipeline import EmbeddingPipeline
+from segmented_index import SegmentedIndex
+from index_factory import FAISS_INDEX_TYPE
+from chunk_registry import ChunkRegistry
+from pdf_parsing import count_pages, start_parse_pool, stream_pdf_chunks
+from csv_streaming import CSVChunkStream
+from ingestion_queue import IngestionQueue
 
 ############################################
 # 1. Load Environment Variables
 ############################################
 load_dotenv()
+# Index writer batch and throughput metrics are logged at INFO
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("chef_ingestion")
 os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
 
 ############################################
@@ -30,87 +37,151 @@ PDF_DIR = "pdf_cookbooks"
 CSV_DIR = "csv_cookbooks"
 INDEX_DIR = "faiss_index"
 
-# Embedding model
-embedding_model = OpenAIEmbeddings(model="text-embedding-3-small")
+# Embedding model (re-ingested chunks are served from the embedding cache)
+embedding_model = create_embedding_model()
 
 ############################################
 # 3. Initialize or Load FAISS
 ############################################
-def initialize_vector_db(db_path: str):
-    if os.path.exists(db_path):
-        vector_db = FAISS.load_local(db_path, embedding_model, allow_dangerous_deserialization=True)
-        print("Loaded existing FAISS index.")
+def initialize_vector_db(db_path: str, index_type: str = FAISS_INDEX_TYPE):
+    # Each ingestion appends a small segment; nothing is rewritten.
+    # index_type (flat, ivf_flat, hnsw, ivf_pq) applies to segments large enough
+    # for approximate search, including the ones built by compaction.
+    existed = os.path.exists(db_path)
+    vector_db = SegmentedIndex(db_path, embedding_model, index_type)
+    if existed:
+        print(f"Opened existing FAISS index ({index_type}).")
     else:
-        # Create a new, empty FAISS vector store
-        vector_db = FAISS.from_texts([], embedding_model)
-        vector_db.save_local(db_path)
-        print("Created a new FAISS index.")
+        print(f"Created a new FAISS index ({index_type}).")
     return vector_db
 
 vector_db = initialize_vector_db(INDEX_DIR)
 
+# Batched, parallel embedding with retry and per-file checkpoints
+embedding_pipeline = EmbeddingPipeline(embedding_model)
+
+# Hashes of every chunk already in the index (exact, optionally MinHash near-dup)
+chunk_registry = ChunkRegistry()
+
 ############################################
 # 4. File Processing 
 ############################################
-def process_pdf(file_path: str):
-    try:
-        loader = PyPDFLoader(file_path)
-        docs = loader.load()
-        if not docs:
-            print(f"No content found in PDF: {file_path}")
-            return
+class IndexBatch:
+    # Files handled in one writer pass share a segment writer and dedup state,
+    # so the whole pass lands in the index as a single commit
+    def __init__(self):
+        self.writer = vector_db.writer()
+        self.chunk_filter = chunk_registry.file_filter()
+        self.completed = []
 
-         # Print a timer message before chunking starts
-        start_time = time.time()
-        print(f"[{time.strftime('%H:%M:%S')}] Starting to create chunks from '{file_path}'...")
+    def save(self):
+        # Chunks count as indexed only once their segment is on disk
+        texts, metadatas = list(self.writer.texts), list(self.writer.metadatas)
+        name = self.writer.flush()
+        by_source = {}
+        for text, metadata in zip(texts, metadatas):
+            by_source.setdefault(metadata.get("source"), []).append(text)
+        for source, source_texts in by_source.items():
+            # The registry now answers for these chunks; only unflushed ones stay in memory
+            self.chunk_filter.prune(chunk_registry.register(source_texts, source))
+        return name
 
-        chunks = split_and_chunk(docs)
+    def commit(self):
+        name = self.save()
+        # Only now is every completed file fully on disk
+        for file_path in self.completed:
+            embedding_pipeline.clear_checkpoint(file_path)
+        return name
 
-        # Optional: Calculate elapsed time for chunk creation
-        elapsed_time = time.time() - start_time
+# Processors raise on errors; ingest_files records the file as failed
+def process_pdf(file_path: str, batch: IndexBatch):
+    pages = count_pages(file_path)
+    if not pages:
+        print(f"No content found in PDF: {file_path}")
+        batch.completed.append(file_path)
+        return {"chunks": 0, "embedded": 0}
 
-        if chunks:
-            vector_db.add_documents(chunks)
-            vector_db.save_local(INDEX_DIR)
-            print(f"Added {len(chunks)} chunk(s) from PDF '{file_path}' to FAISS index (chunking took {elapsed_time:.2f} seconds).")
+     # Print a timer message before chunking starts
+    start_time = time.time()
+    print(f"[{time.strftime('%H:%M:%S')}] Starting to create chunks from '{file_path}' ({pages} page(s))...")
 
-            # 2) Reload endpoint call
-            call_reload_endpoint()
-        else:
-            print(f"No chunks created from PDF: {file_path}")
-
-    except Exception as e:
-        print(f"Error processing PDF '{file_path}': {e}")
+    # Pages are parsed and chunked on the process pool and streamed to the
+    # embedding stage as they are ready
+    report = index_chunks(file_path, stream_pdf_chunks(file_path), batch)
 
-def process_csv(file_path: str):
-    try:
-        loader = CSVLoader(file_path, csv_args={"delimiter": "\t", "quotechar": '"'}, encoding="utf-8-sig")
-        docs = loader.load()
-        if not docs:
-            print(f"No content found in CSV: {file_path}")
-            return
+    # Optional: Calculate elapsed time for chunk creation
+    elapsed_time = time.time() - start_time
 
-        chunks = split_and_chunk(docs)
-        if chunks:
-            vector_db.add_documents(chunks)
-            vector_db.save_local(INDEX_DIR)
-            print(f"Added {len(chunks)} chunk(s) from CSV '{file_path}' to FAISS index.")
+    if report["chunks"]:
+        print(f"Created {report['chunks']} chunk(s) from PDF '{file_path}' (parsing and indexing took {elapsed_time:.2f} seconds).")
+    else:
+        print(f"No chunks created from PDF: {file_path}")
+    return report
 
-            # 2) Reload endpoint call
-            call_reload_endpoint()
-        else:
-            print(f"No chunks created from CSV: {file_path}")
+def process_csv(file_path: str, batch: IndexBatch):
+    # Rows are read lazily and chunked a batch at a time, so memory does not
+    # grow with the file; a crashed run is re-queued at startup and seeks to
+    # the row it stopped in
+    chunks = CSVChunkStream(file_path, csv_args={"delimiter": "\t", "quotechar": '"'}, encoding="utf-8-sig")
+    report = index_chunks(file_path, chunks, batch)
+    if report["chunks"]:
+        print(f"Created {report['chunks']} chunk(s) from CSV '{file_path}'.")
+    else:
+        print(f"No chunks created from CSV: {file_path}")
+    return report
 
-    except Exception as e:
-        print(f"Error processing CSV '{file_path}': {e}")
+def index_chunks(file_path: str, chunks, batch: IndexBatch):
+    # 0) Chunks already indexed or repeated within this pass are skipped batch by batch
+    skipped_before = dict(batch.chunk_filter.counts)
 
-def split_and_chunk(docs):
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=100,
-        separators=["\n\n", "\n", " ", ""]
+    # 1) Embed in batches into the pass's segment writer; resumes from a checkpoint if interrupted.
+    #    The tail of the file is committed with the rest of the pass.
+    report = embedding_pipeline.run(
+        file_path, chunks, batch.writer.add, batch.save, batch.chunk_filter, finalize=False
     )
-    return text_splitter.split_documents(docs)
+    skipped = {kind: count - skipped_before[kind] for kind, count in batch.chunk_filter.counts.items()}
+    print(f"Skipped {skipped['exact']} duplicate and {skipped['near']} near-duplicate chunk(s) from '{file_path}'.")
+    print(
+        f"Embedded {report['embedded']} chunk(s) from '{file_path}' "
+        f"({report['chunks_per_second']:.1f} chunks/s, resumed from chunk {report['resumed_from']})."
+    )
+    print(f"Embedding cache: {embedding_model.stats()}")
+    if "error" in report:
+        print(f"Ingestion of '{file_path}' stopped early, progress checkpointed: {report['error']}")
+    else:
+        batch.completed.append(file_path)
+    return report
+
+def ingest_files(file_paths):
+    # Runs on the index writer thread only: every file of the pass goes into
+    # one commit, and the server is notified (debounced) by the queue.
+    # Returns (anything committed, files that failed); a failed file keeps its
+    # checkpoint and is picked up again by the startup scan
+    batch = IndexBatch()
+    embedded = 0
+    failed = []
+    for file_path in file_paths:
+        try:
+            if file_path.lower().endswith(".pdf"):
+                report = process_pdf(file_path, batch)
+            elif file_path.lower().endswith(".csv"):
+                report = process_csv(file_path, batch)
+            else:
+                print(f"Unsupported file type: {file_path}")
+                failed.append(file_path)
+                continue
+        except Exception:
+            logger.exception(f"Error processing '{file_path}'")
+            failed.append(file_path)
+            continue
+        embedded += report["embedded"]
+        if "error" in report:
+            failed.append(file_path)
+
+    segment = batch.commit()
+    if embedded:
+        print(f"Committed {embedded} chunk(s) from {len(file_paths)} file(s) to FAISS index ({segment or 'flushed during ingestion'}).")
+    return embedded > 0, failed
 
 ############################################
 # 5. Reload Endpoint Helper
@@ -118,7 +189,8 @@ def split_and_chunk(docs):
 def call_reload_endpoint():
     
     try:
-        response = requests.post("http://localhost:8000/reload_index", timeout=5)
+        # Reloading is idempotent, so a refused connection (server restarting) is retried
+        response = http_client.post("http://localhost:8000/reload_index", timeout=5, retries=http_client.HTTP_MAX_RETRIES)
         if response.status_code == 200:
             print("FAISS index reloaded successfully.")
         else:
@@ -126,6 +198,9 @@ def call_reload_endpoint():
     except Exception as e:
         print(f"Error calling reload endpoint: {e}")
 
+# Single index writer; reloads are debounced across commits
+ingestion_queue = IngestionQueue(ingest_files, call_reload_endpoint)
+
 ############################################
 # 6. Watchdog Event Handler
 ############################################
@@ -133,49 +208,65 @@ class DataIngestionHandler(FileSystemEventHandler):
     def on_created(self, event):
         if event.is_directory:
             return
+        self.queue_file(event.src_path)
 
-        file_path = event.src_path
+    def on_moved(self, event):
+        # A file renamed into place (e.g. from a partial download name) is new too
+        if event.is_directory:
+            return
+        self.queue_file(event.dest_path)
+
+    def queue_file(self, file_path: str):
         print(f"New file detected: {file_path}")
 
-        # Check file extension and process accordingly
-        if file_path.lower().endswith(".pdf"):
-            process_pdf(file_path)
-        elif file_path.lower().endswith(".csv"):
-            process_csv(file_path)
+        # Check file extension and queue it for the index writer
+        if file_path.lower().endswith((".pdf", ".csv")):
+            ingestion_queue.submit(file_path)
         else:
             print(f"Unsupported file type: {file_path}")
 
 ############################################
 # 7. Start Watchers
 ############################################
-def start_watcher(folder_to_watch):
+def start_watchers(folders_to_watch):
+    # One observer for every folder; callbacks only enqueue
     event_handler = DataIngestionHandler()
     observer = Observer()
-    observer.schedule(event_handler, folder_to_watch, recursive=False)
+    for folder in folders_to_watch:
+        observer.schedule(event_handler, folder, recursive=False)
+        print(f"Started monitoring folder: {folder}")
     observer.start()
-    print(f"Started monitoring folder: {folder_to_watch}")
+    return observer
 
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        observer.stop()
-    observer.join()
+def queue_interrupted_files(folders):
+    # Files a previous run crashed in or gave up on resume from their checkpoints
+    for file_path in embedding_pipeline.interrupted_files(folders, (".pdf", ".csv")):
+        print(f"Resuming interrupted ingestion of: {file_path}")
+        ingestion_queue.submit(file_path)
 
 ############################################
 # 8. Main Function
 ############################################
 def main():
-    # Start watchers for PDF and CSV folders in separate threads (optional)
-    pdf_thread = threading.Thread(target=start_watcher, args=(PDF_DIR,), daemon=True)
-    csv_thread = threading.Thread(target=start_watcher, args=(CSV_DIR,), daemon=True)
+    # Fork the PDF parsing workers before any other thread starts
+    start_parse_pool()
+
+    # Merge small segments in the background
+    vector_db.start_compactor()
 
-    pdf_thread.start()
-    csv_thread.start()
+    # The index writer, then the watchers that feed it
+    ingestion_queue.start()
+    observer = start_watchers([PDF_DIR, CSV_DIR])
+    queue_interrupted_files([PDF_DIR, CSV_DIR])
 
     # Keep main thread alive
-    while True:
-        time.sleep(1)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        observer.stop()
+        ingestion_queue.stop()
+    observer.join()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,182 @@
+#Persistent registry of ingested chunk hashes for exact and near-duplicate skipping.
+
+import os
+import re
+import zlib
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+CHUNK_REGISTRY_PATH = os.environ.get("CHUNK_REGISTRY_PATH", "chunk_registry.sqlite")
+# "exact" skips identical chunks; "minhash" also skips near-duplicates
+DEDUP_MODE = os.environ.get("DEDUP_MODE", "exact").lower()
+MINHASH_THRESHOLD = float(os.environ.get("MINHASH_THRESHOLD", "0.8"))
+MINHASH_PERMUTATIONS = 128
+MINHASH_BANDS = 16  # 16 bands x 8 rows: candidates from roughly 0.7 Jaccard upwards
+SHINGLE_WORDS = 5
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(normalize(text).encode("utf-8")).hexdigest()
+
+
+class MinHasher:
+
+    #MinHash signatures over word shingles, with (a*x + b) mod p permutations
+    def __init__(self, num_perm: int = MINHASH_PERMUTATIONS, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        words = normalize(text).split(" ")
+        if len(words) < SHINGLE_WORDS:
+            shingles = {" ".join(words)}
+        else:
+            shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) % _MERSENNE_PRIME for s in shingles),
+            dtype=np.uint64, count=len(shingles),
+        )
+        # (num_perm, num_shingles); products stay below 2^62 so uint64 never overflows
+        permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    @staticmethod
+    def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        return float(np.mean(sig_a == sig_b))
+
+
+class ChunkRegistry:
+
+    #SQLite-backed set of chunk hashes that are already in the index. In minhash
+    #mode it also keeps signatures and LSH band buckets to find near-duplicates.
+    def __init__(self, path: str = CHUNK_REGISTRY_PATH, mode: str = DEDUP_MODE, threshold: float = MINHASH_THRESHOLD):
+        if mode not in ("exact", "minhash"):
+            raise ValueError(f"Unknown dedup mode: {mode}")
+        self.mode = mode
+        self.threshold = threshold
+        self.minhasher = MinHasher() if mode == "minhash" else None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chunks (hash TEXT PRIMARY KEY, source TEXT, signature BLOB)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS bands (band INTEGER, bucket TEXT, hash TEXT)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, bucket)")
+        self._conn.commit()
+
+    def _bands(self, signature: np.ndarray) -> List[Tuple[int, str]]:
+        rows = len(signature) // MINHASH_BANDS
+        return [
+            (band, hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).hexdigest())
+            for band in range(MINHASH_BANDS)
+        ]
+
+    def _is_near_duplicate(self, signature: np.ndarray, bands: List[Tuple[int, str]], chunk_filter: "ChunkFilter") -> bool:
+        candidates = set()
+        for band, bucket in bands:
+            rows = self._conn.execute("SELECT hash FROM bands WHERE band = ? AND bucket = ?", (band, bucket)).fetchall()
+            candidates.update(row[0] for row in rows)
+        for candidate in candidates:
+            row = self._conn.execute("SELECT signature FROM chunks WHERE hash = ?", (candidate,)).fetchone()
+            if row and row[0] and MinHasher.similarity(signature, np.frombuffer(row[0], dtype=np.uint32)) >= self.threshold:
+                return True
+        # Near-duplicates among chunks of this pass not yet registered, through the same band buckets
+        pending = set()
+        for key in bands:
+            pending.update(chunk_filter.buckets.get(key, ()))
+        return any(
+            MinHasher.similarity(signature, chunk_filter.seen[digest]) >= self.threshold
+            for digest in pending
+        )
+
+    def filter_new(self, chunks) -> Tuple[list, Dict[str, int]]:
+        #Drop chunks already indexed (or repeated within this batch)
+        chunk_filter = self.file_filter()
+        return chunk_filter(chunks), chunk_filter.counts
+
+    def file_filter(self) -> "ChunkFilter":
+        return ChunkFilter(self)
+
+    def _filter(self, chunks, chunk_filter: "ChunkFilter") -> list:
+        kept = []
+        seen, counts = chunk_filter.seen, chunk_filter.counts
+        with self._lock:
+            for chunk in chunks:
+                digest = content_hash(chunk.page_content)
+                if digest in seen or self._conn.execute("SELECT 1 FROM chunks WHERE hash = ?", (digest,)).fetchone():
+                    counts["exact"] += 1
+                    continue
+                signature = None
+                if self.minhasher is not None:
+                    signature = self.minhasher.signature(chunk.page_content)
+                    bands = self._bands(signature)
+                    if self._is_near_duplicate(signature, bands, chunk_filter):
+                        counts["near"] += 1
+                        continue
+                    for key in bands:
+                        chunk_filter.buckets.setdefault(key, set()).add(digest)
+                seen[digest] = signature
+                kept.append(chunk)
+        return kept
+
+    def register(self, texts: List[str], source: Optional[str] = None) -> List[str]:
+        #Record chunks once they are durably in the index; returns their hashes
+        rows, band_rows = [], []
+        for text in texts:
+            digest = content_hash(text)
+            signature = None
+            if self.minhasher is not None:
+                signature = self.minhasher.signature(text)
+                band_rows.extend((band, bucket, digest) for band, bucket in self._bands(signature))
+            rows.append((digest, source, signature.tobytes() if signature is not None else None))
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO chunks (hash, source, signature) VALUES (?, ?, ?)", rows)
+            self._conn.executemany("INSERT INTO bands (band, bucket, hash) VALUES (?, ?, ?)", band_rows)
+            self._conn.commit()
+        return [row[0] for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+
+class ChunkFilter:
+
+    #Dedup state for one writer pass, so chunks repeated across batches are
+    #caught before any of them is registered. Only chunks kept but not yet
+    #registered are held: prune() drops them once the registry covers them,
+    #so memory is bounded by the unflushed work, not by file size.
+    def __init__(self, registry: ChunkRegistry):
+        self.registry = registry
+        self.seen: Dict[str, Optional[np.ndarray]] = {}
+        # LSH band -> hashes in seen, in minhash mode
+        self.buckets: Dict[Tuple[int, str], Set[str]] = {}
+        self.counts = {"exact": 0, "near": 0}
+
+    def __call__(self, chunks) -> list:
+        return self.registry._filter(chunks, self)
+
+    def prune(self, digests: Iterable[str]):
+        with self.registry._lock:
+            for digest in digests:
+                signature = self.seen.pop(digest, None)
+                if signature is None:
+                    continue
+                for key in self.registry._bands(signature):
+                    bucket = self.buckets.get(key)
+                    if bucket is not None:
+                        bucket.discard(digest)
+                        if not bucket:
+                            del self.buckets[key]
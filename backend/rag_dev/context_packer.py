@@ -0,0 +1,192 @@
+#Token-budgeted packing of retrieved chunks before they are stuffed into the prompt.
+
+import os
+import re
+import math
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from lexical_index import tokenize
+
+logger = logging.getLogger("context_packer")
+
+# Room for RETRIEVAL_K = 3 full chunks (split_and_chunk's 1000 characters, ~250
+# tokens each), so by default packing only de-duplicates; lower it to trim further
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "1024"))
+# Gemini's tokenizer is not available locally; ~4 characters per token for English
+CHARS_PER_TOKEN = float(os.environ.get("CONTEXT_CHARS_PER_TOKEN", "4"))
+# Overlap between adjacent chunks is at most split_and_chunk's 100 characters,
+# give or take the separator it snapped to
+MAX_OVERLAP_CHARS = 300
+MIN_OVERLAP_CHARS = 20
+# Sentences shorter than this ("2 eggs.", "Salt to taste.") are recipe content
+# that legitimately recurs, never treated as repeats
+MIN_DUPLICATE_CHARS = int(os.environ.get("CONTEXT_MIN_DUPLICATE_CHARS", "40"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+_BOILERPLATE = [
+    re.compile(r"^\s*(page\s*)?\d{1,4}\s*$", re.IGNORECASE),  # page numbers
+    re.compile(r"copyright|©|all rights reserved|\bisbn\b|printed in", re.IGNORECASE),
+    re.compile(r"^\s*(https?://|www\.)\S+\s*$", re.IGNORECASE),
+    re.compile(r"^\s*[\W_]+\s*$"),  # rules and decorations
+]
+_URL = re.compile(r"(https?://|www\.)\S+", re.IGNORECASE)
+# Words build_retrieval_query adds to every query; they say nothing about relevance
+QUERY_NOISE = frozenset({
+    "suggest", "recipe", "style", "using", "ensure", "friendly", "target", "serving", "size", "people",
+    "around", "minute", "cooking", "time", "make", "want", "please", "easy", "medium", "hard",
+})
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _trim_overlap(previous: str, text: str) -> str:
+    #Drop the prefix of text that repeats the end of previous
+    for length in range(min(len(previous), len(text), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(text[:length]):
+            return text[length:].lstrip()
+    return text
+
+
+def _trim_overlap_end(text: str, following: str) -> str:
+    #Drop the suffix of text that repeats the start of following
+    for length in range(min(len(following), len(text), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if text.endswith(following[:length]):
+            return text[:-length].rstrip()
+    return text
+
+
+def _is_boilerplate(line: str) -> bool:
+    return any(pattern.search(line) for pattern in _BOILERPLATE)
+
+
+class ContextPacker:
+
+    #Shrinks retrieved chunks to a token budget in four passes: remove the
+    #overlap repeated between chunks of the same source, strip boilerplate lines
+    #(page numbers, copyright, URLs), drop long sentences repeated within a
+    #source (overlap the splitter snapped differently), then keep the
+    #sentences sharing the most terms with the query, in their original order.
+    #Chunks that already fit after the first three passes are not cut further.
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.original_tokens = 0
+        self.packed_tokens = 0
+
+    def _clean(self, docs: List[Document]) -> Tuple[List[List[List[str]]], Dict[str, int]]:
+        #Per document, lines of sentences with overlap, boilerplate and repeats removed
+        counts = {"overlap_chars": 0, "boilerplate_chars": 0, "duplicate_sentences": 0}
+        kept_texts: List[Tuple[object, str]] = []
+        seen = set()  # (source, sentence) pairs already kept
+        cleaned = []
+        for doc in docs:
+            text = doc.page_content
+            source = doc.metadata.get("source")
+            for other_source, other in kept_texts:
+                if other_source == source:
+                    trimmed = _trim_overlap_end(_trim_overlap(other, text), other)
+                    counts["overlap_chars"] += len(text) - len(trimmed)
+                    text = trimmed
+            kept_texts.append((source, doc.page_content))
+
+            lines = []
+            for line in text.splitlines():
+                if _is_boilerplate(line):
+                    counts["boilerplate_chars"] += len(line)
+                    continue
+                stripped = _URL.sub("", line)
+                counts["boilerplate_chars"] += len(line) - len(stripped)
+                sentences = []
+                for sentence in _SENTENCE_END.split(stripped.strip()):
+                    key = " ".join(sentence.lower().split())
+                    if not key:
+                        continue
+                    if len(key) >= MIN_DUPLICATE_CHARS:
+                        if (source, key) in seen:
+                            counts["duplicate_sentences"] += 1
+                            continue
+                        seen.add((source, key))
+                    sentences.append(sentence.strip())
+                if sentences:
+                    lines.append(sentences)
+            cleaned.append(lines)
+        return cleaned, counts
+
+    def _select(self, query: str, cleaned: List[List[List[str]]]) -> set:
+        #(doc, line, sentence) positions to keep within the budget
+        query_terms = set(tokenize(query)) - QUERY_NOISE
+        candidates = []
+        for d, lines in enumerate(cleaned):
+            for l, sentences in enumerate(lines):
+                for s, sentence in enumerate(sentences):
+                    terms = set(tokenize(sentence))
+                    score = len(terms & query_terms) / math.sqrt(len(terms) or 1)
+                    candidates.append((-score, d, l, s, estimate_tokens(sentence) + 1))
+        # Best score first; ties go to higher-ranked documents and earlier text
+        candidates.sort()
+        keep, used = set(), 0
+        for _, d, l, s, tokens in candidates:
+            if used + tokens > self.token_budget:
+                continue
+            keep.add((d, l, s))
+            used += tokens
+        return keep
+
+    def pack(self, query: str, docs: List[Document]) -> Dict[str, object]:
+        #Returns {"context": packed documents, "packing": per-request report}
+        original_tokens = sum(estimate_tokens(doc.page_content) for doc in docs)
+        cleaned, counts = self._clean(docs)
+        cleaned_tokens = sum(
+            estimate_tokens(" ".join(sentence for sentences in lines for sentence in sentences)) for lines in cleaned
+        )
+        keep: Optional[set] = None
+        if cleaned_tokens > self.token_budget:
+            keep = self._select(query, cleaned)
+
+        packed_docs = []
+        dropped = 0
+        for d, (doc, lines) in enumerate(zip(docs, cleaned)):
+            out_lines = []
+            for l, sentences in enumerate(lines):
+                kept = [sentence for s, sentence in enumerate(sentences) if keep is None or (d, l, s) in keep]
+                dropped += len(sentences) - len(kept)
+                if kept:
+                    out_lines.append(" ".join(kept))
+            if out_lines:
+                packed_docs.append(Document(page_content="\n".join(out_lines), metadata=doc.metadata, id=doc.id))
+
+        packed_tokens = sum(estimate_tokens(doc.page_content) for doc in packed_docs)
+        report = {
+            "original_tokens": original_tokens,
+            "packed_tokens": packed_tokens,
+            "tokens_saved": original_tokens - packed_tokens,
+            "token_budget": self.token_budget,
+            "documents": len(packed_docs),
+            "sentences_dropped": dropped,
+            **counts,
+        }
+        with self._lock:
+            self.requests += 1
+            self.original_tokens += original_tokens
+            self.packed_tokens += packed_tokens
+        logger.info(f"Packed context: {original_tokens} -> {packed_tokens} tokens")
+        return {"context": packed_docs, "packing": report}
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            saved = self.original_tokens - self.packed_tokens
+            return {
+                "requests": self.requests,
+                "original_tokens": self.original_tokens,
+                "packed_tokens": self.packed_tokens,
+                "tokens_saved": saved,
+                "avg_tokens_saved": saved / self.requests if self.requests else 0.0,
+                "token_budget": self.token_budget,
+            }
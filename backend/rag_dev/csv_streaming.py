@@ -0,0 +1,128 @@
+#Streaming CSV ingestion: rows are read lazily and chunked in row batches.
+
+import os
+import csv
+import codecs
+from collections import deque
+from itertools import islice
+from typing import Iterator, Optional
+
+from langchain_core.documents import Document
+
+from ingestion_pipeline import ResumableChunks
+from pdf_parsing import split_and_chunk
+from recipe_metadata import extract_row_metadata
+
+CSV_BATCH_ROWS = int(os.environ.get("CSV_BATCH_ROWS", "256"))
+# Multi-GB dumps have fields well past the csv module's 128 KiB default
+csv.field_size_limit(int(os.environ.get("CSV_FIELD_SIZE_LIMIT", str(16 * 1024 * 1024))))
+
+
+def row_to_document(row: dict, file_path: str, row_number: int) -> Document:
+    #Same page_content as CSVLoader, so chunks (and their hashes) match; metadata
+    #adds cuisine / diets / meal_type / cooking_time from the row
+    content = "\n".join(
+        f"""{k.strip() if k is not None else k}: {
+            v.strip()
+            if isinstance(v, str)
+            else ",".join(map(str.strip, v))
+            if isinstance(v, list)
+            else v
+        }"""
+        for k, v in row.items()
+    )
+    metadata = {"source": file_path, "row": row_number, **extract_row_metadata(row, content)}
+    return Document(page_content=content, metadata=metadata)
+
+
+class CSVChunkStream(ResumableChunks):
+
+    #Iterates the chunks of a CSV file while holding at most batch_rows rows in
+    #memory. Byte offsets of row starts are tracked so a resumed run seeks
+    #straight to the row it stopped in instead of re-reading the whole file.
+    def __init__(
+        self,
+        file_path: str,
+        csv_args: Optional[dict] = None,
+        encoding: str = "utf-8-sig",
+        batch_rows: int = CSV_BATCH_ROWS,
+    ):
+        self.file_path = file_path
+        self.csv_args = csv_args or {}
+        self.encoding = encoding
+        self.batch_rows = batch_rows
+        self._start: Optional[dict] = None
+        self._start_offset = 0
+        # (chunk offset of the row's first chunk, row number, byte offset) per row not yet checkpointed
+        self._marks: deque = deque()
+
+    def resume(self, position: dict, offset: int):
+        self._start = position
+        self._start_offset = offset
+
+    def position(self, offset: int) -> Optional[dict]:
+        while len(self._marks) > 1 and self._marks[1][0] <= offset:
+            self._marks.popleft()
+        if not self._marks or self._marks[0][0] > offset:
+            return self._start
+        first_chunk, row_number, byte_offset = self._marks[0]
+        return {"row": row_number, "byte_offset": byte_offset, "skip": offset - first_chunk}
+
+    def __iter__(self) -> Iterator[Document]:
+        with open(self.file_path, "rb") as f:
+            decoder = codecs.getincrementaldecoder(self.encoding)()
+            byte_offset = 0
+
+            def lines():
+                # Binary readline keeps exact byte positions; csv pulls lines
+                # only as it needs them, so byte_offset is always the end of
+                # the last row returned
+                nonlocal byte_offset
+                while True:
+                    line = f.readline()
+                    if not line:
+                        return
+                    byte_offset += len(line)
+                    yield decoder.decode(line)
+
+            reader = csv.reader(lines(), **self.csv_args)
+            fieldnames = next(reader, None)
+            if fieldnames is None:
+                return
+
+            row_number = 0
+            chunk_offset = 0
+            skip = 0
+            if self._start:
+                f.seek(self._start["byte_offset"])
+                byte_offset = self._start["byte_offset"]
+                decoder = codecs.getincrementaldecoder(self.encoding)()
+                row_number = self._start["row"]
+                skip = self._start["skip"]
+                chunk_offset = self._start_offset - skip
+
+            rows = csv.DictReader(lines(), fieldnames=fieldnames, **self.csv_args)
+            row_start = byte_offset
+            while True:
+                docs, starts = [], []
+                for row in islice(rows, self.batch_rows):
+                    starts.append(row_start)
+                    docs.append(row_to_document(row, self.file_path, row_number))
+                    row_number += 1
+                    row_start = byte_offset
+                if not docs:
+                    return
+                chunks = split_and_chunk(docs)
+                # Record where each row's chunks begin in the stream
+                first_row = docs[0].metadata["row"]
+                seen_rows = set()
+                for i, chunk in enumerate(chunks):
+                    row = chunk.metadata["row"]
+                    if row not in seen_rows:
+                        seen_rows.add(row)
+                        self._marks.append((chunk_offset + i, row, starts[row - first_row]))
+                chunk_offset += len(chunks)
+                if skip:
+                    chunks = chunks[skip:]
+                    skip = 0
+                yield from chunks
@@ -1,9 +1,15 @@
-#Database config: choose file or MongoDB storage.
+#Database config: choose file, MongoDB or SQLite storage.
 
-STORAGE_TYPE = "mongo"
+import os
+
+STORAGE_TYPE = "mongo"                      # "file", "mongo" or "sqlite"
 MONGO_URI = "mongodb://localhost:27017/"  # MongoDB connection string
 DB_NAME = "ai_chef"                        # Database name
 RECIPES_COLLECTION = "recipes"             # Collection name for recipes
+SQLITE_PATH = os.environ.get(              # Database file for the sqlite backend
+    "RECIPES_SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "recipe_storage", "recipes.sqlite")
+)
 
 # Logging configuration
 LOG_LEVEL = "INFO"  # Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL) 
\ No newline at end of file
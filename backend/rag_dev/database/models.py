@@ -0,0 +1,62 @@
+#Recipe model shared by every storage backend.
+
+import uuid
+from typing import List, Dict, Optional, Any
+from datetime import datetime
+
+class Recipe:
+    #Recipe model for storage and retrieval
+    def __init__(
+        self,
+        recipe_name: str,
+        ingredients: List[str],
+        instructions: List[str],
+        cooking_tips: Optional[List[str]] = None,
+        id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        user_email: Optional[str] = None,
+        is_favorite: bool = False,
+        saved_date: Optional[str] = None,
+        is_shared: bool = False
+    ):
+        self.id = id or str(uuid.uuid4())
+        self.recipe_name = recipe_name
+        self.ingredients = ingredients
+        self.instructions = instructions
+        self.cooking_tips = cooking_tips or []
+        self.user_id = user_id
+        self.user_email = user_email
+        self.is_favorite = is_favorite
+        self.saved_date = saved_date or datetime.now().isoformat()
+        self.is_shared = is_shared
+
+    def to_dict(self) -> Dict[str, Any]:
+        #Convert recipe to dictionary for JSON serialization
+        return {
+            "id": self.id,
+            "recipe_name": self.recipe_name,
+            "ingredients": self.ingredients,
+            "instructions": self.instructions,
+            "cooking_tips": self.cooking_tips,
+            "user_id": self.user_id,
+            "user_email": self.user_email,
+            "is_favorite": self.is_favorite,
+            "saved_date": self.saved_date,
+            "is_shared": self.is_shared
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Recipe':
+        #Create recipe from dictionary
+        return cls(
+            id=data.get("id"),
+            recipe_name=data.get("recipe_name"),
+            ingredients=data.get("ingredients", []),
+            instructions=data.get("instructions", []),
+            cooking_tips=data.get("cooking_tips", []),
+            user_id=data.get("user_id"),
+            user_email=data.get("user_email"),
+            is_favorite=data.get("is_favorite", False),
+            saved_date=data.get("saved_date"),
+            is_shared=data.get("is_shared", False)
+        )
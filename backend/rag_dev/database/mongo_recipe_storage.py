@@ -1,12 +1,12 @@
 #MongoDB recipe storage backend.
 
-import uuid
-from typing import List, Dict, Optional, Any
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timedelta
 from pymongo import MongoClient
 import logging
 
 from database.config import MONGO_URI, DB_NAME, RECIPES_COLLECTION
+from database.models import Recipe
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,63 +21,6 @@ recipes_collection = db[RECIPES_COLLECTION]
 recipes_collection.create_index("user_id")
 recipes_collection.create_index([("user_id", 1), ("id", 1)], unique=True)
 
-class Recipe:
-    # Recipe model for storage and retrieval
-    def __init__(
-        self,
-        recipe_name: str,
-        ingredients: List[str],
-        instructions: List[str],
-        cooking_tips: Optional[List[str]] = None,
-        id: Optional[str] = None,
-        user_id: Optional[str] = None,
-        user_email: Optional[str] = None,
-        is_favorite: bool = False,
-        saved_date: Optional[str] = None,
-        is_shared: bool = False
-    ):
-        self.id = id or str(uuid.uuid4())  
-        self.recipe_name = recipe_name
-        self.ingredients = ingredients
-        self.instructions = instructions
-        self.cooking_tips = cooking_tips or []
-        self.user_id = user_id
-        self.user_email = user_email
-        self.is_favorite = is_favorite
-        self.saved_date = saved_date or datetime.now().isoformat()  
-        self.is_shared = is_shared
-    
-    def to_dict(self) -> Dict[str, Any]:
-     
-        return {
-            "id": self.id,
-            "recipe_name": self.recipe_name,
-            "ingredients": self.ingredients,
-            "instructions": self.instructions,
-            "cooking_tips": self.cooking_tips,
-            "user_id": self.user_id,
-            "user_email": self.user_email,
-            "is_favorite": self.is_favorite,
-            "saved_date": self.saved_date,
-            "is_shared": self.is_shared
-        }
-    
-    @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'Recipe':
-
-        return cls(
-            id=data.get("id"),
-            recipe_name=data.get("recipe_name"),
-            ingredients=data.get("ingredients", []),
-            instructions=data.get("instructions", []),
-            cooking_tips=data.get("cooking_tips", []),
-            user_id=data.get("user_id"),
-            user_email=data.get("user_email"),
-            is_favorite=data.get("is_favorite", False),
-            saved_date=data.get("saved_date"),
-            is_shared=data.get("is_shared", False)
-        )
-
 
 def save_recipe(recipe: Recipe) -> Recipe:
 
@@ -143,6 +86,29 @@ def get_user_recipes(user_id: str) -> List[Recipe]:
         return []
 
 
+def get_user_recipe_summaries(user_id: str) -> List[Dict[str, Any]]:
+
+    try:
+        # Only the summary fields leave the server; sorted by MongoDB
+        cursor = recipes_collection.find(
+            {"user_id": user_id},
+            {"_id": 0, "id": 1, "recipe_name": 1, "is_favorite": 1, "saved_date": 1, "is_shared": 1}
+        ).sort("saved_date", -1)
+        return [
+            {
+                "id": doc.get("id"),
+                "recipe_name": doc.get("recipe_name"),
+                "is_favorite": doc.get("is_favorite", False),
+                "saved_date": doc.get("saved_date"),
+                "is_shared": doc.get("is_shared", False)
+            }
+            for doc in cursor
+        ]
+    except Exception as e:
+        logger.error(f"Error retrieving recipe summaries: {e}")
+        return []
+
+
 def get_recipe_by_id(user_id: str, recipe_id: str) -> Optional[Recipe]:
 
     try:
@@ -1,13 +1,25 @@
 #File-based recipe storage backend.
+#
+#One JSON file per recipe in the user's directory, plus an index file mapping
+#recipe id to filename and summary fields, so a lookup opens exactly one file
+#and listing summaries opens only the index. Every write goes to a temp file
+#that is renamed over the target, so readers never see a half-written file.
+#The index is rebuilt from the recipe files if it is missing or unreadable.
 
 import os
+import re
 import json
 import time
-import uuid
-from typing import List, Dict, Optional, Any
-from datetime import datetime
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 from pathlib import Path
 
+from database.models import Recipe
+
+logger = logging.getLogger("recipe_storage")
+
 # Base directory for storing recipes
 BASE_DIR = Path(os.path.dirname(os.path.abspath(__file__)))
 STORAGE_DIR = BASE_DIR / "recipe_storage"
@@ -19,58 +31,14 @@ STORAGE_DIR.mkdir(parents=True, exist_ok=True)
 USER_RECIPES_DIR.mkdir(parents=True, exist_ok=True)
 SHARED_RECIPES_DIR.mkdir(parents=True, exist_ok=True)
 
-class Recipe:
-    #Recipe model for storage and retrieval
-    def __init__(
-        self,
-        recipe_name: str,
-        ingredients: List[str],
-        instructions: List[str],
-        cooking_tips: Optional[List[str]] = None,
-        id: Optional[str] = None,
-        user_id: Optional[str] = None,
-        is_favorite: bool = False,
-        saved_date: Optional[str] = None,
-        is_shared: bool = False
-    ):
-        self.id = id or str(uuid.uuid4())
-        self.recipe_name = recipe_name
-        self.ingredients = ingredients
-        self.instructions = instructions
-        self.cooking_tips = cooking_tips or []
-        self.user_id = user_id
-        self.is_favorite = is_favorite
-        self.saved_date = saved_date or datetime.now().isoformat()
-        self.is_shared = is_shared
-    
-    def to_dict(self) -> Dict[str, Any]:
-        #Convert recipe to dictionary for JSON serialization
-        return {
-            "id": self.id,
-            "recipe_name": self.recipe_name,
-            "ingredients": self.ingredients,
-            "instructions": self.instructions,
-            "cooking_tips": self.cooking_tips,
-            "user_id": self.user_id,
-            "is_favorite": self.is_favorite,
-            "saved_date": self.saved_date,
-            "is_shared": self.is_shared
-        }
-    
-    @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'Recipe':
-        #Create recipe from dictionary
-        return cls(
-            id=data.get("id"),
-            recipe_name=data.get("recipe_name"),
-            ingredients=data.get("ingredients", []),
-            instructions=data.get("instructions", []),
-            cooking_tips=data.get("cooking_tips", []),
-            user_id=data.get("user_id"),
-            is_favorite=data.get("is_favorite", False),
-            saved_date=data.get("saved_date"),
-            is_shared=data.get("is_shared", False)
-        )
+INDEX_FILENAME = "_index.json"
+INDEX_VERSION = 1
+SUMMARY_FIELDS = ("recipe_name", "is_favorite", "saved_date", "is_shared")
+
+# Guards read-modify-write of index files; recipe files are only written under it too
+_lock = threading.RLock()
+# user directory -> (index file mtime_ns, size, parsed entries)
+_index_cache: Dict[Path, Tuple[int, int, Dict[str, Dict[str, Any]]]] = {}
 
 
 def get_user_directory(user_id: str) -> Path:
@@ -81,114 +49,215 @@ def get_user_directory(user_id: str) -> Path:
     return user_dir
 
 
+def _write_json_atomic(path: Path, data: Any, indent: Optional[int] = 2):
+    #Write to a temp file in the same directory, then rename it over path
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _summary(recipe: Recipe, filename: str) -> Dict[str, Any]:
+    data = recipe.to_dict()
+    return {"filename": filename, **{field: data[field] for field in SUMMARY_FIELDS}}
+
+
+def _recipe_filename(recipe: Recipe) -> str:
+    # Name and timestamp keep files readable; the id prefix keeps same-second saves apart
+    safe_name = re.sub(r"[^a-z0-9]+", "_", recipe.recipe_name.lower()).strip("_") or "recipe"
+    return f"{safe_name}_{int(time.time())}_{recipe.id[:8]}.json"
+
+
+def rebuild_index(user_dir: Path) -> Dict[str, Dict[str, Any]]:
+    #Scan every recipe file in user_dir and write a fresh index
+    with _lock:
+        entries: Dict[str, Dict[str, Any]] = {}
+        for file_path in user_dir.glob("*.json"):
+            if file_path.name == INDEX_FILENAME:
+                continue
+            try:
+                with open(file_path, "r") as f:
+                    recipe = Recipe.from_dict(json.load(f))
+            except (json.JSONDecodeError, IOError) as e:
+                logger.warning(f"Error reading recipe file {file_path}: {e}")
+                continue
+            previous = entries.get(recipe.id)
+            # Older versions could leave two files with the same id; keep the newest
+            if previous is None or previous["saved_date"] <= recipe.saved_date:
+                entries[recipe.id] = _summary(recipe, file_path.name)
+        _write_index(user_dir, entries)
+        logger.info(f"Rebuilt recipe index for {user_dir.name}: {len(entries)} recipes")
+        return entries
+
+
+def _write_index(user_dir: Path, entries: Dict[str, Dict[str, Any]]):
+    index_path = user_dir / INDEX_FILENAME
+    _write_json_atomic(index_path, {"version": INDEX_VERSION, "recipes": entries}, indent=None)
+    stat = index_path.stat()
+    _index_cache[user_dir] = (stat.st_mtime_ns, stat.st_size, entries)
+
+
+def _load_index(user_dir: Path) -> Dict[str, Dict[str, Any]]:
+    #The user's index entries; parsed once and reused until the file changes
+    index_path = user_dir / INDEX_FILENAME
+    with _lock:
+        try:
+            stat = index_path.stat()
+        except FileNotFoundError:
+            return rebuild_index(user_dir)
+        cached = _index_cache.get(user_dir)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        try:
+            with open(index_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                raise ValueError(f"unsupported index version {data.get('version')}")
+            entries = data["recipes"]
+        except (json.JSONDecodeError, IOError, ValueError, KeyError, AttributeError) as e:
+            logger.warning(f"Recipe index {index_path} is unreadable ({e}), rebuilding")
+            return rebuild_index(user_dir)
+        _index_cache[user_dir] = (stat.st_mtime_ns, stat.st_size, entries)
+        return entries
+
+
+def _read_recipe(user_dir: Path, filename: str) -> Optional[Recipe]:
+    try:
+        with open(user_dir / filename, "r") as f:
+            return Recipe.from_dict(json.load(f))
+    except (json.JSONDecodeError, IOError) as e:
+        logger.warning(f"Error reading recipe file {user_dir / filename}: {e}")
+        return None
+
+
+def _write_recipe(user_dir: Path, recipe: Recipe, filename: str):
+    #Write the recipe file, then its index entry
+    with _lock:
+        _write_json_atomic(user_dir / filename, recipe.to_dict())
+        entries = dict(_load_index(user_dir))
+        entries[recipe.id] = _summary(recipe, filename)
+        _write_index(user_dir, entries)
+
+
 def save_recipe(recipe: Recipe) -> Recipe:
-    #Save a recipe to the file system
+    #Save a recipe to the file system; saving an existing id replaces that recipe
     if not recipe.user_id:
         raise ValueError("User ID is required to save a recipe")
-    
-    # Get user directory
+
     user_dir = get_user_directory(recipe.user_id)
-    
-    # Create filename based on recipe name and timestamp
-    safe_name = recipe.recipe_name.lower().replace(" ", "_")
-    timestamp = int(time.time())
-    filename = f"{safe_name}_{timestamp}.json"
-    
-    # Save recipe to file
-    file_path = user_dir / filename
-    with open(file_path, "w") as f:
-        json.dump(recipe.to_dict(), f, indent=2)
-    
+    with _lock:
+        entry = _load_index(user_dir).get(recipe.id)
+        filename = entry["filename"] if entry else _recipe_filename(recipe)
+        _write_recipe(user_dir, recipe, filename)
     return recipe
 
 
+def get_user_recipe_summaries(user_id: str) -> List[Dict[str, Any]]:
+    #Id and summary fields of every recipe, newest first, read from the index alone
+    entries = _load_index(get_user_directory(user_id))
+    summaries = [
+        {"id": recipe_id, **{field: entry[field] for field in SUMMARY_FIELDS}}
+        for recipe_id, entry in entries.items()
+    ]
+    summaries.sort(key=lambda s: s["saved_date"], reverse=True)
+    return summaries
+
+
 def get_user_recipes(user_id: str) -> List[Recipe]:
-    #Get all recipes for a user
+    #Get all recipes for a user, newest first; the index gives the order and files
     user_dir = get_user_directory(user_id)
+    entries = _load_index(user_dir)
     recipes = []
-    
-    # Read all JSON files in user directory
-    for file_path in user_dir.glob("*.json"):
-        try:
-            with open(file_path, "r") as f:
-                recipe_data = json.load(f)
-                recipes.append(Recipe.from_dict(recipe_data))
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Error reading recipe file {file_path}: {e}")
-    
-    # Sort by saved date (newest first)
-    recipes.sort(key=lambda r: r.saved_date, reverse=True)
+    for entry in sorted(entries.values(), key=lambda e: e["saved_date"], reverse=True):
+        recipe = _read_recipe(user_dir, entry["filename"])
+        if recipe is not None:
+            recipes.append(recipe)
     return recipes
 
 
 def get_recipe_by_id(user_id: str, recipe_id: str) -> Optional[Recipe]:
     #Get a specific recipe by ID
-    recipes = get_user_recipes(user_id)
-    for recipe in recipes:
-        if recipe.id == recipe_id:
-            return recipe
-    return None
+    user_dir = get_user_directory(user_id)
+    entry = _load_index(user_dir).get(recipe_id)
+    if entry is None:
+        return None
+    return _read_recipe(user_dir, entry["filename"])
 
 
 def update_recipe(recipe: Recipe) -> Recipe:
     #Update an existing recipe
     if not recipe.user_id or not recipe.id:
         raise ValueError("User ID and Recipe ID are required to update a recipe")
-    
-    # Get all user recipes
+
     user_dir = get_user_directory(recipe.user_id)
-    
-    # Find the file containing this recipe
-    recipe_file = None
-    for file_path in user_dir.glob("*.json"):
-        try:
-            with open(file_path, "r") as f:
-                data = json.load(f)
-                if data.get("id") == recipe.id:
-                    recipe_file = file_path
-                    break
-        except (json.JSONDecodeError, IOError):
-            continue
-    
-    if not recipe_file:
-        raise ValueError(f"Recipe with ID {recipe.id} not found")
-    
-    # Update the recipe file
-    with open(recipe_file, "w") as f:
-        json.dump(recipe.to_dict(), f, indent=2)
-    
+    with _lock:
+        entry = _load_index(user_dir).get(recipe.id)
+        if entry is None or not (user_dir / entry["filename"]).exists():
+            raise ValueError(f"Recipe with ID {recipe.id} not found")
+        _write_recipe(user_dir, recipe, entry["filename"])
     return recipe
 
 
 def delete_recipe(user_id: str, recipe_id: str) -> bool:
     #Delete a recipe
     user_dir = get_user_directory(user_id)
-    
-    # Find the file containing this recipe
-    recipe_file = None
-    for file_path in user_dir.glob("*.json"):
+    with _lock:
+        entries = _load_index(user_dir)
+        entry = entries.get(recipe_id)
+        if entry is None:
+            return False
+        # File first: a crash in between leaves an entry whose file is gone, which
+        # reads skip, rather than an orphan file that a rebuild would bring back
         try:
-            with open(file_path, "r") as f:
-                data = json.load(f)
-                if data.get("id") == recipe_id:
-                    recipe_file = file_path
-                    break
-        except (json.JSONDecodeError, IOError):
-            continue
-    
-    if not recipe_file:
-        return False
-    
-    # Delete the file
-    os.remove(recipe_file)
+            os.remove(user_dir / entry["filename"])
+        except FileNotFoundError:
+            pass
+        entries = {key: value for key, value in entries.items() if key != recipe_id}
+        _write_index(user_dir, entries)
     return True
 
 
 def toggle_favorite(user_id: str, recipe_id: str, is_favorite: bool) -> Optional[Recipe]:
     #Toggle favorite status of a recipe
-    recipe = get_recipe_by_id(user_id, recipe_id)
-    if not recipe:
-        return None
-    
-    recipe.is_favorite = is_favorite
-    return update_recipe(recipe) 
\ No newline at end of file
+    with _lock:
+        recipe = get_recipe_by_id(user_id, recipe_id)
+        if not recipe:
+            return None
+
+        recipe.is_favorite = is_favorite
+        return update_recipe(recipe)
+
+
+def toggle_shared(user_id: str, recipe_id: str, is_shared: bool) -> Optional[Recipe]:
+    #Toggle shared status of a recipe (visible to the community)
+    with _lock:
+        recipe = get_recipe_by_id(user_id, recipe_id)
+        if not recipe:
+            return None
+
+        recipe.is_shared = is_shared
+        return update_recipe(recipe)
+
+
+def get_shared_recipes() -> List[Recipe]:
+    #Shared recipes of every user, newest first; only shared entries' files are opened
+    recipes = []
+    for user_dir in USER_RECIPES_DIR.iterdir():
+        if not user_dir.is_dir():
+            continue
+        for entry in _load_index(user_dir).values():
+            if entry["is_shared"]:
+                recipe = _read_recipe(user_dir, entry["filename"])
+                if recipe is not None:
+                    recipes.append(recipe)
+    recipes.sort(key=lambda r: r.saved_date, reverse=True)
+    return recipes
@@ -0,0 +1,308 @@
+#SQLite recipe storage backend: one database file in WAL mode, no server to run.
+#
+#Each thread gets its own connection (readers never block the writer in WAL
+#mode), and every query is a constant SQL string with ? parameters, so each
+#connection prepares it once and reuses it from its statement cache.
+
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from database.config import SQLITE_PATH
+from database.models import Recipe
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("sqlite_recipe_storage")
+
+# Prepared statements kept per connection; the module uses far fewer than this
+STATEMENT_CACHE_SIZE = 64
+BUSY_TIMEOUT_MS = 5000
+
+# List fields are stored as JSON text; the columns listings filter and sort on
+# are plain columns so the indexes below can serve them
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS recipes (
+        user_id TEXT NOT NULL,
+        id TEXT NOT NULL,
+        recipe_name TEXT NOT NULL,
+        ingredients TEXT NOT NULL,
+        instructions TEXT NOT NULL,
+        cooking_tips TEXT NOT NULL,
+        user_email TEXT,
+        is_favorite INTEGER NOT NULL DEFAULT 0,
+        saved_date TEXT NOT NULL,
+        is_shared INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, id)
+    )""",
+    # A user's recipes newest first, and the duplicate check in save_recipe, are
+    # answered in index order; the summary columns make the index covering for
+    # get_user_recipe_summaries
+    """CREATE INDEX IF NOT EXISTS idx_recipes_user_saved
+        ON recipes (user_id, saved_date DESC, recipe_name, id, is_favorite, is_shared)""",
+    """CREATE INDEX IF NOT EXISTS idx_recipes_shared_saved
+        ON recipes (is_shared, saved_date DESC, user_id, id)""",
+]
+
+COLUMNS = ("user_id, id, recipe_name, ingredients, instructions, cooking_tips, "
+           "user_email, is_favorite, saved_date, is_shared")
+
+SELECT_BY_ID = f"SELECT {COLUMNS} FROM recipes WHERE user_id = ? AND id = ?"
+SELECT_BY_USER = f"SELECT {COLUMNS} FROM recipes WHERE user_id = ? ORDER BY saved_date DESC"
+SELECT_SUMMARIES_BY_USER = (
+    "SELECT id, recipe_name, is_favorite, saved_date, is_shared "
+    "FROM recipes WHERE user_id = ? ORDER BY saved_date DESC"
+)
+SELECT_SHARED = f"SELECT {COLUMNS} FROM recipes WHERE is_shared = 1 ORDER BY saved_date DESC"
+SELECT_RECENT_DUPLICATE = (
+    f"SELECT {COLUMNS} FROM recipes WHERE user_id = ? AND saved_date >= ? AND recipe_name = ? "
+    "ORDER BY saved_date DESC LIMIT 1"
+)
+UPSERT = (
+    f"INSERT INTO recipes ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (user_id, id) DO UPDATE SET "
+    "recipe_name = excluded.recipe_name, ingredients = excluded.ingredients, "
+    "instructions = excluded.instructions, cooking_tips = excluded.cooking_tips, "
+    "user_email = excluded.user_email, is_favorite = excluded.is_favorite, "
+    "saved_date = excluded.saved_date, is_shared = excluded.is_shared"
+)
+UPDATE = (
+    "UPDATE recipes SET recipe_name = ?, ingredients = ?, instructions = ?, cooking_tips = ?, "
+    "user_email = ?, is_favorite = ?, saved_date = ?, is_shared = ? WHERE user_id = ? AND id = ?"
+)
+DELETE = "DELETE FROM recipes WHERE user_id = ? AND id = ?"
+SET_FAVORITE = f"UPDATE recipes SET is_favorite = ? WHERE user_id = ? AND id = ? RETURNING {COLUMNS}"
+SET_SHARED = f"UPDATE recipes SET is_shared = ? WHERE user_id = ? AND id = ? RETURNING {COLUMNS}"
+
+
+class ConnectionPool:
+
+    #One connection per thread, opened on first use. The schema is created by
+    #whichever connection comes first.
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._schema_ready = False
+
+    def _open(self) -> sqlite3.Connection:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        with self._lock:
+            if not self._schema_ready:
+                with conn:
+                    for statement in SCHEMA:
+                        conn.execute(statement)
+                self._schema_ready = True
+            self._connections.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+        return conn
+
+    def close_all(self):
+        #Close every thread's connection, e.g. on shutdown or in tests
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Closing from another thread is refused; the connection dies with its thread
+                pass
+        self._local = threading.local()
+
+
+pool = ConnectionPool(SQLITE_PATH)
+
+
+def _row_to_recipe(row: sqlite3.Row) -> Recipe:
+    return Recipe(
+        id=row["id"],
+        recipe_name=row["recipe_name"],
+        ingredients=json.loads(row["ingredients"]),
+        instructions=json.loads(row["instructions"]),
+        cooking_tips=json.loads(row["cooking_tips"]),
+        user_id=row["user_id"],
+        user_email=row["user_email"],
+        is_favorite=bool(row["is_favorite"]),
+        saved_date=row["saved_date"],
+        is_shared=bool(row["is_shared"])
+    )
+
+
+def _values(recipe: Recipe) -> Dict[str, Any]:
+    return {
+        "recipe_name": recipe.recipe_name,
+        "ingredients": json.dumps(recipe.ingredients),
+        "instructions": json.dumps(recipe.instructions),
+        "cooking_tips": json.dumps(recipe.cooking_tips),
+        "user_email": recipe.user_email,
+        "is_favorite": int(bool(recipe.is_favorite)),
+        "saved_date": recipe.saved_date,
+        "is_shared": int(bool(recipe.is_shared)),
+    }
+
+
+def save_recipe(recipe: Recipe) -> Recipe:
+
+    if not recipe.user_id:
+        raise ValueError("User ID is required to save a recipe")
+
+    try:
+        conn = pool.connection()
+        values = _values(recipe)
+        five_minutes_ago = (datetime.now() - timedelta(minutes=5)).isoformat()
+        with conn:
+            # Same accidental double-save guard as the MongoDB backend
+            duplicate = conn.execute(
+                SELECT_RECENT_DUPLICATE, (recipe.user_id, five_minutes_ago, recipe.recipe_name)
+            ).fetchone()
+            if duplicate is not None:
+                existing_recipe = _row_to_recipe(duplicate)
+                logger.warning(f"Potential duplicate recipe detected: {recipe.recipe_name}")
+                logger.info(f"Using existing recipe: {existing_recipe.id}")
+                return existing_recipe
+
+            conn.execute(UPSERT, (recipe.user_id, recipe.id, *values.values()))
+
+        logger.info(f"Recipe saved: {recipe.recipe_name} with ID {recipe.id}")
+        return recipe
+    except sqlite3.Error as e:
+        logger.error(f"Error saving recipe: {e}")
+        raise
+
+
+def get_user_recipes(user_id: str) -> List[Recipe]:
+
+    try:
+        rows = pool.connection().execute(SELECT_BY_USER, (user_id,)).fetchall()
+        recipes = [_row_to_recipe(row) for row in rows]
+        logger.info(f"Retrieved {len(recipes)} recipes for user {user_id}")
+        return recipes
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving recipes: {e}")
+        return []
+
+
+def get_user_recipe_summaries(user_id: str) -> List[Dict[str, Any]]:
+    #Id and summary fields of every recipe, newest first, from the covering index alone
+    try:
+        rows = pool.connection().execute(SELECT_SUMMARIES_BY_USER, (user_id,)).fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving recipe summaries: {e}")
+        return []
+    return [
+        {
+            "id": row["id"],
+            "recipe_name": row["recipe_name"],
+            "is_favorite": bool(row["is_favorite"]),
+            "saved_date": row["saved_date"],
+            "is_shared": bool(row["is_shared"]),
+        }
+        for row in rows
+    ]
+
+
+def get_recipe_by_id(user_id: str, recipe_id: str) -> Optional[Recipe]:
+
+    try:
+        row = pool.connection().execute(SELECT_BY_ID, (user_id, recipe_id)).fetchone()
+        if row is None:
+            logger.warning(f"Recipe {recipe_id} not found for user {user_id}")
+            return None
+        return _row_to_recipe(row)
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving recipe {recipe_id}: {e}")
+        return None
+
+
+def update_recipe(recipe: Recipe) -> Recipe:
+
+    if not recipe.user_id or not recipe.id:
+        raise ValueError("User ID and Recipe ID are required to update a recipe")
+
+    try:
+        conn = pool.connection()
+        with conn:
+            cursor = conn.execute(UPDATE, (*_values(recipe).values(), recipe.user_id, recipe.id))
+        if cursor.rowcount == 0:
+            logger.warning(f"Recipe {recipe.id} not found for update")
+            raise ValueError(f"Recipe with ID {recipe.id} not found")
+
+        logger.info(f"Recipe {recipe.id} updated")
+        return recipe
+    except sqlite3.Error as e:
+        logger.error(f"Error updating recipe {recipe.id}: {e}")
+        raise
+
+
+def delete_recipe(user_id: str, recipe_id: str) -> bool:
+
+    try:
+        conn = pool.connection()
+        with conn:
+            cursor = conn.execute(DELETE, (user_id, recipe_id))
+        if cursor.rowcount == 0:
+            logger.warning(f"Recipe {recipe_id} not found for deletion")
+            return False
+
+        logger.info(f"Recipe {recipe_id} deleted")
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Error deleting recipe {recipe_id}: {e}")
+        return False
+
+
+def _set_flag(statement: str, user_id: str, recipe_id: str, value: bool) -> Optional[Recipe]:
+    #Update one flag and return the updated recipe in a single statement
+    conn = pool.connection()
+    with conn:
+        # RETURNING rows must be drained before the commit
+        rows = conn.execute(statement, (int(bool(value)), user_id, recipe_id)).fetchall()
+    row = rows[0] if rows else None
+    if row is None:
+        logger.warning(f"Recipe {recipe_id} not found for user {user_id}")
+        return None
+    return _row_to_recipe(row)
+
+
+def toggle_favorite(user_id: str, recipe_id: str, is_favorite: bool) -> Optional[Recipe]:
+
+    try:
+        return _set_flag(SET_FAVORITE, user_id, recipe_id, is_favorite)
+    except sqlite3.Error as e:
+        logger.error(f"Error toggling favorite status: {e}")
+        return None
+
+
+def toggle_shared(user_id: str, recipe_id: str, is_shared: bool) -> Optional[Recipe]:
+
+    try:
+        return _set_flag(SET_SHARED, user_id, recipe_id, is_shared)
+    except sqlite3.Error as e:
+        logger.error(f"Error toggling shared status: {e}")
+        return None
+
+
+def get_shared_recipes() -> List[Recipe]:
+
+    try:
+        rows = pool.connection().execute(SELECT_SHARED).fetchall()
+        return [_row_to_recipe(row) for row in rows]
+    except sqlite3.Error as e:
+        logger.error(f"Error getting shared recipes: {e}")
+        return []
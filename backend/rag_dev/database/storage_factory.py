@@ -1,92 +1,183 @@
-#Storage factory: choose file or MongoDB backend.
+#Storage factory: registry of recipe storage backends, resolved once per process.
 
 import logging
 import importlib
-from typing import Any, Dict, List, Optional
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Protocol, runtime_checkable
 
 from database.config import STORAGE_TYPE
-from database.mongo_recipe_storage import (
-    Recipe,
-    save_recipe,
-    get_user_recipes,
-    get_recipe_by_id,
-    update_recipe,
-    delete_recipe,
-    toggle_favorite,
-    toggle_shared,
-    get_shared_recipes
-)
+from database.models import Recipe
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("storage_factory")
 
-def get_storage_module():
-    
-    if STORAGE_TYPE == "file":
-        logger.info("Using file-based recipe storage")
-        return importlib.import_module('database.recipe_storage')
-    elif STORAGE_TYPE == "mongo":
-        logger.info("Using MongoDB recipe storage")
-        return importlib.import_module('database.mongo_recipe_storage')
-    else:
-        logger.error(f"Unknown storage type: {STORAGE_TYPE}, falling back to file storage")
-        return importlib.import_module('database.recipe_storage')
-
-# The following functions delegate to the appropriate storage implementation
+STORAGE_OPERATIONS = (
+    "save_recipe",
+    "get_user_recipes",
+    "get_user_recipe_summaries",
+    "get_recipe_by_id",
+    "update_recipe",
+    "delete_recipe",
+    "toggle_favorite",
+    "toggle_shared",
+    "get_shared_recipes",
+)
+
+
+@runtime_checkable
+class RecipeStorage(Protocol):
+
+    #What every backend provides. Recipes go in and come out as database.models.Recipe.
+    def save_recipe(self, recipe: Recipe) -> Recipe: ...
+
+    def get_user_recipes(self, user_id: str) -> List[Recipe]: ...
+
+    #id, recipe_name, is_favorite, saved_date and is_shared of each recipe, newest
+    #first, without loading ingredients or instructions
+    def get_user_recipe_summaries(self, user_id: str) -> List[Dict[str, Any]]: ...
+
+    def get_recipe_by_id(self, user_id: str, recipe_id: str) -> Optional[Recipe]: ...
+
+    def update_recipe(self, recipe: Recipe) -> Recipe: ...
+
+    def delete_recipe(self, user_id: str, recipe_id: str) -> bool: ...
+
+    def toggle_favorite(self, user_id: str, recipe_id: str, is_favorite: bool) -> Optional[Recipe]: ...
+
+    def toggle_shared(self, user_id: str, recipe_id: str, is_shared: bool) -> Optional[Recipe]: ...
+
+    def get_shared_recipes(self) -> List[Recipe]: ...
+
+
+class ModuleStorage:
+
+    #Binds a backend module's functions once, so a call is a plain attribute
+    #lookup. A module missing any operation is rejected when it is loaded, i.e.
+    #at startup, rather than failing the first request that needs it.
+    def __init__(self, name: str, module):
+        missing = [operation for operation in STORAGE_OPERATIONS if not callable(getattr(module, operation, None))]
+        if missing:
+            raise TypeError(f"Storage backend '{name}' ({module.__name__}) is missing: {', '.join(missing)}")
+        self.name = name
+        self.module = module
+        for operation in STORAGE_OPERATIONS:
+            setattr(self, operation, getattr(module, operation))
+
+    def __repr__(self):
+        return f"ModuleStorage({self.name!r}, {self.module.__name__!r})"
+
+
+_backends: Dict[str, Callable[[], RecipeStorage]] = {}
+_storage: Optional[RecipeStorage] = None
+_storage_lock = threading.Lock()
+
+
+def register_backend(name: str, loader: Callable[[], RecipeStorage]):
+    #Register a loader for STORAGE_TYPE == name. Loaders run at most once, on
+    #first use, so a backend's imports and connections only happen if selected.
+    _backends[name] = loader
+
+
+def module_backend(name: str, module_name: str) -> Callable[[], RecipeStorage]:
+    return lambda: ModuleStorage(name, importlib.import_module(module_name))
+
+
+register_backend("file", module_backend("file", "database.recipe_storage"))
+register_backend("mongo", module_backend("mongo", "database.mongo_recipe_storage"))
+register_backend("sqlite", module_backend("sqlite", "database.sqlite_recipe_storage"))
+
+
+def load_backend(name: str) -> RecipeStorage:
+    loader = _backends.get(name)
+    if loader is None:
+        logger.error(f"Unknown storage type: {name}, falling back to file storage")
+        name, loader = "file", _backends["file"]
+    storage = loader()
+    logger.info(f"Using {name} recipe storage")
+    return storage
+
+
+def get_storage() -> RecipeStorage:
+    #The configured backend, loaded on the first call (the server does this at startup)
+    storage = _storage
+    if storage is None:
+        storage = _resolve()
+    return storage
+
+
+def _resolve() -> RecipeStorage:
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = load_backend(STORAGE_TYPE)
+        return _storage
+
+
+def set_storage(storage: Optional[RecipeStorage]) -> Optional[RecipeStorage]:
+    #Replace the active backend (None re-resolves STORAGE_TYPE on next use); returns the previous one
+    global _storage
+    with _storage_lock:
+        previous, _storage = _storage, storage
+    return previous
+
+
+@contextmanager
+def use_storage(storage: RecipeStorage) -> Iterator[RecipeStorage]:
+    #Swap in a backend for the duration of a block, e.g. an in-memory fake in tests
+    previous = set_storage(storage)
+    try:
+        yield storage
+    finally:
+        set_storage(previous)
+
+
+# The following functions delegate to the active backend
 # This creates a consistent API regardless of which storage backend is used
 
-def Recipe(*args, **kwargs):
-    
-    #Factory function for creating Recipe objects
-    module = get_storage_module()
-    return module.Recipe(*args, **kwargs)
-
-def save_recipe(recipe):
-    
-    #Save a recipe to the storage backend
-    module = get_storage_module()
-    return module.save_recipe(recipe)
-
-def get_user_recipes(user_id):
-    
-    #Get all recipes for a specific user
-    module = get_storage_module()
-    return module.get_user_recipes(user_id)
-
-def get_recipe_by_id(user_id, recipe_id):
-    
-    #Get a specific recipe by its ID
-    module = get_storage_module()
-    return module.get_recipe_by_id(user_id, recipe_id)
-
-def update_recipe(recipe):
-    
-    #Update an existing recipe
-    module = get_storage_module()
-    return module.update_recipe(recipe)
-
-def delete_recipe(user_id, recipe_id):
-    
-    #Delete a recipe
-    module = get_storage_module()
-    return module.delete_recipe(user_id, recipe_id)
-
-def toggle_favorite(user_id, recipe_id, is_favorite):
-    
-    #Toggle the favorite status of a recipe
-    module = get_storage_module()
-    return module.toggle_favorite(user_id, recipe_id, is_favorite)
+def save_recipe(recipe: Recipe) -> Recipe:
+    return get_storage().save_recipe(recipe)
+
+def get_user_recipes(user_id: str) -> List[Recipe]:
+    return get_storage().get_user_recipes(user_id)
+
+def get_user_recipe_summaries(user_id: str) -> List[Dict[str, Any]]:
+    return get_storage().get_user_recipe_summaries(user_id)
+
+def get_recipe_by_id(user_id: str, recipe_id: str) -> Optional[Recipe]:
+    return get_storage().get_recipe_by_id(user_id, recipe_id)
+
+def update_recipe(recipe: Recipe) -> Recipe:
+    return get_storage().update_recipe(recipe)
+
+def delete_recipe(user_id: str, recipe_id: str) -> bool:
+    return get_storage().delete_recipe(user_id, recipe_id)
+
+def toggle_favorite(user_id: str, recipe_id: str, is_favorite: bool) -> Optional[Recipe]:
+    return get_storage().toggle_favorite(user_id, recipe_id, is_favorite)
+
+def toggle_shared(user_id: str, recipe_id: str, is_shared: bool) -> Optional[Recipe]:
+    return get_storage().toggle_shared(user_id, recipe_id, is_shared)
+
+def get_shared_recipes() -> List[Recipe]:
+    return get_storage().get_shared_recipes()
 
 # Expose the interface (allowing for future swapping of implementations)
 __all__ = [
     "Recipe",
+    "RecipeStorage",
+    "register_backend",
+    "get_storage",
+    "set_storage",
+    "use_storage",
     "save_recipe",
     "get_user_recipes",
+    "get_user_recipe_summaries",
     "get_recipe_by_id",
     "update_recipe",
     "delete_recipe",
     "toggle_favorite",
     "toggle_shared",
     "get_shared_recipes"
-] 
\ No newline at end of file
+]
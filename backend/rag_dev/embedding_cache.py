@@ -0,0 +1,196 @@
+#Content-hash keyed embedding cache shared by the server and ingestion.
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+logger = logging.getLogger("embedding_cache")
+
+EMBEDDING_MODEL_NAME = "text-embedding-3-small"
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite")
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.environ.get("EMBEDDING_CACHE_MEMORY_ITEMS", "10000"))
+# USD per 1M input tokens, used only to estimate savings
+EMBEDDING_PRICE_PER_MTOK = float(os.environ.get("EMBEDDING_PRICE_PER_MTOK", "0.02"))
+
+
+class SQLiteEmbeddingStore:
+
+    #On-disk tier: one row per content hash with the vector stored as float32 bytes
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+
+    #Drop-in Embeddings wrapper. Texts are keyed by sha256(model + text); lookups
+    #go memory LRU -> SQLite -> underlying model, and only misses reach the API.
+    def __init__(
+        self,
+        underlying: Embeddings,
+        namespace: str,
+        store: Optional[SQLiteEmbeddingStore] = None,
+        memory_items: int = EMBEDDING_CACHE_MEMORY_ITEMS,
+    ):
+        self.underlying = underlying
+        self.namespace = namespace
+        self.store = store
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.api_calls = 0
+        self.api_seconds = 0.0
+        self.saved_chars = 0
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, texts: List[str]):
+        #Resolve what the caches can; return vectors (None for misses) and the missing texts
+        keys = [self._key(text) for text in texts]
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        pending = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    vectors[i] = vector
+                    self.memory_hits += 1
+                    self.saved_chars += len(texts[i])
+                else:
+                    pending.setdefault(key, []).append(i)
+
+        if pending and self.store is not None:
+            found = self.store.get_many(list(pending))
+            with self._lock:
+                for key, vector in found.items():
+                    self._remember(key, vector)
+                    for i in pending.pop(key):
+                        vectors[i] = vector
+                        self.disk_hits += 1
+                        self.saved_chars += len(texts[i])
+
+        # Identical texts in one call are embedded once
+        missing = list(pending.items())
+        return vectors, missing
+
+    def _store(self, vectors, missing, embedded: List[List[float]], elapsed: float):
+        new_items = {}
+        with self._lock:
+            self.api_calls += 1
+            self.api_seconds += elapsed
+            for (key, indexes), vector in zip(missing, embedded):
+                self.misses += len(indexes)
+                self._remember(key, vector)
+                new_items[key] = vector
+                for i in indexes:
+                    vectors[i] = vector
+        if self.store is not None:
+            self.store.put_many(new_items)
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = self._lookup(texts)
+        if not missing:
+            return vectors
+        start = time.perf_counter()
+        embedded = self.underlying.embed_documents([texts[indexes[0]] for _, indexes in missing])
+        return self._store(vectors, missing, embedded, time.perf_counter() - start)
+
+    def embed_query(self, text: str) -> List[float]:
+        vectors, missing = self._lookup([text])
+        if not missing:
+            return vectors[0]
+        start = time.perf_counter()
+        embedded = [self.underlying.embed_query(text)]
+        return self._store(vectors, missing, embedded, time.perf_counter() - start)[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = self._lookup(texts)
+        if not missing:
+            return vectors
+        start = time.perf_counter()
+        embedded = await self.underlying.aembed_documents([texts[indexes[0]] for _, indexes in missing])
+        return self._store(vectors, missing, embedded, time.perf_counter() - start)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vectors, missing = self._lookup([text])
+        if not missing:
+            return vectors[0]
+        start = time.perf_counter()
+        embedded = [await self.underlying.aembed_query(text)]
+        return self._store(vectors, missing, embedded, time.perf_counter() - start)[0]
+
+    def stats(self) -> Dict[str, object]:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        avg_call = self.api_seconds / self.api_calls if self.api_calls else 0.0
+        # ~4 characters per token is the usual estimate for English text
+        saved_tokens = self.saved_chars / 4
+        return {
+            "memory_items": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "api_calls": self.api_calls,
+            "avg_api_call_seconds": avg_call,
+            "est_saved_tokens": int(saved_tokens),
+            "est_saved_cost_usd": saved_tokens / 1e6 * EMBEDDING_PRICE_PER_MTOK,
+        }
+
+
+def create_embedding_model(cache_path: Optional[str] = EMBEDDING_CACHE_PATH) -> CachedEmbeddings:
+    #The OpenAI embedding model used everywhere, wrapped in the shared cache
+    store = SQLiteEmbeddingStore(cache_path) if cache_path else None
+    return CachedEmbeddings(OpenAIEmbeddings(model=EMBEDDING_MODEL_NAME), EMBEDDING_MODEL_NAME, store)
@@ -12,21 +12,30 @@ load_dotenv()
 # Configure Gemini API using the API key from the environment variables
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
+# Construct the prompt for Gemini Pro Vision to extract ingredients
+INGREDIENTS_PROMPT = (
+    "Extract the list of ingredients shown in the image. "
+    "Provide only a comma-separated list of ingredient names."
+)
+
+# Initialize the Gemini Pro Vision model once and reuse it
+model = genai.GenerativeModel('gemini-1.5-pro')
+
 def extract_ingredients_from_image(image_bytes: bytes) -> str:
 
     #Processes an image using Gemini Pro Vision to extract ingredients & Returns a comma-separated list of ingredient names.
     img = Image.open(io.BytesIO(image_bytes))
     
-    # Construct the prompt for Gemini Pro Vision to extract ingredients
-    prompt = (
-        "Extract the list of ingredients shown in the image. "
-        "Provide only a comma-separated list of ingredient names."
-    )
-    
-    # Initialize the Gemini Pro Vision model
-    model = genai.GenerativeModel('gemini-1.5-pro')
-    
     # Generate response using the image and text prompt
-    response = model.generate_content([prompt, img])
+    response = model.generate_content([INGREDIENTS_PROMPT, img])
     
     return response.text
+
+async def extract_ingredients_from_image_async(image_bytes: bytes) -> str:
+
+    #Non-blocking variant for async endpoints; the Gemini call does not hold the event loop.
+    img = Image.open(io.BytesIO(image_bytes))
+
+    response = await model.generate_content_async([INGREDIENTS_PROMPT, img])
+
+    return response.text
@@ -0,0 +1,226 @@
+#Shared outbound HTTP layer: one pooled httpx.AsyncClient for the server and one
+#pooled requests.Session for sync callers, with per-host connection limits,
+#timeouts, jittered retries and per-destination latency histograms.
+
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("http_client")
+
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.environ.get("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+# Retries after the first attempt; only idempotent methods retry unless the caller opts in
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_BASE = float(os.environ.get("HTTP_BACKOFF_BASE", "0.2"))
+HTTP_BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", "2"))
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+def _destination(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter: uniform over [0, capped exponential]
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+
+class LatencyHistograms:
+
+    #Per-destination request counts, errors, retries and a latency histogram.
+    #Shared by the sync and async clients, so it is guarded by a thread lock.
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self._lock = threading.Lock()
+        self._destinations: Dict[str, Dict[str, Any]] = {}
+
+    def _entry(self, destination: str) -> Dict[str, Any]:
+        entry = self._destinations.get(destination)
+        if entry is None:
+            entry = {
+                "requests": 0, "errors": 0, "retries": 0, "total_ms": 0.0,
+                "buckets": [0] * (len(self.buckets_ms) + 1),
+            }
+            self._destinations[destination] = entry
+        return entry
+
+    def observe(self, destination: str, elapsed_ms: float, error: bool = False):
+        bucket = next((i for i, bound in enumerate(self.buckets_ms) if elapsed_ms <= bound), len(self.buckets_ms))
+        with self._lock:
+            entry = self._entry(destination)
+            entry["requests"] += 1
+            entry["errors"] += error
+            entry["total_ms"] += elapsed_ms
+            entry["buckets"][bucket] += 1
+
+    def retried(self, destination: str):
+        with self._lock:
+            self._entry(destination)["retries"] += 1
+
+    def _quantile(self, buckets: List[int], q: float) -> Optional[float]:
+        #Upper bound of the bucket holding the q-quantile (None past the last bound)
+        total = sum(buckets)
+        if not total:
+            return None
+        running = 0
+        for i, count in enumerate(buckets):
+            running += count
+            if running >= q * total:
+                return float(self.buckets_ms[i]) if i < len(self.buckets_ms) else None
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            destinations = {name: dict(entry, buckets=list(entry["buckets"])) for name, entry in self._destinations.items()}
+        labels = [f"le_{bound}ms" for bound in self.buckets_ms] + ["inf"]
+        return {
+            name: {
+                "requests": entry["requests"],
+                "errors": entry["errors"],
+                "retries": entry["retries"],
+                "avg_ms": entry["total_ms"] / entry["requests"] if entry["requests"] else 0.0,
+                "p50_ms": self._quantile(entry["buckets"], 0.5),
+                "p99_ms": self._quantile(entry["buckets"], 0.99),
+                "histogram": dict(zip(labels, entry["buckets"])),
+            }
+            for name, entry in destinations.items()
+        }
+
+
+histograms = LatencyHistograms()
+
+_async_client: Optional[httpx.AsyncClient] = None
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    #The shared AsyncClient; created lazily so it binds to the running event loop
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_keepalive_connections=HTTP_MAX_CONNECTIONS_PER_HOST),
+        )
+    return _async_client
+
+
+def get_session() -> requests.Session:
+    #The shared Session; urllib3 keeps one pool per host of at most
+    #HTTP_MAX_CONNECTIONS_PER_HOST connections, and callers block for a free one
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=HTTP_MAX_CONNECTIONS_PER_HOST, pool_block=True)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+async def aclose():
+    #Close the AsyncClient, e.g. on server shutdown
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    _host_semaphores.clear()
+
+
+def _retries(method: str, retries: Optional[int]) -> int:
+    if retries is not None:
+        return retries
+    return HTTP_MAX_RETRIES if method.upper() in IDEMPOTENT_METHODS else 0
+
+
+async def arequest(method: str, url: str, *, retries: Optional[int] = None, **kwargs) -> httpx.Response:
+    #Send a request on the shared AsyncClient. Connection errors, timeouts and
+    #429/502/503/504 are retried with jittered backoff; the last response (or
+    #error) is returned (or raised) once retries run out.
+    destination = _destination(url)
+    semaphore = _host_semaphores.get(destination)
+    if semaphore is None:
+        semaphore = _host_semaphores.setdefault(destination, asyncio.Semaphore(HTTP_MAX_CONNECTIONS_PER_HOST))
+    client = get_async_client()
+    attempts = _retries(method, retries) + 1
+    for attempt in range(attempts):
+        start = time.perf_counter()
+        try:
+            async with semaphore:
+                response = await client.request(method, url, **kwargs)
+        except (httpx.TransportError, httpx.TimeoutException) as e:
+            histograms.observe(destination, (time.perf_counter() - start) * 1e3, error=True)
+            if attempt + 1 >= attempts:
+                raise
+            logger.warning(f"{method} {url} failed ({e!r}), retrying")
+        else:
+            failed = response.status_code in RETRY_STATUSES
+            histograms.observe(destination, (time.perf_counter() - start) * 1e3, error=response.status_code >= 500)
+            if not failed or attempt + 1 >= attempts:
+                return response
+            logger.warning(f"{method} {url} returned {response.status_code}, retrying")
+        histograms.retried(destination)
+        await asyncio.sleep(_backoff(attempt))
+
+
+async def aget(url: str, **kwargs) -> httpx.Response:
+    return await arequest("GET", url, **kwargs)
+
+
+async def apost(url: str, **kwargs) -> httpx.Response:
+    return await arequest("POST", url, **kwargs)
+
+
+def request(method: str, url: str, *, retries: Optional[int] = None, **kwargs) -> requests.Response:
+    #Sync counterpart of arequest on the shared Session
+    destination = _destination(url)
+    kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_TIMEOUT))
+    session = get_session()
+    attempts = _retries(method, retries) + 1
+    for attempt in range(attempts):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            histograms.observe(destination, (time.perf_counter() - start) * 1e3, error=True)
+            if attempt + 1 >= attempts:
+                raise
+            logger.warning(f"{method} {url} failed ({e!r}), retrying")
+        else:
+            failed = response.status_code in RETRY_STATUSES
+            histograms.observe(destination, (time.perf_counter() - start) * 1e3, error=response.status_code >= 500)
+            if not failed or attempt + 1 >= attempts:
+                return response
+            logger.warning(f"{method} {url} returned {response.status_code}, retrying")
+        histograms.retried(destination)
+        time.sleep(_backoff(attempt))
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def http_stats() -> Dict[str, Any]:
+    return histograms.stats()
@@ -0,0 +1,121 @@
+#FAISS index factory: flat, IVF-Flat, HNSW and IVF-PQ segments.
+
+import os
+import uuid
+import math
+import logging
+from typing import List, Optional
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger("index_factory")
+
+FLAT = "flat"
+IVF_FLAT = "ivf_flat"
+HNSW = "hnsw"
+IVF_PQ = "ivf_pq"
+INDEX_TYPES = (FLAT, IVF_FLAT, HNSW, IVF_PQ)
+
+FAISS_INDEX_TYPE = os.environ.get("FAISS_INDEX_TYPE", FLAT).lower()
+# Segments smaller than this stay flat: exact search is already fast there and
+# IVF needs enough points to train its centroids
+ANN_MIN_VECTORS = int(os.environ.get("FAISS_ANN_MIN_VECTORS", "20000"))
+TRAIN_SAMPLE_SIZE = int(os.environ.get("FAISS_TRAIN_SAMPLE", "100000"))
+IVF_NLIST = int(os.environ.get("FAISS_IVF_NLIST", "0"))  # 0 = 4 * sqrt(n)
+PQ_M = int(os.environ.get("FAISS_PQ_M", "64"))
+PQ_NBITS = int(os.environ.get("FAISS_PQ_NBITS", "8"))
+HNSW_M = int(os.environ.get("FAISS_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("FAISS_HNSW_EF_CONSTRUCTION", "200"))
+# Query-time knobs
+NPROBE = int(os.environ.get("FAISS_NPROBE", "16"))
+EF_SEARCH = int(os.environ.get("FAISS_EF_SEARCH", "64"))
+
+
+def factory_string(index_type: str, n: int, d: int) -> str:
+    #faiss.index_factory description for an index over n vectors of dimension d
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type: {index_type}")
+    if index_type == FLAT:
+        return "Flat"
+    if index_type == HNSW:
+        return f"HNSW{HNSW_M}"
+
+    nlist = IVF_NLIST or max(1, int(4 * math.sqrt(n)))
+    # k-means wants ~39 training points per centroid
+    nlist = max(1, min(nlist, n // 39))
+    if index_type == IVF_FLAT:
+        return f"IVF{nlist},Flat"
+
+    # PQ needs the sub-quantizer count to divide the dimension
+    m = PQ_M
+    while d % m:
+        m -= 1
+    return f"IVF{nlist},PQ{m}x{PQ_NBITS}"
+
+
+def build_index(vectors: np.ndarray, index_type: str = FAISS_INDEX_TYPE, min_ann_vectors: int = ANN_MIN_VECTORS) -> faiss.Index:
+    #Build, train on a sample if required, and fill an index
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+    if n < min_ann_vectors:
+        index_type = FLAT
+    description = factory_string(index_type, n, d)
+    index = faiss.index_factory(d, description, faiss.METRIC_L2)
+
+    if index_type == HNSW:
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    if not index.is_trained:
+        rng = np.random.default_rng(0)
+        sample_size = min(n, TRAIN_SAMPLE_SIZE)
+        sample = vectors[rng.choice(n, sample_size, replace=False)] if sample_size < n else vectors
+        logger.info(f"Training {description} on {sample_size} vector(s)")
+        index.train(sample)
+    index.add(vectors)
+    tune_index(index)
+    return index
+
+
+def tune_index(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> faiss.Index:
+    #Apply query-time recall/latency knobs (no-op for flat indexes)
+    nprobe = NPROBE if nprobe is None else nprobe
+    ef_search = EF_SEARCH if ef_search is None else ef_search
+    try:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    except RuntimeError:
+        pass
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+    return index
+
+
+def search_parameters(index: faiss.Index, selector) -> faiss.SearchParameters:
+    #Restrict a search to the ids accepted by selector, keeping the index's own
+    #nprobe / efSearch (per-search parameters would otherwise reset them)
+    try:
+        ivf = faiss.extract_index_ivf(index)
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    except RuntimeError:
+        pass
+    if hasattr(index, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def describe_index(index: faiss.Index) -> str:
+    return type(index).__name__
+
+
+def build_store(embeddings, texts: List[str], vectors, metadatas: List[dict], index_type: str = FAISS_INDEX_TYPE) -> FAISS:
+    #LangChain FAISS store over an index built by build_index
+    vectors = np.asarray(vectors, dtype=np.float32)
+    index = build_index(vectors, index_type)
+    ids = [str(uuid.uuid4()) for _ in texts]
+    docstore = InMemoryDocstore({
+        doc_id: Document(page_content=text, metadata=metadata or {}, id=doc_id)
+        for doc_id, text, metadata in zip(ids, texts, metadatas)
+    })
+    return FAISS(embeddings, index, docstore, dict(enumerate(ids)))
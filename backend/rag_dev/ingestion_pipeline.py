@@ -0,0 +1,308 @@
+#Batched, parallel embedding of chunks with retry and resumable checkpoints.
+
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("ingestion_pipeline")
+
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "64"))
+EMBED_MAX_WORKERS = int(os.environ.get("EMBED_MAX_WORKERS", "4"))
+EMBED_MAX_RETRIES = int(os.environ.get("EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF_SECONDS = float(os.environ.get("EMBED_BACKOFF_SECONDS", "1.0"))
+CHECKPOINT_DIR = os.environ.get("INGESTION_CHECKPOINT_DIR", "ingestion_checkpoints")
+# Persist the index and checkpoint after this many committed batches
+CHECKPOINT_EVERY = int(os.environ.get("INGESTION_CHECKPOINT_EVERY", "10"))
+
+
+class BatchFailed(Exception):
+    #Raised when a batch still fails after every retry
+    def __init__(self, start: int, error: Exception):
+        super().__init__(f"Embedding batch at chunk {start} failed: {error}")
+        self.start = start
+        self.error = error
+
+
+_FINGERPRINT_BLOCK = 1024 * 1024
+# (absolute path, size, mtime_ns) -> fingerprint, so a file is hashed once per version per process
+_fingerprints: Dict[Tuple[str, int, int], str] = {}
+_fingerprints_lock = threading.Lock()
+
+
+def file_fingerprint(file_path: str) -> str:
+    #Identifies a file's content so a checkpoint is never applied to a changed
+    #file, yet still matches after the file is copied again or moved in (both
+    #change its mtime or path)
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _fingerprints_lock:
+        cached = _fingerprints.get(key)
+    if cached is not None:
+        return cached
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(_FINGERPRINT_BLOCK), b""):
+            digest.update(block)
+    fingerprint = digest.hexdigest()
+    with _fingerprints_lock:
+        _fingerprints[key] = fingerprint
+    return fingerprint
+
+
+class Checkpoint:
+
+    #Records how many leading chunks of a file's chunk stream are already handled
+    #(indexed or skipped as duplicates). Chunking is deterministic, so for an
+    #unchanged file the same offset always means the same chunk.
+    def __init__(self, file_path: str, checkpoint_dir: str = CHECKPOINT_DIR):
+        self.file_path = file_path
+        self.fingerprint = file_fingerprint(file_path)
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self.path = os.path.join(checkpoint_dir, f"{self.fingerprint}.json")
+
+    def load(self) -> Tuple[int, Optional[dict]]:
+        #(chunks done, source position recorded with them, if any)
+        if not os.path.exists(self.path):
+            return 0, None
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return 0, None
+        return int(data.get("chunks_done", 0)), data.get("position")
+
+    def save(self, chunks_done: int, **extra):
+        data = {"file": self.file_path, "chunks_done": chunks_done, **extra}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ResumableChunks(ABC):
+
+    #A chunk source that can restart mid-file without replaying what is done.
+    #position(offset) describes where chunk `offset` sits in the source (kept in
+    #the checkpoint); resume(position, offset) makes the next iteration start
+    #there. Plain iterables are resumed by skipping chunks instead.
+    @abstractmethod
+    def position(self, offset: int) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def resume(self, position: dict, offset: int):
+        ...
+
+    @abstractmethod
+    def __iter__(self):
+        ...
+
+
+class EmbeddingPipeline:
+
+    #Embeds chunks in fixed-size batches on a bounded thread pool. Batches are
+    #committed to the vector store strictly in order, so the checkpoint is always
+    #a prefix of the chunk list and an interrupted file resumes exactly there.
+    def __init__(
+        self,
+        embeddings,
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_workers: int = EMBED_MAX_WORKERS,
+        max_retries: int = EMBED_MAX_RETRIES,
+        backoff_seconds: float = EMBED_BACKOFF_SECONDS,
+        checkpoint_every: int = CHECKPOINT_EVERY,
+        checkpoint_dir: str = CHECKPOINT_DIR,
+    ):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_dir = checkpoint_dir
+
+    def _embed_with_retry(self, texts: List[str], start: int) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise BatchFailed(start, e)
+                # Exponential backoff with full jitter
+                delay = random.uniform(0, self.backoff_seconds * (2 ** attempt))
+                logger.warning(f"Embedding batch at chunk {start} failed ({e}); retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def run(
+        self,
+        file_path: str,
+        chunks: Iterable,
+        add_embeddings: Callable[[List[str], List[List[float]], List[dict]], None],
+        save_index: Callable[[], None],
+        chunk_filter: Optional[Callable[[list], list]] = None,
+        finalize: bool = True,
+    ) -> Dict[str, float]:
+        #Embed and add a stream of chunks; returns a report with throughput and resume info.
+        #chunk_filter (e.g. deduplication) runs per batch after resume offsets are applied.
+        #With finalize=False the caller commits the tail of the file together with
+        #other files and then calls clear_checkpoint; until then a crash resumes
+        #from the last periodic checkpoint.
+        checkpoint = Checkpoint(file_path, self.checkpoint_dir)
+        resumed_from, position = checkpoint.load()
+        resumable = isinstance(chunks, ResumableChunks)
+        if resumed_from:
+            logger.info(f"Resuming '{file_path}' from chunk {resumed_from}")
+            if resumable and position is not None:
+                chunks.resume(position, resumed_from)
+                stream = iter(chunks)
+            else:
+                stream = iter(chunks)
+                for _ in islice(stream, resumed_from):
+                    pass
+        else:
+            stream = iter(chunks)
+
+        def save_checkpoint(**extra):
+            if resumable:
+                extra["position"] = chunks.position(done)
+            checkpoint.save(done, **extra)
+
+        done = resumed_from
+        embedded = 0
+        committed_batches = 0
+        started_at = time.perf_counter()
+        # Batches keyed by their offset in the stream: (stream length, kept chunks)
+        batches: Dict[int, tuple] = {}
+        finished: Dict[int, List[List[float]]] = {}
+        error: Optional[BatchFailed] = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {}
+            next_start = resumed_from
+            exhausted = False
+
+            def submit_more():
+                nonlocal next_start, exhausted
+                # Bound work in flight so memory does not grow with file size;
+                # chunks are only pulled from the stream as slots free up
+                while not exhausted and len(batches) < self.max_workers * 2:
+                    raw = list(islice(stream, self.batch_size))
+                    if not raw:
+                        exhausted = True
+                        break
+                    start = next_start
+                    next_start += len(raw)
+                    kept = chunk_filter(raw) if chunk_filter else raw
+                    batches[start] = (len(raw), kept)
+                    if kept:
+                        texts = [doc.page_content for doc in kept]
+                        pending[executor.submit(self._embed_with_retry, texts, start)] = start
+                    else:
+                        finished[start] = []
+
+            submit_more()
+            while batches:
+                if pending:
+                    completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        start = pending.pop(future)
+                        try:
+                            finished[start] = future.result()
+                        except BatchFailed as e:
+                            error = error or e
+
+                # Commit the contiguous prefix of finished batches
+                while done in finished:
+                    length, kept = batches.pop(done)
+                    vectors = finished.pop(done)
+                    if kept:
+                        add_embeddings(
+                            [doc.page_content for doc in kept],
+                            vectors,
+                            [doc.metadata for doc in kept],
+                        )
+                    done += length
+                    embedded += len(kept)
+                    committed_batches += 1
+                    if committed_batches % self.checkpoint_every == 0:
+                        save_index()
+                        save_checkpoint()
+
+                if error is not None:
+                    if not pending:
+                        break
+                else:
+                    submit_more()
+
+        elapsed = time.perf_counter() - started_at
+        report = {
+            "chunks": done,
+            "embedded": embedded,
+            "resumed_from": resumed_from,
+            "seconds": elapsed,
+            "chunks_per_second": embedded / elapsed if elapsed > 0 else 0.0,
+        }
+
+        if error is not None:
+            if embedded:
+                save_index()
+            save_checkpoint(error=str(error))
+            report["error"] = str(error)
+        elif finalize:
+            if embedded:
+                save_index()
+            checkpoint.clear()
+        return report
+
+    def _recorded_checkpoints(self) -> List[Tuple[str, str]]:
+        #(checkpoint path, name of the file it was written for) of every checkpoint on disk
+        recorded = []
+        if not os.path.isdir(self.checkpoint_dir):
+            return recorded
+        for entry in os.listdir(self.checkpoint_dir):
+            if not entry.endswith(".json"):
+                continue
+            path = os.path.join(self.checkpoint_dir, entry)
+            try:
+                with open(path, "r") as f:
+                    recorded.append((path, os.path.basename(json.load(f)["file"])))
+            except (json.JSONDecodeError, IOError, KeyError, TypeError):
+                continue
+        return recorded
+
+    def interrupted_files(self, folders: Sequence[str], extensions: Tuple[str, ...]) -> List[str]:
+        #Files in folders with an outstanding checkpoint, i.e. a previous run
+        #crashed or gave up on them. Matched by name, so a file copied or moved
+        #back in is found too; run() then checks the content still matches.
+        names = {name for _, name in self._recorded_checkpoints()}
+        found = []
+        for folder in folders:
+            if not os.path.isdir(folder):
+                continue
+            for name in sorted(os.listdir(folder)):
+                if name in names and name.lower().endswith(extensions):
+                    found.append(os.path.join(folder, name))
+        return found
+
+    def clear_checkpoint(self, file_path: str):
+        # Checkpoints of earlier versions of the file are superseded too, or the
+        # startup scan would queue it again on every start
+        name = os.path.basename(file_path)
+        for path, recorded_name in self._recorded_checkpoints():
+            if recorded_name == name:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,194 @@
+#Single-writer ingestion queue: coalesces new files into one index commit and
+#debounces the reload notifications sent to the server.
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("ingestion_queue")
+
+# Quiet period after the last new file before a pass starts, so a folder copy
+# of many files becomes one commit instead of one per file
+INGEST_COALESCE_SECONDS = float(os.environ.get("INGEST_COALESCE_SECONDS", "2"))
+INGEST_MAX_BATCH_FILES = int(os.environ.get("INGEST_MAX_BATCH_FILES", "50"))
+# A reload is sent once commits stop for this long, but never later than the max delay
+RELOAD_DEBOUNCE_SECONDS = float(os.environ.get("RELOAD_DEBOUNCE_SECONDS", "5"))
+RELOAD_MAX_DELAY_SECONDS = float(os.environ.get("RELOAD_MAX_DELAY_SECONDS", "30"))
+
+
+class IngestionQueue:
+
+    #Watcher callbacks only enqueue paths; one writer thread drains the queue.
+    #ingest(paths) processes a group of files as a single commit and returns
+    #(anything added to the index, paths that failed); if it raises, the whole
+    #group counts as failed. notify() tells the server.
+    def __init__(
+        self,
+        ingest: Callable[[List[str]], Tuple[bool, List[str]]],
+        notify: Callable[[], None],
+        coalesce_seconds: float = INGEST_COALESCE_SECONDS,
+        max_batch_files: int = INGEST_MAX_BATCH_FILES,
+        debounce_seconds: float = RELOAD_DEBOUNCE_SECONDS,
+        max_delay_seconds: float = RELOAD_MAX_DELAY_SECONDS,
+    ):
+        self.ingest = ingest
+        self.notify = notify
+        self.coalesce_seconds = coalesce_seconds
+        self.max_batch_files = max_batch_files
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+
+        self._cond = threading.Condition()
+        self._pending: "OrderedDict[str, float]" = OrderedDict()  # path -> enqueued at
+        self._last_submit = 0.0
+        self._in_progress: Dict[str, float] = {}
+        self._unnotified_since: Optional[float] = None
+        self._last_commit = 0.0
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.files_ingested = 0
+        self.files_failed = 0
+        self.duplicates_coalesced = 0
+        self.commits = 0
+        self.reloads = 0
+        self.reloads_debounced = 0
+        self.last_pass: Dict[str, float] = {}
+
+    def submit(self, file_path: str) -> bool:
+        #Queue a file; False if it is already waiting
+        now = time.time()
+        with self._cond:
+            self._last_submit = now
+            if file_path in self._pending:
+                self.duplicates_coalesced += 1
+                return False
+            self._pending[file_path] = now
+            self._cond.notify()
+        return True
+
+    def start(self) -> threading.Thread:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="index-writer", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: Optional[float] = None):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _reload_due(self) -> Optional[float]:
+        if self._unnotified_since is None:
+            return None
+        return min(self._last_commit + self.debounce_seconds, self._unnotified_since + self.max_delay_seconds)
+
+    def _take_batch(self) -> List[str]:
+        #Move up to max_batch_files of the oldest pending paths to in-progress (lock held)
+        batch = list(self._pending)[:self.max_batch_files]
+        for path in batch:
+            self._in_progress[path] = self._pending.pop(path)
+        return batch
+
+    def _next_batch(self) -> Optional[List[str]]:
+        #Wait for a group of files or a due reload; None means only a reload is due
+        with self._cond:
+            while True:
+                now = time.time()
+                if self._stopping:
+                    # Drain what is left without waiting for the quiet period
+                    return self._take_batch() or None
+                reload_due = self._reload_due()
+                if reload_due is not None and now >= reload_due:
+                    return None
+                if self._pending:
+                    ready_at = self._last_submit + self.coalesce_seconds
+                    if now >= ready_at or len(self._pending) >= self.max_batch_files:
+                        return self._take_batch()
+                    deadline = ready_at if reload_due is None else min(ready_at, reload_due)
+                elif reload_due is not None:
+                    deadline = reload_due
+                else:
+                    deadline = None
+                self._cond.wait(None if deadline is None else max(0.0, deadline - now))
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._process(batch)
+            with self._cond:
+                reload_due = self._reload_due()
+                stopping = self._stopping and not self._pending
+                # While stopping, one reload after the last batch covers them all
+                send = reload_due is not None and (time.time() >= reload_due or stopping)
+                if send:
+                    self._unnotified_since = None
+            if send:
+                self._send_reload()
+            if stopping:
+                return
+
+    def _process(self, batch: List[str]):
+        started = time.time()
+        try:
+            changed, failed = self.ingest(batch)
+        except Exception as e:
+            logger.exception(f"Ingestion of {len(batch)} file(s) failed: {e}")
+            changed, failed = False, batch
+        finished = time.time()
+        failed = set(failed)
+        if failed:
+            logger.warning(f"Failed to ingest {len(failed)} file(s): {sorted(failed)}")
+
+        with self._cond:
+            enqueued = [self._in_progress.pop(path) for path in batch]
+            self.files_failed += len(failed)
+            self.files_ingested += len(batch) - len(failed)
+            if changed:
+                self.commits += 1
+                self._last_commit = finished
+                if self._unnotified_since is None:
+                    self._unnotified_since = finished
+                else:
+                    self.reloads_debounced += 1
+            self.last_pass = {
+                "files": len(batch),
+                "failed": len(failed),
+                "seconds": finished - started,
+                # From the oldest file entering the queue to its commit
+                "max_lag_seconds": finished - min(enqueued),
+                "committed": bool(changed),
+            }
+        logger.info(f"Index writer: {self.stats()}")
+
+    def _send_reload(self):
+        try:
+            self.notify()
+            with self._cond:
+                self.reloads += 1
+        except Exception as e:
+            logger.warning(f"Reload notification failed: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        now = time.time()
+        with self._cond:
+            oldest = min(self._pending.values(), default=None)
+            return {
+                "queue_depth": len(self._pending),
+                "in_progress": len(self._in_progress),
+                "oldest_pending_seconds": round(now - oldest, 3) if oldest is not None else 0.0,
+                "files_ingested": self.files_ingested,
+                "files_failed": self.files_failed,
+                "duplicates_coalesced": self.duplicates_coalesced,
+                "commits": self.commits,
+                "reloads": self.reloads,
+                "reloads_debounced": self.reloads_debounced,
+                "reload_pending": self._unnotified_since is not None,
+                "last_pass": dict(self.last_pass),
+            }
@@ -0,0 +1,152 @@
+#In-process BM25 inverted index, one per FAISS segment.
+
+import os
+import re
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BM25_K1 = float(os.environ.get("BM25_K1", "1.2"))
+BM25_B = float(os.environ.get("BM25_B", "0.75"))
+# Longer tokens are almost always noise (URLs, base64) and would widen the vocab array
+MAX_TOKEN_CHARS = 40
+
+_TOKEN = re.compile(r"[^\W_]+")
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have how i if in into is it its me my of on or our so than that the
+their them then there these they this to was we what when where which while who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if len(token) < 2 or len(token) > MAX_TOKEN_CHARS or token in STOPWORDS:
+            continue
+        # Crude plural folding ("eggs" -> "egg"); applied to queries and documents alike
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Segment:
+
+    #Postings in CSR form: the postings of terms[i] are doc_ids/tfs[offsets[i]:offsets[i+1]].
+    #Doc ids are positions in the segment's FAISS index, so hits resolve the same
+    #way as vector hits. Collection statistics (N, avgdl, df) are combined across
+    #segments at query time, so scores stay comparable as segments come and go.
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray, doc_lens: np.ndarray):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lens = doc_lens
+        self.term_index: Dict[str, int] = {term: i for i, term in enumerate(terms.tolist())}
+        self.total_length = int(doc_lens.sum())
+
+    @classmethod
+    def from_texts(cls, texts: Sequence[str]) -> "BM25Segment":
+        vocab: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        tfs: List[int] = []
+        doc_lens = np.zeros(len(texts), dtype=np.int32)
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lens[doc_id] = sum(counts.values())
+            term_ids.extend(vocab.setdefault(term, len(vocab)) for term in counts)
+            doc_ids.extend([doc_id] * len(counts))
+            tfs.extend(counts.values())
+
+        # Sort postings by (term, doc) in one pass instead of per term
+        terms = sorted(vocab)
+        rank = np.empty(len(vocab), dtype=np.int64)
+        rank[[vocab[term] for term in terms]] = np.arange(len(terms))
+        term_rank = rank[np.asarray(term_ids, dtype=np.int64)]
+        doc_array = np.asarray(doc_ids, dtype=np.int32)
+        order = np.lexsort((doc_array, term_rank))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_rank, minlength=len(terms)), out=offsets[1:])
+        return cls(
+            np.array(terms, dtype=str),
+            offsets,
+            doc_array[order],
+            np.asarray(tfs, dtype=np.float32)[order],
+            doc_lens,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Segment":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["terms"], data["offsets"], data["doc_ids"], data["tfs"], data["doc_lens"])
+
+    def save(self, path: str):
+        # np.savez appends .npz unless the name already ends with it
+        with open(path, "wb") as f:
+            np.savez(f, terms=self.terms, offsets=self.offsets, doc_ids=self.doc_ids, tfs=self.tfs, doc_lens=self.doc_lens)
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_lens)
+
+    def doc_freq(self, term: str) -> int:
+        i = self.term_index.get(term)
+        return 0 if i is None else int(self.offsets[i + 1] - self.offsets[i])
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        i = self.term_index.get(term)
+        if i is None:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+
+def bm25_search(
+    segments: Sequence[Tuple[str, BM25Segment]],
+    query: str,
+    k: int,
+    k1: float = BM25_K1,
+    b: float = BM25_B,
+    masks: Optional[Dict[str, np.ndarray]] = None,
+) -> List[Tuple[str, int, float]]:
+    #Top-k (segment name, position, score) across segments; work is proportional
+    #to the postings of the query terms, not to the collection size. masks maps a
+    #segment name to a boolean array of the positions allowed to match.
+    terms = set(tokenize(query))
+    num_docs = sum(segment.num_docs for _, segment in segments)
+    if not terms or not num_docs:
+        return []
+    avgdl = max(sum(segment.total_length for _, segment in segments) / num_docs, 1.0)
+    idf = {}
+    for term in terms:
+        df = sum(segment.doc_freq(term) for _, segment in segments)
+        if df:
+            idf[term] = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+
+    hits = []
+    for name, segment in segments:
+        mask = masks.get(name) if masks else None
+        ids, contributions = [], []
+        for term, weight in idf.items():
+            posting = segment.postings(term)
+            if posting is None:
+                continue
+            doc_ids, tfs = posting
+            if mask is not None:
+                keep = mask[doc_ids]
+                doc_ids, tfs = doc_ids[keep], tfs[keep]
+            norm = k1 * (1 - b + b * segment.doc_lens[doc_ids] / avgdl)
+            ids.append(doc_ids)
+            contributions.append(weight * tfs * (k1 + 1) / (tfs + norm))
+        if not ids:
+            continue
+        doc_ids, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
+        top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        hits.extend((name, int(doc_ids[i]), float(scores[i])) for i in top)
+
+    hits.sort(key=lambda hit: -hit[2])
+    return hits[:k]
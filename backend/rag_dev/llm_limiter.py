@@ -0,0 +1,136 @@
+#Per-provider concurrency limits for LLM calls, with queueing or 429-on-overload.
+
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger("llm_limiter")
+
+# Overload modes
+QUEUE = "queue"    # wait for a free slot (bounded by queue size and timeout)
+REJECT = "reject"  # fail immediately when every slot is busy
+
+# Defaults, overridable per provider with e.g. LLM_MAX_CONCURRENCY_GEMINI=64
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "32"))
+DEFAULT_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", "256"))
+DEFAULT_QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", "30"))
+DEFAULT_OVERLOAD_MODE = os.environ.get("LLM_OVERLOAD_MODE", QUEUE).lower()
+
+
+class LimiterOverloaded(Exception):
+    #Raised when a provider has no free slot and the request cannot be queued
+    def __init__(self, provider: str, reason: str):
+        super().__init__(f"LLM provider '{provider}' overloaded: {reason}")
+        self.provider = provider
+        self.reason = reason
+
+
+class ConcurrencyLimiter:
+
+    #Caps in-flight calls to one provider. Waiters queue in FIFO order on an
+    #asyncio.Semaphore; the queue itself is bounded so overload turns into fast
+    #429s instead of unbounded latency.
+    def __init__(
+        self,
+        provider: str,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        queue_timeout: Optional[float] = DEFAULT_QUEUE_TIMEOUT,
+        mode: str = DEFAULT_OVERLOAD_MODE,
+    ):
+        if mode not in (QUEUE, REJECT):
+            raise ValueError(f"Unknown overload mode: {mode}")
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.mode = mode
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.completed = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the server's running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _acquire(self):
+        semaphore = self._get_semaphore()
+        if not semaphore.locked():
+            await semaphore.acquire()
+            return
+
+        if self.mode == REJECT:
+            self.rejected += 1
+            raise LimiterOverloaded(self.provider, "all slots busy")
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise LimiterOverloaded(self.provider, "queue full")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise LimiterOverloaded(self.provider, f"no slot within {self.queue_timeout}s")
+        finally:
+            self.waiting -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        #Hold one concurrency slot for the duration of the block
+        await self._acquire()
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._get_semaphore().release()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "provider": self.provider,
+            "mode": self.mode,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "completed": self.completed,
+        }
+
+
+def _env_override(name: str, provider: str, default):
+    value = os.environ.get(f"{name}_{provider.upper()}")
+    if value is None:
+        return default
+    return type(default)(value) if default is not None else float(value)
+
+
+_limiters: Dict[str, ConcurrencyLimiter] = {}
+
+
+def get_limiter(provider: str) -> ConcurrencyLimiter:
+    #Return the shared limiter for a provider, creating it from env config on first use
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        limiter = ConcurrencyLimiter(
+            provider,
+            max_concurrency=_env_override("LLM_MAX_CONCURRENCY", provider, DEFAULT_MAX_CONCURRENCY),
+            max_queue=_env_override("LLM_MAX_QUEUE", provider, DEFAULT_MAX_QUEUE),
+            queue_timeout=_env_override("LLM_QUEUE_TIMEOUT", provider, DEFAULT_QUEUE_TIMEOUT),
+            mode=_env_override("LLM_OVERLOAD_MODE", provider, DEFAULT_OVERLOAD_MODE).lower(),
+        )
+        _limiters[provider] = limiter
+        logger.info(f"Created LLM limiter: {limiter.stats()}")
+    return limiter
+
+
+def limiter_stats() -> Dict[str, Dict[str, object]]:
+    return {provider: limiter.stats() for provider, limiter in _limiters.items()}
@@ -0,0 +1,462 @@
+#Routes each LLM call across providers: latency-weighted choice, hedged
+#requests, fallback on errors and per-provider circuit breakers. Every attempt,
+#hedges and fallbacks included, holds a slot of its own provider's limiter.
+
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from llm_limiter import LimiterOverloaded, get_limiter
+
+logger = logging.getLogger("llm_router")
+
+# Hedge after the primary's p95 latency, once it has this many samples;
+# until then after LLM_HEDGE_DELAY seconds
+HEDGE_QUANTILE = float(os.environ.get("LLM_HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+DEFAULT_HEDGE_DELAY = float(os.environ.get("LLM_HEDGE_DELAY", "5"))
+MIN_HEDGE_DELAY = float(os.environ.get("LLM_MIN_HEDGE_DELAY", "0.05"))
+# Extra providers one call may fire while the first is still running; 0 disables hedging
+MAX_HEDGES = int(os.environ.get("LLM_MAX_HEDGES", "1"))
+LATENCY_WINDOW = int(os.environ.get("LLM_LATENCY_WINDOW", "200"))
+LATENCY_EWMA_ALPHA = 0.2
+# Consecutive failures that open a provider's breaker, and how long it stays open
+BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("LLM_BREAKER_COOLDOWN", "30"))
+
+# Breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProvidersUnavailable(Exception):
+    #Raised when every provider of a route has its breaker open
+    def __init__(self, providers: Sequence[str]):
+        super().__init__(f"No LLM provider available (breakers open: {', '.join(providers)})")
+        self.providers = list(providers)
+
+
+class InvalidAnswer(Exception):
+    #A provider answered, but the answer failed validation. If no provider gives
+    #a valid answer, the last invalid one is returned after all, so downstream
+    #parsing can still try to repair it.
+    def __init__(self, message: str, result: Any):
+        super().__init__(message)
+        self.result = result
+
+
+def parse_routes(spec: str) -> Dict[str, List[str]]:
+    #"full=gemini,openai;suggestions=ollama" -> {"full": ["gemini", "openai"], ...}
+    routes = {}
+    for part in spec.split(";"):
+        if not part.strip():
+            continue
+        endpoint, _, providers = part.partition("=")
+        routes[endpoint.strip()] = [name.strip() for name in providers.split(",") if name.strip()]
+    return routes
+
+
+class ProviderHealth:
+
+    #Latency samples and circuit breaker of one provider. The breaker opens after
+    #BREAKER_FAILURES consecutive failures; after the cooldown a single trial call
+    #is let through (half-open), and its outcome closes or re-opens it.
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.ewma: Optional[float] = None
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.invalid = 0
+        self.cancelled = 0
+        self.overloaded = 0
+        self.hedges_won = 0
+
+    def available(self, now: float) -> bool:
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self.trial_in_flight = False
+        if self.state == HALF_OPEN:
+            return not self.trial_in_flight
+        return self.state == CLOSED
+
+    def try_begin(self, now: float) -> bool:
+        #Claim a call if the breaker allows one. Checking and claiming in one step
+        #(no await in between) keeps a half-open breaker to a single trial call.
+        if not self.available(now):
+            return False
+        self.calls += 1
+        if self.state == HALF_OPEN:
+            self.trial_in_flight = True
+        return True
+
+    def record_success(self, latency: float):
+        self.successes += 1
+        self.latencies.append(latency)
+        self.ewma = latency if self.ewma is None else (
+            LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * self.ewma
+        )
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            logger.info(f"Breaker for '{self.name}' closed")
+        self.state = CLOSED
+        self.trial_in_flight = False
+
+    def record_failure(self, now: float, invalid: bool = False):
+        self.failures += 1
+        self.invalid += invalid
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logger.warning(f"Breaker for '{self.name}' opened after {self.consecutive_failures} failure(s)")
+            self.state = OPEN
+            self.opened_at = now
+        self.trial_in_flight = False
+
+    def record_cancelled(self):
+        # Lost a hedge race; says nothing about the provider's health
+        self.cancelled += 1
+        self.trial_in_flight = False
+
+    def record_overloaded(self):
+        # No free limiter slot; the provider was never called
+        self.overloaded += 1
+        self.trial_in_flight = False
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "invalid": self.invalid,
+            "cancelled": self.cancelled,
+            "overloaded": self.overloaded,
+            "hedges_won": self.hedges_won,
+            "ewma_latency": self.ewma,
+            "p50_latency": ordered[len(ordered) // 2] if ordered else None,
+            "p95_latency": ordered[min(int(0.95 * len(ordered)), len(ordered) - 1)] if ordered else None,
+        }
+
+
+class LLMRouter:
+
+    #Shared state for every routed chat model: the provider models, their health
+    #and the per-endpoint provider lists. Each call picks its primary provider at
+    #random, weighted by inverse EWMA latency, so the fastest provider takes most
+    #of the traffic while the others keep producing fresh latency samples. If the
+    #primary has not answered by its p95 latency, the next provider is fired as
+    #well and the first valid answer wins; errors fall through to the next one.
+    def __init__(
+        self,
+        providers: Dict[str, BaseChatModel],
+        routes: Optional[Dict[str, List[str]]] = None,
+        max_hedges: int = MAX_HEDGES,
+        hedge_quantile: float = HEDGE_QUANTILE,
+        default_hedge_delay: float = DEFAULT_HEDGE_DELAY,
+        rng: Optional[random.Random] = None,
+        limiter: Callable[[str], Any] = get_limiter,
+    ):
+        if not providers:
+            raise ValueError("LLMRouter needs at least one provider")
+        self.providers = providers
+        self.routes = routes or {}
+        for endpoint, names in self.routes.items():
+            unknown = [name for name in names if name not in providers]
+            if unknown:
+                raise ValueError(f"Route '{endpoint}' uses unknown LLM provider(s): {', '.join(unknown)}")
+        self.max_hedges = max_hedges
+        self.hedge_quantile = hedge_quantile
+        self.default_hedge_delay = default_hedge_delay
+        self.rng = rng or random.Random()
+        self.limiter = limiter
+        self.health: Dict[str, ProviderHealth] = {name: ProviderHealth(name) for name in providers}
+        self.requests = 0
+        self.hedged = 0
+        self.fallbacks = 0
+
+    def route(self, endpoint: str) -> List[str]:
+        #Provider list for an endpoint; endpoints without a route use every provider
+        return self.routes.get(endpoint) or list(self.providers)
+
+    def order(self, names: Sequence[str]) -> List[str]:
+        #Available providers in the order to try them: a latency-weighted random
+        #primary, then the rest fastest first. Providers without samples are
+        #assumed to be as fast as the average known one.
+        now = time.time()
+        available = [name for name in names if self.health[name].available(now)]
+        if not available:
+            raise ProvidersUnavailable(names)
+        known = [self.health[name].ewma for name in available if self.health[name].ewma is not None]
+        default = sum(known) / len(known) if known else 1.0
+        latency = {name: max(self.health[name].ewma or default, 1e-3) for name in available}
+        primary = self.rng.choices(available, weights=[1.0 / latency[name] for name in available])[0]
+        rest = sorted((name for name in available if name != primary), key=lambda name: latency[name])
+        return [primary] + rest
+
+    def headroom(self, endpoint: str) -> bool:
+        #True if some available provider of the endpoint has a free slot and no queue
+        now = time.time()
+        for name in self.route(endpoint):
+            limiter = self.limiter(name)
+            if self.health[name].available(now) and not limiter.waiting and limiter.in_flight < limiter.max_concurrency:
+                return True
+        return False
+
+    def hedge_delay(self, name: str) -> float:
+        delay = self.health[name].quantile(self.hedge_quantile)
+        return max(delay if delay is not None else self.default_hedge_delay, MIN_HEDGE_DELAY)
+
+    def chat_model(self, endpoint: str, validator: Optional[Callable[[str], Any]] = None) -> "RoutedChatModel":
+        #A chat model bound to endpoint's provider list; validator (e.g. an output
+        #parser's parse_locally) rejects answers that would fail downstream
+        return RoutedChatModel(router=self, endpoint=endpoint, validator=validator)
+
+    async def _attempt(self, name: str, call: Callable[[BaseChatModel], Awaitable[Any]], validate):
+        #One call to one provider; the caller has already claimed it with try_begin
+        health = self.health[name]
+        try:
+            async with self.limiter(name).slot():
+                # Latency is the provider's, not the time spent queueing for a slot
+                start = time.perf_counter()
+                result = await call(self.providers[name])
+                elapsed = time.perf_counter() - start
+            if validate is not None:
+                try:
+                    validate(result)
+                except Exception as e:
+                    raise InvalidAnswer(f"{name}: {e}", result) from e
+        except asyncio.CancelledError:
+            health.record_cancelled()
+            raise
+        except LimiterOverloaded:
+            health.record_overloaded()
+            raise
+        except Exception as e:
+            health.record_failure(time.time(), invalid=isinstance(e, InvalidAnswer))
+            raise
+        health.record_success(elapsed)
+        return result
+
+    async def arun(
+        self,
+        endpoint: str,
+        call: Callable[[BaseChatModel], Awaitable[Any]],
+        validate: Optional[Callable[[Any], Any]] = None,
+    ) -> Any:
+        #Run call(model) on the endpoint's providers, hedged, returning the first valid result
+        names = self.route(endpoint)
+        candidates = self.order(names)
+        self.requests += 1
+        pending: Dict[asyncio.Task, str] = {}
+        hedges = 0
+        error: Optional[BaseException] = None
+
+        def launch() -> Optional[float]:
+            # Next candidate whose breaker still admits a call (a half-open one may
+            # have been claimed by another request since order() ran)
+            now = time.time()
+            while candidates:
+                name = candidates.pop(0)
+                if self.health[name].try_begin(now):
+                    pending[asyncio.create_task(self._attempt(name, call, validate))] = name
+                    return time.perf_counter() + self.hedge_delay(name)
+            return None
+
+        hedge_at = launch()
+        if hedge_at is None:
+            raise ProvidersUnavailable(names)
+        try:
+            while pending:
+                timeout = None
+                if candidates and hedges < self.max_hedges:
+                    timeout = max(hedge_at - time.perf_counter(), 0.0)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedges += 1
+                    self.hedged += 1
+                    logger.info(f"Hedging '{endpoint}' to '{candidates[0]}'")
+                    hedge_at = launch() or hedge_at
+                    continue
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None:
+                        if hedges:
+                            self.health[name].hedges_won += 1
+                        return task.result()
+                    logger.warning(f"LLM provider '{name}' failed for '{endpoint}': {task.exception()}")
+                    # Keep an invalid answer over an error: it may still be repairable
+                    if not isinstance(error, InvalidAnswer):
+                        error = task.exception()
+                if not pending and candidates:
+                    self.fallbacks += 1
+                    hedge_at = launch() or hedge_at
+            if error is None:
+                raise ProvidersUnavailable(names)
+            if isinstance(error, InvalidAnswer):
+                return error.result
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def run(self, endpoint: str, call: Callable[[BaseChatModel], Any], validate: Optional[Callable[[Any], Any]] = None) -> Any:
+        #Synchronous variant: no hedging, providers are tried one after another.
+        #The limiters are asyncio-based, so sync calls are bounded by the caller's
+        #thread pool instead.
+        names = self.route(endpoint)
+        self.requests += 1
+        error: Optional[BaseException] = None
+        for attempt, name in enumerate(self.order(names)):
+            health = self.health[name]
+            if not health.try_begin(time.time()):
+                continue
+            if attempt:
+                self.fallbacks += 1
+            start = time.perf_counter()
+            try:
+                result = call(self.providers[name])
+                if validate is not None:
+                    try:
+                        validate(result)
+                    except Exception as e:
+                        raise InvalidAnswer(f"{name}: {e}", result) from e
+            except Exception as e:
+                health.record_failure(time.time(), invalid=isinstance(e, InvalidAnswer))
+                logger.warning(f"LLM provider '{name}' failed for '{endpoint}': {e}")
+                if not isinstance(error, InvalidAnswer):
+                    error = e
+                continue
+            health.record_success(time.perf_counter() - start)
+            return result
+        if error is None:
+            raise ProvidersUnavailable(names)
+        if isinstance(error, InvalidAnswer):
+            return error.result
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+            "fallbacks": self.fallbacks,
+            "routes": {endpoint: self.route(endpoint) for endpoint in self.routes},
+            "providers": {name: health.stats() for name, health in self.health.items()},
+        }
+
+
+class RoutedChatModel(BaseChatModel):
+
+    #Chat model facade over an LLMRouter, so chains use it like any single model.
+    #Streaming is not hedged: the primary is used unless it fails before its
+    #first chunk, in which case the next provider takes over. Sync streaming
+    #falls back to a single (unhedged) invoke.
+    router: Any
+    endpoint: str
+    validator: Optional[Callable[[str], Any]] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "llm-router"
+
+    def _validate(self, result: ChatResult):
+        return self.validator(result.generations[0].text) if self.validator else None
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        def call(model: BaseChatModel) -> ChatResult:
+            result = model.generate([messages], stop=stop, **kwargs)
+            return ChatResult(generations=result.generations[0], llm_output=result.llm_output)
+
+        return self.router.run(self.endpoint, call, self._validate if self.validator else None)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        async def call(model: BaseChatModel) -> ChatResult:
+            result = await model.agenerate([messages], stop=stop, **kwargs)
+            return ChatResult(generations=result.generations[0], llm_output=result.llm_output)
+
+        return await self.router.arun(self.endpoint, call, self._validate if self.validator else None)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        router = self.router
+        names = router.route(self.endpoint)
+        router.requests += 1
+        error: Optional[BaseException] = None
+        for attempt, name in enumerate(router.order(names)):
+            health = router.health[name]
+            if not health.try_begin(time.time()):
+                continue
+            if attempt:
+                router.fallbacks += 1
+            started = False
+            try:
+                # The slot is held until the stream ends
+                async with router.limiter(name).slot():
+                    start = time.perf_counter()
+                    async for chunk in router.providers[name].astream(messages, stop=stop, **kwargs):
+                        started = True
+                        if run_manager:
+                            await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+                        yield ChatGenerationChunk(message=chunk)
+            except asyncio.CancelledError:
+                health.record_cancelled()
+                raise
+            except LimiterOverloaded as e:
+                health.record_overloaded()
+                logger.warning(f"LLM provider '{name}' overloaded for '{self.endpoint}' stream: {e}")
+                error = e
+                continue
+            except Exception as e:
+                health.record_failure(time.time())
+                if started:
+                    raise
+                logger.warning(f"LLM provider '{name}' failed for '{self.endpoint}' stream: {e}")
+                error = e
+                continue
+            health.record_success(time.perf_counter() - start)
+            return
+        if error is None:
+            raise ProvidersUnavailable(names)
+        raise error
@@ -0,0 +1,283 @@
+#Tolerant structured-output parsing: repair slightly malformed LLM JSON locally,
+#and only ask an LLM to fix it when that fails.
+
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.outputs import Generation
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import ValidationError
+
+from recipe_prompts import FIX_JSON_PROMPT
+
+logger = logging.getLogger("output_repair")
+
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _strip_fences(text: str) -> str:
+    #The JSON between a ```json fence (or the first "{" / "[") and the end
+    start = text.find("```")
+    if start != -1:
+        newline = text.find("\n", start)
+        body = text[newline + 1:] if newline != -1 else text[start + 3:]
+        end = body.find("```")
+        text = body if end == -1 else body[:end]
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    return text[min(starts):] if starts else text
+
+
+def _drop_trailing(out: List[str], stack: List[str]):
+    #Remove what cannot end a value: whitespace, commas, a dangling "key" or "key":
+    while True:
+        while out and out[-1].isspace():
+            out.pop()
+        if out and out[-1] == ",":
+            out.pop()
+            continue
+        if out and out[-1] == ":":
+            out.pop()
+            while out and out[-1].isspace():
+                out.pop()
+            _drop_string(out)
+            continue
+        if stack and stack[-1] == "{" and out and out[-1] == '"':
+            # A string right after "{" or "," is a key without a value
+            start = _string_start(out)
+            before = "".join(out[:start]).rstrip()
+            if before.endswith(("{", ",")):
+                del out[start:]
+                continue
+        return
+
+
+def _string_start(out: List[str]) -> int:
+    #Index of the opening quote of the string that ends out
+    i = len(out) - 2
+    while i >= 0:
+        if out[i] == '"':
+            backslashes = 0
+            j = i - 1
+            while j >= 0 and out[j] == "\\":
+                backslashes += 1
+                j -= 1
+            if backslashes % 2 == 0:
+                return i
+        i -= 1
+    return 0
+
+
+def _drop_string(out: List[str]):
+    if out and out[-1] == '"':
+        del out[_string_start(out):]
+
+
+def repair_json(text: str) -> Any:
+    #Best-effort parse of almost-JSON: markdown fences, trailing commas, single
+    #quoted strings, raw newlines in strings, Python literals and output cut off
+    #mid-way (the unfinished item is dropped and open arrays/objects are closed).
+    #Raises ValueError when the text still does not parse.
+    text = _strip_fences(text).strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    out: List[str] = []
+    stack: List[str] = []
+    starts: List[int] = []
+    quote: Optional[str] = None
+    string_start = 0
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if quote is not None:
+            if ch == "\\" and i + 1 < len(text):
+                following = text[i + 1]
+                # \' is not a JSON escape
+                out.extend(following if following == "'" else ch + following)
+                i += 2
+                continue
+            if ch == quote:
+                out.append('"')
+                quote = None
+            elif ch == '"':
+                out.append('\\"')
+            elif ch == "\n":
+                out.append("\\n")
+            elif ch == "\t":
+                out.append("\\t")
+            elif ch != "\r":
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch in "\"'":
+            quote = ch
+            string_start = len(out)
+            out.append('"')
+        elif ch in "{[":
+            stack.append(ch)
+            starts.append(len(out))
+            out.append(ch)
+        elif ch in "}]":
+            _drop_trailing(out, stack)
+            if stack and stack[-1] == ("{" if ch == "}" else "["):
+                stack.pop()
+                starts.pop()
+            out.append(ch)
+            if not stack:
+                break
+        elif ch.isalpha():
+            end = i
+            while end < len(text) and (text[end].isalnum() or text[end] == "_"):
+                end += 1
+            word = text[i:end]
+            out.append(_PYTHON_LITERALS.get(word, word))
+            i = end
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    if quote is not None:
+        # Cut off inside a string: the partial value is dropped, not guessed at
+        del out[string_start:]
+    if len(stack) > 1 and stack[-1] == "{" and stack[-2] == "[":
+        # An unfinished object in an array is an unfinished item as well
+        del out[starts.pop():]
+        stack.pop()
+    if stack:
+        _drop_trailing(out, stack)
+        for opener in reversed(stack):
+            out.append("}" if opener == "{" else "]")
+    return json.loads("".join(out))
+
+
+class RepairStats:
+
+    #How often each schema parsed cleanly, was repaired locally or by the fix-JSON
+    #LLM call, or failed. Every repair is a generation the client does not redo.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self.llm_fix_seconds = 0.0
+
+    def record(self, schema: str, outcome: str, seconds: float = 0.0):
+        with self._lock:
+            counts = self.counts.setdefault(
+                schema, {"clean": 0, "repaired_locally": 0, "repaired_by_llm": 0, "failed": 0}
+            )
+            counts[outcome] += 1
+            self.llm_fix_seconds += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {schema: dict(values) for schema, values in self.counts.items()}
+            llm_fixes = sum(values["repaired_by_llm"] for values in counts.values())
+            return {
+                "schemas": counts,
+                "regenerations_avoided": sum(
+                    values["repaired_locally"] + values["repaired_by_llm"] for values in counts.values()
+                ),
+                "llm_fixes": llm_fixes,
+                "avg_llm_fix_seconds": self.llm_fix_seconds / llm_fixes if llm_fixes else 0.0,
+            }
+
+
+repair_stats = RepairStats()
+
+
+class TolerantPydanticOutputParser(PydanticOutputParser):
+
+    #PydanticOutputParser that repairs before it gives up: strict parsing first,
+    #then repair_json, then (if a fixer chat model is set) one small LLM call that
+    #only rewrites the broken JSON. A model with a single list field also accepts
+    #a bare JSON array, e.g. a suggestions list without its {"suggestions": ...}.
+    fixer: Optional[Any] = None
+
+    def _coerce(self, obj: Any) -> Any:
+        fields = self.pydantic_object.model_fields
+        if isinstance(obj, list) and len(fields) == 1:
+            return {next(iter(fields)): obj}
+        return obj
+
+    def parse_locally(self, text: str):
+        #Strict parse or local repair, no LLM call; raises OutputParserException
+        try:
+            return super().parse_result([Generation(text=text)])
+        except OutputParserException as e:
+            error = e
+        try:
+            return self.pydantic_object.model_validate(self._coerce(repair_json(text)))
+        except (ValueError, ValidationError):
+            raise error
+
+    def _parse_with_repair(self, text: str):
+        #(parsed object, None) or (None, error) for the fixer
+        name = self.pydantic_object.__name__
+        try:
+            result = super().parse_result([Generation(text=text)])
+            repair_stats.record(name, "clean")
+            return result, None
+        except OutputParserException as e:
+            error = e
+        try:
+            result = self.pydantic_object.model_validate(self._coerce(repair_json(text)))
+        except (ValueError, ValidationError) as e:
+            logger.info(f"Local repair of {name} failed: {e}")
+            return None, error
+        logger.info(f"Repaired malformed {name} output locally")
+        repair_stats.record(name, "repaired_locally")
+        return result, None
+
+    def _fix_prompt(self, text: str, error: Exception):
+        schema = json.dumps(self.pydantic_object.model_json_schema(), separators=(",", ":"))
+        return ChatPromptTemplate.from_template(FIX_JSON_PROMPT).format_messages(
+            schema=schema, error=str(error)[:500], text=text
+        )
+
+    def _from_fix(self, fixed: str, error: OutputParserException, seconds: float):
+        name = self.pydantic_object.__name__
+        try:
+            result = self.pydantic_object.model_validate(self._coerce(repair_json(fixed)))
+        except (ValueError, ValidationError) as e:
+            logger.warning(f"Fix-JSON call for {name} failed: {e}")
+            repair_stats.record(name, "failed", seconds)
+            raise error
+        logger.info(f"Repaired malformed {name} output with the fix-JSON call")
+        repair_stats.record(name, "repaired_by_llm", seconds)
+        return result
+
+    def parse_result(self, result: List[Generation], *, partial: bool = False):
+        if partial:
+            return super().parse_result(result, partial=partial)
+        text = result[0].text
+        parsed, error = self._parse_with_repair(text)
+        if error is None:
+            return parsed
+        if self.fixer is None:
+            repair_stats.record(self.pydantic_object.__name__, "failed")
+            raise error
+        start = time.perf_counter()
+        fixed = self.fixer.invoke(self._fix_prompt(text, error)).content
+        return self._from_fix(fixed, error, time.perf_counter() - start)
+
+    async def aparse_result(self, result: List[Generation], *, partial: bool = False):
+        if partial:
+            return super().parse_result(result, partial=partial)
+        text = result[0].text
+        parsed, error = self._parse_with_repair(text)
+        if error is None:
+            return parsed
+        if self.fixer is None:
+            repair_stats.record(self.pydantic_object.__name__, "failed")
+            raise error
+        start = time.perf_counter()
+        fixed = (await self.fixer.ainvoke(self._fix_prompt(text, error))).content
+        return self._from_fix(fixed, error, time.perf_counter() - start)
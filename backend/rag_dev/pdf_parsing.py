@@ -0,0 +1,138 @@
+#Process-pool PDF parsing and chunking, streamed page range by page range.
+#
+#Kept free of import-time side effects: pool workers import this module, and
+#with the "fork" start method they inherit whatever the parent has loaded.
+
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
+
+from pypdf import PdfReader
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from recipe_metadata import classify_text
+
+PDF_PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", "8"))
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", str(os.cpu_count() or 1)))
+# Page ranges parsed ahead of the embedding stage; bounds memory on big PDFs
+PARSE_QUEUE_SIZE = int(os.environ.get("PARSE_QUEUE_SIZE", str(PARSE_WORKERS * 2)))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def split_and_chunk(docs):
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=100,
+        separators=["\n\n", "\n", " ", ""]
+    )
+    return text_splitter.split_documents(docs)
+
+
+def parse_pages(file_path: str, start: int, end: int) -> List[Document]:
+    #Pool worker: extract pages [start, end), chunk them and tag each chunk with
+    #classified recipe metadata. Pages are split one document each, like
+    #PyPDFLoader, so chunks match a whole-file load.
+    reader = PdfReader(file_path)
+    docs = [
+        Document(page_content=reader.pages[i].extract_text(), metadata={"source": file_path, "page": i})
+        for i in range(start, end)
+    ]
+    chunks = split_and_chunk(docs)
+    for chunk in chunks:
+        chunk.metadata.update(classify_text(chunk.page_content))
+    return chunks
+
+
+def count_pages(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+
+def _noop():
+    return None
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        return _pool
+
+
+def start_parse_pool():
+    #Start the workers up front: with "fork" they should be created before the
+    #watcher, compactor and embedding threads exist
+    get_parse_pool().submit(_noop).result()
+
+
+class _Done:
+    #Queue sentinel; carries the producer's error, if any
+    def __init__(self, error: Optional[BaseException] = None):
+        self.error = error
+
+
+def stream_pdf_chunks(
+    file_path: str,
+    pages_per_task: int = PDF_PAGES_PER_TASK,
+    queue_size: int = PARSE_QUEUE_SIZE,
+) -> Iterator[Document]:
+    #Yield the chunks of a PDF in page order while later page ranges are still
+    #being parsed on every core. A producer thread keeps the pool busy and hands
+    #results over through a bounded queue, so a slow consumer (the embedding
+    #stage) stalls parsing instead of letting parsed pages pile up in memory.
+    total_pages = count_pages(file_path)
+    ranges = [(start, min(start + pages_per_task, total_pages)) for start in range(0, total_pages, pages_per_task)]
+    results: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        pool = get_parse_pool()
+        in_flight = []
+        pending_ranges = iter(ranges)
+        try:
+            while True:
+                # Queued results plus futures in flight never exceed queue_size
+                while len(in_flight) + results.qsize() < queue_size:
+                    page_range = next(pending_ranges, None)
+                    if page_range is None:
+                        break
+                    in_flight.append(pool.submit(parse_pages, file_path, *page_range))
+                if not in_flight:
+                    break
+                if not put(in_flight.pop(0).result()):
+                    break
+            put(_Done())
+        except BaseException as e:
+            put(_Done(e))
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    producer = threading.Thread(target=produce, name=f"pdf-parse-{os.path.basename(file_path)}", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = results.get()
+            if isinstance(item, _Done):
+                if item.error is not None:
+                    raise item.error
+                return
+            yield from item
+    finally:
+        # Also reached when the consumer stops early; lets the producer exit
+        stop.set()
+        producer.join()
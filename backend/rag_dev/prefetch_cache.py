@@ -0,0 +1,138 @@
+#Speculative prefetch of full recipes for freshly returned suggestions.
+
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger("prefetch_cache")
+
+# Suggestions to expand in the background after /recipe/suggestions; 0 disables prefetching
+PREFETCH_TOP_K = int(os.environ.get("PREFETCH_TOP_K", "0"))
+PREFETCH_MAX_ENTRIES = int(os.environ.get("PREFETCH_MAX_ENTRIES", "128"))
+PREFETCH_TTL = float(os.environ.get("PREFETCH_TTL", "300"))
+
+
+def _key(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+class _Entry:
+    __slots__ = ("task", "created", "epoch")
+
+    def __init__(self, task: "asyncio.Task", created: float, epoch: int):
+        self.task = task
+        self.created = created
+        self.epoch = epoch
+
+
+class PrefetchCache:
+
+    #Holds background generations keyed by suggestion name. An entry is the task
+    #itself, so a request arriving while its recipe is still being generated
+    #joins that task instead of starting a second one. Entries are consumed on
+    #first use; anything evicted, expired or cleared before being used counts as
+    #waste. Used from the server's event loop, except clear(), which index
+    #refresh calls from its own thread.
+    def __init__(self, max_entries: int = PREFETCH_MAX_ENTRIES, ttl: float = PREFETCH_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._epoch = 0
+        self.scheduled = 0
+        self.hits = 0
+        self.in_flight_hits = 0
+        self.misses = 0
+        self.failed = 0
+        self.wasted = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _discard(self, entry: _Entry):
+        # Unused work: stop it if it is still running
+        if not entry.task.done():
+            entry.task.cancel()
+        self.wasted += 1
+
+    def _expire(self, now: float):
+        # Entries are in creation order, so expired and cleared ones come first
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            stale = entry.epoch != self._epoch
+            if not stale and now - entry.created <= self.ttl:
+                break
+            del self._entries[key]
+            self._discard(entry)
+            self.expirations += not stale
+
+    def schedule(self, name: str, generate: Callable[[], Awaitable[Any]]) -> bool:
+        #Start generate() in the background unless name is already cached
+        key = _key(name)
+        now = time.time()
+        self._expire(now)
+        if key in self._entries:
+            return False
+        while len(self._entries) >= self.max_entries:
+            _, oldest = self._entries.popitem(last=False)
+            self._discard(oldest)
+            self.evictions += 1
+        task = asyncio.create_task(generate(), name=f"prefetch-{key}")
+        # Retrieve the exception so a failed prefetch that is never used is not logged as unhandled
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._entries[key] = _Entry(task, now, self._epoch)
+        self.scheduled += 1
+        return True
+
+    async def take(self, name: str) -> Optional[Any]:
+        #The prefetched value for name, waiting for it if still in flight, or None
+        self._expire(time.time())
+        entry = self._entries.pop(_key(name), None)
+        if entry is None:
+            self.misses += 1
+            return None
+        in_flight = not entry.task.done()
+        try:
+            # shield: a client disconnecting must not cancel the shared generation
+            value = await asyncio.shield(entry.task)
+        except asyncio.CancelledError:
+            if not entry.task.cancelled():
+                raise
+            self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Prefetch of '{name}' failed: {e}")
+            self.failed += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.in_flight_hits += in_flight
+        return value
+
+    def clear(self):
+        #Invalidate every entry, e.g. when the underlying corpus changes. Tasks
+        #belong to the event loop, so they are dropped there, on the next access.
+        self._epoch += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        # Only resolved prefetches count towards waste; pending ones may still be used
+        resolved = self.hits + self.failed + self.wasted
+        return {
+            "enabled": PREFETCH_TOP_K > 0,
+            "top_k": PREFETCH_TOP_K,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "scheduled": self.scheduled,
+            "hits": self.hits,
+            "in_flight_hits": self.in_flight_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "failed": self.failed,
+            "wasted": self.wasted,
+            "waste_rate": self.wasted / resolved if resolved else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
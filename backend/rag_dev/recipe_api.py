@@ -3,6 +3,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
 import logging
 
 from auth import get_user, User
@@ -10,6 +11,7 @@ from database.storage_factory import (
     Recipe as StorageRecipe,
     save_recipe,
     get_user_recipes,
+    get_user_recipe_summaries,
     get_recipe_by_id,
     delete_recipe,
     toggle_favorite,
@@ -42,6 +44,13 @@ class RecipeResponse(RecipeBase):
     saved_date: str
     is_shared: bool
 
+class RecipeSummary(BaseModel):
+    id: str
+    recipe_name: str
+    is_favorite: bool
+    saved_date: str
+    is_shared: bool
+
 class FavoriteUpdate(BaseModel):
     is_favorite: bool
 
@@ -74,8 +83,8 @@ async def create_recipe(request: Request, recipe: RecipeCreate, user: User = Dep
         user_email=user.email  # Include user email
     )
     
-    # Save recipe
-    saved_recipe = save_recipe(storage_recipe)
+    # Save recipe; storage backends block (file I/O, sqlite, pymongo), so every call runs in a worker thread
+    saved_recipe = await asyncio.to_thread(save_recipe, storage_recipe)
     logger.info(f"Recipe saved with ID: {saved_recipe.id}")
     
     # Convert back to API model
@@ -98,7 +107,7 @@ async def get_recipes(request: Request, user: User = Depends(get_user)):
     logger.info(f"Getting recipes for user: {user.id}")
     
     # Get recipes from storage
-    recipes = get_user_recipes(user.id)
+    recipes = await asyncio.to_thread(get_user_recipes, user.id)
     logger.info(f"Found {len(recipes)} recipes")
     
     # Convert to API model
@@ -118,13 +127,23 @@ async def get_recipes(request: Request, user: User = Depends(get_user)):
         for recipe in recipes
     ]
 
+@router.get("/user/summaries", response_model=List[RecipeSummary])
+async def get_recipe_summaries(user: User = Depends(get_user)):
+    """List the authenticated user's recipes without ingredients or instructions"""
+    logger.info(f"Getting recipe summaries for user: {user.id}")
+    
+    # Served from the backend's index; recipe bodies are not read
+    summaries = await asyncio.to_thread(get_user_recipe_summaries, user.id)
+    logger.info(f"Found {len(summaries)} recipes")
+    return [RecipeSummary(**summary) for summary in summaries]
+
 @router.delete("/{recipe_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_recipe(recipe_id: str, user: User = Depends(get_user)):
     """Delete a recipe"""
     logger.info(f"Deleting recipe {recipe_id} for user {user.id}")
     
     # Check if recipe exists and belongs to user
-    recipe = get_recipe_by_id(user.id, recipe_id)
+    recipe = await asyncio.to_thread(get_recipe_by_id, user.id, recipe_id)
     if not recipe:
         logger.warning(f"Recipe {recipe_id} not found for user {user.id}")
         raise HTTPException(
@@ -133,7 +152,7 @@ async def remove_recipe(recipe_id: str, user: User = Depends(get_user)):
         )
     
     # Delete recipe
-    success = delete_recipe(user.id, recipe_id)
+    success = await asyncio.to_thread(delete_recipe, user.id, recipe_id)
     if not success:
         logger.error(f"Failed to delete recipe {recipe_id}")
         raise HTTPException(
@@ -149,7 +168,7 @@ async def update_favorite(recipe_id: str, favorite_update: FavoriteUpdate, user:
     logger.info(f"Toggling favorite status for recipe {recipe_id}, user {user.id}, value: {favorite_update.is_favorite}")
     
     # Update favorite status
-    updated_recipe = toggle_favorite(user.id, recipe_id, favorite_update.is_favorite)
+    updated_recipe = await asyncio.to_thread(toggle_favorite, user.id, recipe_id, favorite_update.is_favorite)
     
     if not updated_recipe:
         logger.warning(f"Recipe {recipe_id} not found for user {user.id}")
@@ -180,7 +199,7 @@ async def update_shared(recipe_id: str, shared_update: SharedUpdate, user: User
     logger.info(f"Toggling shared status for recipe {recipe_id}, user {user.id}, value: {shared_update.is_shared}")
     
     # Update shared status
-    updated_recipe = toggle_shared(user.id, recipe_id, shared_update.is_shared)
+    updated_recipe = await asyncio.to_thread(toggle_shared, user.id, recipe_id, shared_update.is_shared)
     
     if not updated_recipe:
         logger.warning(f"Recipe {recipe_id} not found for user {user.id}")
@@ -211,7 +230,7 @@ async def get_community_recipes():
     logger.info("Getting shared recipes from the community")
     
     # Get shared recipes from storage
-    recipes = get_shared_recipes()
+    recipes = await asyncio.to_thread(get_shared_recipes)
     logger.info(f"Found {len(recipes)} shared recipes")
     
     # Convert to API model
@@ -0,0 +1,366 @@
+#Structured recipe metadata (cuisine, diets, meal type, cooking time) for chunks,
+#and the per-segment bitmap indexes used to pre-filter retrieval.
+
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lexical_index import tokenize
+
+CUISINES = ("italian", "mexican", "chinese", "indian", "japanese", "thai", "korean",
+            "american", "mediterranean", "french")
+DIETS = ("vegetarian", "vegan", "gluten-free", "dairy-free", "keto", "low-carb", "paleo")
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snack", "dessert")
+# Upper bounds (minutes) of the cooking-time bitmap buckets
+TIME_BUCKETS = (10, 15, 20, 30, 45, 60, 90, 120, 180, 240)
+# A request for ~30 minutes still accepts recipes up to 30 * tolerance minutes
+TIME_TOLERANCE = float(os.environ.get("METADATA_TIME_TOLERANCE", "1.5"))
+UNKNOWN = "unknown"
+OTHER = "other"
+
+# Single words only count when they name the cuisine on their own; ambiguous short
+# tokens ("tom", "pad", "sake") are left out, dishes named by them are in CUISINE_PHRASES
+CUISINE_KEYWORDS = {
+    "italian": {"italian", "pasta", "spaghetti", "risotto", "parmesan", "mozzarella", "pesto", "lasagna", "lasagne",
+                "gnocchi", "prosciutto", "pancetta", "marinara", "focaccia", "ricotta", "tiramisu", "penne", "linguine"},
+    "mexican": {"mexican", "tortilla", "taco", "salsa", "jalapeno", "enchilada", "quesadilla", "guacamole",
+                "chipotle", "burrito", "tamale", "pozole", "mole"},
+    "chinese": {"chinese", "wok", "hoisin", "szechuan", "sichuan", "bok", "dumpling", "wonton", "chow", "mein",
+                "shaoxing", "kung", "pao"},
+    "indian": {"indian", "masala", "garam", "turmeric", "dal", "dhal", "paneer", "naan", "tikka", "biryani",
+               "tandoori", "chutney", "korma", "vindaloo", "chapati", "samosa"},
+    "japanese": {"japanese", "miso", "sushi", "teriyaki", "dashi", "mirin", "wasabi", "nori", "ramen", "tempura",
+                 "udon", "soba", "katsu"},
+    "thai": {"thai", "lemongrass", "galangal", "kaffir", "satay"},
+    "korean": {"korean", "gochujang", "kimchi", "bulgogi", "gochugaru", "doenjang", "bibimbap", "japchae"},
+    "american": {"american", "burger", "barbecue", "bbq", "cornbread", "brownie", "meatloaf", "coleslaw", "grit"},
+    "mediterranean": {"mediterranean", "greek", "feta", "hummu", "tahini", "falafel", "tzatziki", "pita",
+                      "zaatar", "halloumi", "shakshuka", "tabbouleh"},
+    "french": {"french", "bechamel", "gratin", "ratatouille", "crepe", "baguette", "beurre", "dijon", "souffle",
+               "bourguignon", "croissant", "confit", "quiche"},
+}
+CUISINE_PHRASES = {
+    "thai": re.compile(r"\b(tom yum|tom kha|nam pla|pad see ew|pad kra pao|larb)\b"),
+    "japanese": re.compile(r"\b(cooking sake|sake and mirin)\b"),
+}
+# Values seen in recipe dumps that belong to one of the cuisines above
+CUISINE_ALIASES = {"greek": "mediterranean", "middle eastern": "mediterranean", "lebanese": "mediterranean",
+                   "turkish": "mediterranean", "spanish": "mediterranean", "tex-mex": "mexican",
+                   "southern": "american", "cajun": "american", "asian": OTHER}
+
+MEAL_KEYWORDS = {
+    "breakfast": {"breakfast", "brunch", "pancake", "waffle", "omelet", "omelette", "granola", "oatmeal",
+                  "porridge", "smoothie", "frittata"},
+    "lunch": {"lunch", "sandwich", "salad", "panini"},
+    "dinner": {"dinner", "supper", "entree", "roast", "stew", "casserole"},
+    "snack": {"snack", "appetizer", "popcorn", "starter"},
+    "dessert": {"dessert", "cake", "cookie", "brownie", "pudding", "custard", "mousse", "cheesecake", "frosting",
+                "sorbet", "tiramisu", "tart"},
+}
+MEAL_ALIASES = {"main course": "dinner", "main": "dinner", "main dish": "dinner", "appetizers": "snack",
+                "side dish": "snack", "desserts": "dessert", "breakfast and brunch": "breakfast", "brunch": "breakfast"}
+
+# Ingredient words that rule a diet out (plural-folded, like lexical_index.tokenize)
+MEAT = {"chicken", "beef", "pork", "bacon", "ham", "lamb", "turkey", "sausage", "veal", "duck", "prosciutto",
+        "pancetta", "salami", "chorizo", "steak", "mince", "meatball", "gelatin", "lard"}
+SEAFOOD = {"fish", "salmon", "tuna", "shrimp", "prawn", "anchovy", "anchovie", "crab", "lobster", "cod",
+           "scallop", "clam", "mussel", "oyster", "squid", "octopu", "sardine"}
+DAIRY = {"milk", "butter", "cheese", "cream", "yogurt", "yoghurt", "ghee", "parmesan", "mozzarella", "ricotta",
+         "buttermilk", "feta", "paneer", "halloumi", "mascarpone", "custard"}
+EGG = {"egg", "mayonnaise", "mayo", "meringue"}
+ANIMAL_OTHER = {"honey"}
+GLUTEN = {"flour", "wheat", "bread", "pasta", "noodle", "barley", "rye", "couscous", "breadcrumb", "spaghetti",
+          "penne", "linguine", "lasagna", "naan", "pita", "baguette", "croissant", "semolina", "seitan", "pastry",
+          "dough", "cracker"}
+HIGH_CARB = {"sugar", "rice", "pasta", "bread", "potato", "flour", "noodle", "honey", "syrup", "corn", "oat",
+             "bean", "lentil", "chickpea", "tortilla", "spaghetti", "couscous", "quinoa"}
+NOT_PALEO = {"wheat", "flour", "rice", "pasta", "bread", "oat", "corn", "bean", "lentil", "chickpea", "peanut",
+             "soy", "tofu", "sugar", "noodle", "quinoa"} | (DAIRY - {"ghee", "butter"})
+# Diet-safe look-alikes (plant milks, gluten-free flours) removed before matching ingredients
+_SAFE_PHRASES = re.compile(
+    r"\b(coconut|almond|oat|soy|rice|cashew) (milk|cream|yogurt|butter)\b|\b(peanut|cocoa|nut) butter\b"
+    r"|\b(almond|coconut|rice|chickpea|cassava|tapioca) flour\b"
+    r"|\bgluten[- ]?free (flour|bread|pasta|noodle|oat)s?\b"
+)
+# Ingredients that rule each diet out
+RULED_OUT_BY = {
+    "vegetarian": MEAT | SEAFOOD,
+    "vegan": MEAT | SEAFOOD | DAIRY | EGG | ANIMAL_OTHER,
+    "gluten-free": GLUTEN,
+    "dairy-free": DAIRY,
+    "keto": HIGH_CARB,
+    "low-carb": HIGH_CARB,
+    "paleo": NOT_PALEO,
+}
+
+
+def _diet_label(pattern: str):
+    # "non-vegetarian" and "not vegan" are not labels
+    return re.compile(r"(?<!non-)(?<!non )(?<!not )\b(?:" + pattern + r")\b")
+
+
+# How a text says a recipe fits a diet; the only positive evidence the classifier accepts
+DIET_LABELS = {
+    "vegetarian": _diet_label(r"vegetarian|meatless|meat-free"),
+    "vegan": _diet_label(r"vegan|plant-based"),
+    "gluten-free": _diet_label(r"gluten[- ]?free"),
+    "dairy-free": _diet_label(r"dairy[- ]?free|non-dairy"),
+    "keto": _diet_label(r"keto|ketogenic"),
+    "low-carb": _diet_label(r"low[- ]?carb"),
+    "paleo": _diet_label(r"paleo"),
+}
+IMPLIED_DIETS = {"vegan": {"vegetarian", "dairy-free"}, "keto": {"low-carb"}}
+
+_DURATION = re.compile(
+    r"(?:(\d+(?:\.\d+)?)\s*(?:hours?|hrs?|h)\b\s*(?:and\s*)?)?(?:(\d+)\s*(?:minutes?|mins?|m)\b)?", re.IGNORECASE
+)
+_LABELLED_TIME = re.compile(
+    r"\b(total|cook(?:ing)?|prep(?:aration)?|ready in)(?:\s*time)?\s*[:\-]?\s*"
+    r"((?:\d+(?:\.\d+)?\s*(?:hours?|hrs?|h)\b\s*(?:and\s*)?)?(?:\d+\s*(?:minutes?|mins?|m)\b)?)",
+    re.IGNORECASE,
+)
+_ISO_DURATION = re.compile(r"^P(?:T)?(?:(\d+)H)?(?:(\d+)M)?$", re.IGNORECASE)
+
+CSV_COLUMNS = {
+    "cuisine": {"cuisine", "cuisine_type", "cuisines"},
+    "meal_type": {"meal_type", "meal", "course", "category", "meal_category"},
+    "diets": {"diet", "diets", "dietary", "dietary_preference", "diet_type", "dietary_tags"},
+    "cooking_time": {"total_time", "totaltime", "cooking_time", "cook_time", "cooktime", "time", "minutes",
+                     "ready_in_minutes", "total_time_minutes"},
+}
+
+
+def parse_minutes(text: str) -> Optional[int]:
+    #"1 hour 30 minutes", "45 mins", "PT1H10M" or a bare number of minutes
+    text = str(text).strip()
+    if not text:
+        return None
+    if text.isdigit():
+        return int(text)
+    iso = _ISO_DURATION.match(text)
+    if iso and (iso.group(1) or iso.group(2)):
+        return int(iso.group(1) or 0) * 60 + int(iso.group(2) or 0)
+    for match in _DURATION.finditer(text):
+        hours, minutes = match.group(1), match.group(2)
+        if hours or minutes:
+            return int(float(hours or 0) * 60) + int(minutes or 0)
+    return None
+
+
+def extract_cooking_time(text: str) -> Optional[int]:
+    #Total time if stated, else prep + cook; unlabelled durations (e.g. "chill
+    #overnight", "bake 20 minutes") are too ambiguous to use
+    found: Dict[str, int] = {}
+    for match in _LABELLED_TIME.finditer(text):
+        minutes = parse_minutes(match.group(2))
+        if minutes:
+            found.setdefault(match.group(1).lower()[:4], minutes)
+    if "tota" in found:
+        return found["tota"]
+    if "read" in found:
+        return found["read"]
+    if "cook" in found or "prep" in found:
+        return found.get("cook", 0) + found.get("prep", 0)
+    return None
+
+
+def _best_label(tokens: set, keywords: Dict[str, set]) -> Optional[str]:
+    scores = {label: len(tokens & words) for label, words in keywords.items()}
+    best = max(scores.values(), default=0)
+    if not best:
+        return None
+    winners = [label for label, score in scores.items() if score == best]
+    return winners[0] if len(winners) == 1 else None
+
+
+def classify_diets(text: str, tokens: set) -> Tuple[List[str], List[str]]:
+    #(diets the text labels the recipe with and nothing rules out, diets it says
+    #nothing conclusive about). A diet needs a label: an ingredient list without
+    #meat is not evidence of a vegetarian recipe, only an ingredient can rule one out.
+    labelled = {diet for diet, pattern in DIET_LABELS.items() if pattern.search(text)}
+    for diet in list(labelled):
+        labelled |= IMPLIED_DIETS.get(diet, set())
+    diets, unknown = [], []
+    for diet in DIETS:
+        ruled_out = bool(tokens & RULED_OUT_BY[diet])
+        if diet in labelled and not ruled_out:
+            diets.append(diet)
+        elif diet in labelled or not ruled_out:
+            unknown.append(diet)
+    return diets, unknown
+
+
+def classify_text(text: str) -> Dict[str, object]:
+    #Keyword classifier for chunks without structured fields (PDF pages)
+    lowered = text.lower()
+    tokens = set(tokenize(_SAFE_PHRASES.sub(" ", lowered)))
+    diets, unknown_diets = classify_diets(lowered, tokens)
+    metadata: Dict[str, object] = {"diets": diets, "diets_unknown": unknown_diets}
+    for label, pattern in CUISINE_PHRASES.items():
+        if pattern.search(lowered):
+            tokens.add(label)
+    cuisine = _best_label(tokens, CUISINE_KEYWORDS)
+    if cuisine:
+        metadata["cuisine"] = cuisine
+    meal_type = _best_label(tokens, MEAL_KEYWORDS)
+    if meal_type:
+        metadata["meal_type"] = meal_type
+    minutes = extract_cooking_time(text)
+    if minutes:
+        metadata["cooking_time"] = minutes
+    return metadata
+
+
+def _normalize_label(value: str, known: Sequence[str], aliases: Dict[str, str]) -> Optional[str]:
+    value = value.strip().lower()
+    if not value:
+        return None
+    if value in known:
+        return value
+    if value in aliases:
+        return aliases[value]
+    return OTHER
+
+
+def _normalize_diet(value: str) -> Optional[str]:
+    value = re.sub(r"[\s_]+", "-", value.strip().lower())
+    value = {"glutenfree": "gluten-free", "dairyfree": "dairy-free", "lowcarb": "low-carb",
+             "ketogenic": "keto"}.get(value, value)
+    return value if value in DIETS else None
+
+
+def extract_row_metadata(row: dict, text: str) -> Dict[str, object]:
+    #CSV columns where a recipe dump has them, the classifier for the rest
+    columns = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+    metadata = classify_text(text)
+    for field, names in CSV_COLUMNS.items():
+        value = next((columns[name] for name in names if columns.get(name)), None)
+        if not isinstance(value, str):
+            continue
+        if field == "cuisine":
+            label = _normalize_label(value, CUISINES, CUISINE_ALIASES)
+            if label:
+                metadata["cuisine"] = label
+        elif field == "meal_type":
+            label = _normalize_label(value, MEAL_TYPES, MEAL_ALIASES)
+            if label:
+                metadata["meal_type"] = label
+        elif field == "diets":
+            tags = {_normalize_diet(tag) for tag in re.split(r"[,;|/]", value)} - {None}
+            if "vegan" in tags:
+                tags.update({"vegetarian", "dairy-free"})
+            if "keto" in tags:
+                tags.add("low-carb")
+            metadata["diets"] = sorted(tags | set(metadata["diets"]))
+            metadata["diets_unknown"] = sorted(set(metadata["diets_unknown"]) - tags)
+        else:
+            minutes = parse_minutes(value)
+            if minutes:
+                metadata["cooking_time"] = minutes
+    return metadata
+
+
+def time_bucket(minutes: Optional[int]) -> str:
+    if not minutes:
+        return UNKNOWN
+    for bound in TIME_BUCKETS:
+        if minutes <= bound:
+            return str(bound)
+    return "max"
+
+
+def facet_keys(metadata: dict) -> List[str]:
+    #Bitmap keys a chunk belongs to; missing attributes go to "<attribute>=unknown",
+    #diets the classifier could not decide to "diet=unknown:<diet>"
+    keys = [
+        f"cuisine={metadata.get('cuisine') or UNKNOWN}",
+        f"meal_type={metadata.get('meal_type') or UNKNOWN}",
+        f"time={time_bucket(metadata.get('cooking_time'))}",
+    ]
+    diets = metadata.get("diets")
+    if diets is None:
+        keys.append(f"diet={UNKNOWN}")
+    else:
+        keys.extend(f"diet={diet}" for diet in diets)
+        keys.extend(f"diet={UNKNOWN}:{diet}" for diet in metadata.get("diets_unknown", ()))
+    return keys
+
+
+def build_filters(meal_type: str, cuisine_type: str, dietary_preference: str, cooking_time: Optional[int]) -> Dict[str, List[str]]:
+    #Per attribute, the bitmap keys a chunk may match (OR); attributes are ANDed.
+    #Chunks whose attribute is unknown are kept, so unlabelled text is never lost.
+    filters: Dict[str, List[str]] = {}
+    cuisine = (cuisine_type or "").strip().lower()
+    cuisine = CUISINE_ALIASES.get(cuisine, cuisine)
+    if cuisine in CUISINES:
+        filters["cuisine"] = [f"cuisine={cuisine}", f"cuisine={UNKNOWN}"]
+    meal = (meal_type or "").strip().lower()
+    if meal in MEAL_TYPES:
+        filters["meal_type"] = [f"meal_type={meal}", f"meal_type={UNKNOWN}"]
+    diet = _normalize_diet(dietary_preference or "")
+    if diet:
+        filters["diet"] = [f"diet={diet}", f"diet={UNKNOWN}:{diet}", f"diet={UNKNOWN}"]
+    if cooking_time:
+        limit = cooking_time * TIME_TOLERANCE
+        lower = 0
+        allowed = [f"time={UNKNOWN}"]
+        for bound in TIME_BUCKETS:
+            if lower < limit:
+                allowed.append(f"time={bound}")
+            lower = bound
+        if lower < limit:
+            allowed.append("time=max")
+        filters["time"] = allowed
+    return filters
+
+
+class FacetBitmaps:
+
+    #One packed bitmap (little-endian bit order, as faiss.IDSelectorBitmap
+    #expects) per facet key, over the positions of one segment
+    def __init__(self, size: int, bitmaps: Dict[str, np.ndarray]):
+        self.size = size
+        self.bitmaps = bitmaps
+
+    @classmethod
+    def from_metadatas(cls, metadatas: Sequence[dict]) -> "FacetBitmaps":
+        members: Dict[str, List[int]] = {}
+        for position, metadata in enumerate(metadatas):
+            for key in facet_keys(metadata or {}):
+                members.setdefault(key, []).append(position)
+        bitmaps = {}
+        for key, positions in members.items():
+            bits = np.zeros(len(metadatas), dtype=bool)
+            bits[positions] = True
+            bitmaps[key] = np.packbits(bits, bitorder="little")
+        return cls(len(metadatas), bitmaps)
+
+    @classmethod
+    def load(cls, path: str) -> "FacetBitmaps":
+        with np.load(path, allow_pickle=False) as data:
+            size = int(data["__size__"])
+            return cls(size, {key: data[key] for key in data.files if key != "__size__"})
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez(f, __size__=np.array(self.size), **self.bitmaps)
+
+    def mask(self, filters: Dict[str, List[str]]) -> Optional[np.ndarray]:
+        #Packed bitmap of positions passing every attribute, or None when unfiltered
+        if not filters:
+            return None
+        empty = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        result = None
+        for keys in filters.values():
+            allowed = empty.copy()
+            for key in keys:
+                bitmap = self.bitmaps.get(key)
+                if bitmap is not None:
+                    np.bitwise_or(allowed, bitmap, out=allowed)
+            result = allowed if result is None else np.bitwise_and(result, allowed, out=result)
+        return result
+
+    def positions(self, mask: np.ndarray) -> np.ndarray:
+        return np.flatnonzero(np.unpackbits(mask, count=self.size, bitorder="little"))
@@ -0,0 +1,29 @@
+#Pydantic models and output parsers for generated recipes.
+
+from typing import List
+from pydantic import BaseModel
+
+from output_repair import TolerantPydanticOutputParser
+
+class Recipe(BaseModel):
+   
+    #Structured representation of a complete recipe
+
+    recipe_name: str
+    ingredients: List[str]
+    instructions: List[str]
+    cooking_tips: List[str]
+
+# Malformed JSON is repaired rather than failing the request (see output_repair)
+recipe_output_parser = TolerantPydanticOutputParser(pydantic_object=Recipe)
+
+class RecipeSuggestion(BaseModel):
+    #Short recipe suggestion with name and brief description
+    recipe_name: str
+    description: str
+
+class RecipeSuggestions(BaseModel):
+    #Container for multiple recipe suggestions
+    suggestions: List[RecipeSuggestion]
+
+suggestion_output_parser = TolerantPydanticOutputParser(pydantic_object=RecipeSuggestions)
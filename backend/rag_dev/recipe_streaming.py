@@ -0,0 +1,176 @@
+#Incremental JSON parsing of streamed LLM output into recipe field events.
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from recipe_models import Recipe, recipe_output_parser
+
+# Event names emitted for each list field of the Recipe model
+ITEM_EVENTS = {
+    "ingredients": "ingredient",
+    "instructions": "instruction",
+    "cooking_tips": "cooking_tip",
+}
+
+# Parser states
+_BEFORE_OBJECT = "before_object"
+_EXPECT_KEY = "expect_key"
+_IN_KEY = "in_key"
+_EXPECT_COLON = "expect_colon"
+_EXPECT_VALUE = "expect_value"
+_IN_STRING = "in_string"
+_IN_SCALAR = "in_scalar"
+_EXPECT_ITEM = "expect_item"
+_AFTER_VALUE = "after_value"
+_DONE = "done"
+
+
+class IncrementalJSONObjectParser:
+
+    #Character-level parser for a flat JSON object whose values are scalars or
+    #arrays of scalars (the shape of Recipe). feed() can be called with arbitrary
+    #chunk boundaries and returns (key, index, value) for every value completed
+    #by that chunk; index is None for top-level scalars. Any text before the
+    #first "{" (e.g. a ```json fence) is ignored. A value that is not valid JSON
+    #(True, None, a bare word) is skipped and sets malformed, so the caller can
+    #leave it to a full repair of the text.
+    def __init__(self):
+        self.state = _BEFORE_OBJECT
+        self.result: Dict[str, Any] = {}
+        self.malformed = False
+        self._key = ""
+        self._buffer: List[str] = []
+        self._escape = False
+        self._in_array = False
+        self._index = 0
+
+    @property
+    def done(self) -> bool:
+        return self.state == _DONE
+
+    def _decode_string(self) -> str:
+        return json.loads('"' + "".join(self._buffer) + '"')
+
+    def _complete(self, value, events: List[Tuple[str, Optional[int], Any]]):
+        if self._in_array:
+            self.result[self._key].append(value)
+            events.append((self._key, self._index, value))
+            self._index += 1
+        else:
+            self.result[self._key] = value
+            events.append((self._key, None, value))
+        self._buffer = []
+
+    def _finish_scalar(self, events):
+        text = "".join(self._buffer).strip()
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            self.malformed = True
+            self._buffer = []
+            return
+        self._complete(value, events)
+
+    def feed(self, chunk: str) -> List[Tuple[str, Optional[int], Any]]:
+        events: List[Tuple[str, Optional[int], Any]] = []
+        for ch in chunk:
+            state = self.state
+            if state == _DONE:
+                break
+
+            if state in (_IN_KEY, _IN_STRING):
+                if self._escape:
+                    self._buffer.append(ch)
+                    self._escape = False
+                elif ch == "\\":
+                    self._buffer.append(ch)
+                    self._escape = True
+                elif ch == '"':
+                    if state == _IN_KEY:
+                        self._key = self._decode_string()
+                        self._buffer = []
+                        self.state = _EXPECT_COLON
+                    else:
+                        self._complete(self._decode_string(), events)
+                        self.state = _AFTER_VALUE
+                else:
+                    self._buffer.append(ch)
+                continue
+
+            if state == _IN_SCALAR:
+                if ch in ",]}":
+                    self._finish_scalar(events)
+                    self.state = _AFTER_VALUE
+                    # Fall through so the delimiter is handled below
+                    state = _AFTER_VALUE
+                else:
+                    self._buffer.append(ch)
+                    continue
+
+            if ch.isspace():
+                continue
+
+            if state == _BEFORE_OBJECT:
+                if ch == "{":
+                    self.state = _EXPECT_KEY
+            elif state == _EXPECT_KEY:
+                if ch == '"':
+                    self.state = _IN_KEY
+                elif ch == "}":
+                    self.state = _DONE
+            elif state == _EXPECT_COLON:
+                if ch == ":":
+                    self.state = _EXPECT_VALUE
+            elif state in (_EXPECT_VALUE, _EXPECT_ITEM):
+                if ch == '"':
+                    self.state = _IN_STRING
+                elif ch == "[" and state == _EXPECT_VALUE:
+                    self.result[self._key] = []
+                    self._in_array = True
+                    self._index = 0
+                    self.state = _EXPECT_ITEM
+                elif ch == "]" and state == _EXPECT_ITEM:
+                    self._in_array = False
+                    self.state = _AFTER_VALUE
+                else:
+                    self._buffer = [ch]
+                    self.state = _IN_SCALAR
+            elif state == _AFTER_VALUE:
+                if ch == ",":
+                    self.state = _EXPECT_ITEM if self._in_array else _EXPECT_KEY
+                elif ch == "]" and self._in_array:
+                    self._in_array = False
+                elif ch == "}" and not self._in_array:
+                    self.state = _DONE
+        return events
+
+
+class RecipeStreamParser:
+
+    #Turns streamed Recipe JSON into SSE-ready (event, data) pairs: recipe_name
+    #first, then one event per ingredient, instruction and cooking tip.
+    def __init__(self):
+        self._parser = IncrementalJSONObjectParser()
+        self.text: List[str] = []
+
+    def feed(self, chunk: str) -> List[Tuple[str, Dict[str, Any]]]:
+        self.text.append(chunk)
+        events = []
+        for key, index, value in self._parser.feed(chunk):
+            if index is None:
+                events.append((key, {"value": value}))
+            else:
+                events.append((ITEM_EVENTS.get(key, key), {"index": index, "value": value}))
+        return events
+
+    def recipe(self) -> Recipe:
+        #Validate the accumulated fields into a Recipe once the stream ends
+        if self._parser.done and not self._parser.malformed:
+            try:
+                return Recipe(**self._parser.result)
+            except ValidationError:
+                pass
+        # Fall back to repairing the whole text (handles output the scanner gave up on)
+        return recipe_output_parser.parse_locally("".join(self.text))
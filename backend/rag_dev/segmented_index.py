@@ -0,0 +1,550 @@
+#Append-only segmented FAISS index: each ingestion adds a small segment.
+
+import os
+import json
+import time
+import pickle
+import shutil
+import asyncio
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_community.vectorstores import FAISS
+
+from index_factory import FAISS_INDEX_TYPE, build_store, search_parameters, tune_index
+from lexical_index import BM25Segment, bm25_search
+from recipe_metadata import FacetBitmaps
+
+logger = logging.getLogger("segmented_index")
+
+MANIFEST_FILE = "manifest.json"
+# Raw float32 vectors kept next to each segment so compaction can rebuild any index type
+VECTORS_FILE = "vectors.npy"
+# BM25 postings written with each segment, built from the same chunks
+LEXICAL_FILE = "bm25.npz"
+# Bitmaps of chunk metadata (cuisine, diet, meal type, cooking time) for pre-filtering
+FACETS_FILE = "facets.npz"
+SEGMENTS_DIR = "segments"
+# Legacy single-index layout (index.faiss / index.pkl directly in the root)
+LEGACY_SEGMENT = "."
+
+# IO_FLAG_MMAP_IFC also maps flat (IndexFlat) codes; older faiss builds only have IO_FLAG_MMAP
+MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+COMPACT_MAX_SEGMENTS = int(os.environ.get("FAISS_COMPACT_MAX_SEGMENTS", "8"))
+COMPACT_INTERVAL_SECONDS = float(os.environ.get("FAISS_COMPACT_INTERVAL", "60"))
+# Merged-away segment directories are kept this long so a server that is
+# still loading them does not see them disappear
+COMPACT_GRACE_SECONDS = float(os.environ.get("FAISS_COMPACT_GRACE", "300"))
+
+# Hybrid retrieval: candidates taken from each ranking, and the RRF damping constant
+HYBRID_FETCH_K = int(os.environ.get("HYBRID_FETCH_K", "20"))
+RRF_K = int(os.environ.get("HYBRID_RRF_K", "60"))
+
+
+def read_manifest(root: str) -> Dict[str, object]:
+    path = os.path.join(root, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    # An index written before segments existed becomes the first segment
+    if os.path.exists(os.path.join(root, "index.faiss")):
+        return {"segments": [LEGACY_SEGMENT], "generation": 0}
+    return {"segments": [], "generation": 0}
+
+
+def write_manifest(root: str, manifest: Dict[str, object]):
+    #Atomic replace, so readers see either the old or the new segment list
+    path = os.path.join(root, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class IndexSnapshot:
+
+    #An immutable set of loaded segments plus a reference count. Searches hold a
+    #reference for their duration; a retired snapshot drops its segments once the
+    #last in-flight search releases it.
+    def __init__(
+        self,
+        segments: Tuple[Tuple[str, FAISS], ...],
+        generation: int,
+        lexical: Optional[Dict[str, BM25Segment]] = None,
+        facets: Optional[Dict[str, FacetBitmaps]] = None,
+    ):
+        self.segments = segments
+        self.generation = generation
+        self.lexical = lexical or {}
+        self.facets = facets or {}
+        self._lock = threading.Lock()
+        self._refs = 0
+        self._retired = False
+
+    def acquire(self) -> "IndexSnapshot":
+        with self._lock:
+            self._refs += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            self._refs -= 1
+            close = self._retired and self._refs == 0
+        if close:
+            self._close()
+
+    def retire(self):
+        with self._lock:
+            self._retired = True
+            close = self._refs == 0
+        if close:
+            self._close()
+
+    def _close(self):
+        # Segments shared with the newer snapshot stay alive through it
+        self.segments = ()
+        self.lexical = {}
+        self.facets = {}
+
+    @property
+    def in_flight(self) -> int:
+        return self._refs
+
+
+class SegmentedIndex:
+
+    #A list of immutable FAISS segments described by manifest.json. Writers add
+    #new segments (O(new data)) and readers refresh by loading only segments they
+    #have not seen. Segment files are memory-mapped, new segments are smoke-tested
+    #before use, and the loaded set is swapped in as a reference-counted snapshot
+    #so in-flight searches finish on the set they started with.
+    def __init__(self, root: str, embeddings, index_type: str = FAISS_INDEX_TYPE):
+        self.root = root
+        self.embeddings = embeddings
+        self.index_type = index_type
+        self._write_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._snapshot = IndexSnapshot((), -1)
+        self._reload_lock = threading.Lock()
+        self._reload_thread: Optional[threading.Thread] = None
+        self._reload_again = False
+        self.on_refresh: List[Callable[[Dict[str, int]], None]] = []
+        self.last_reload: Dict[str, object] = {}
+        os.makedirs(os.path.join(root, SEGMENTS_DIR), exist_ok=True)
+
+    # ---- reading ----
+
+    def _segment_path(self, name: str) -> str:
+        return os.path.normpath(os.path.join(self.root, name))
+
+    def _load_segment(self, name: str, mmap: bool = False) -> FAISS:
+        if not mmap:
+            return FAISS.load_local(self._segment_path(name), self.embeddings, allow_dangerous_deserialization=True)
+
+        # Same files as FAISS.load_local, but the vectors stay in the page cache
+        # instead of being copied onto the heap
+        path = self._segment_path(name)
+        try:
+            index = faiss.read_index(os.path.join(path, "index.faiss"), MMAP_FLAG)
+        except RuntimeError:
+            index = faiss.read_index(os.path.join(path, "index.faiss"))
+        with open(os.path.join(path, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(self.embeddings, tune_index(index), docstore, index_to_docstore_id)
+
+    def _segment_size(self, manifest: Dict[str, object], name: str) -> int:
+        #Vector count from the manifest; segments written before sizes were
+        #recorded are measured from a memory-mapped index (header only)
+        size = manifest.get("sizes", {}).get(name)
+        if size is not None:
+            return size
+        path = os.path.join(self._segment_path(name), "index.faiss")
+        try:
+            return faiss.read_index(path, MMAP_FLAG).ntotal
+        except RuntimeError:
+            return faiss.read_index(path).ntotal
+
+    def _load_lexical(self, name: str, store: FAISS) -> BM25Segment:
+        path = os.path.join(self._segment_path(name), LEXICAL_FILE)
+        if os.path.exists(path):
+            return BM25Segment.load(path)
+        # Segments written before BM25 existed: build in memory from the docstore
+        docs = [store.docstore.search(store.index_to_docstore_id[i]) for i in range(store.index.ntotal)]
+        return BM25Segment.from_texts([doc.page_content for doc in docs])
+
+    def _load_facets(self, name: str, store: FAISS) -> FacetBitmaps:
+        path = os.path.join(self._segment_path(name), FACETS_FILE)
+        if os.path.exists(path):
+            return FacetBitmaps.load(path)
+        docs = [store.docstore.search(store.index_to_docstore_id[i]) for i in range(store.index.ntotal)]
+        return FacetBitmaps.from_metadatas([doc.metadata for doc in docs])
+
+    @staticmethod
+    def _smoke_test(name: str, store: FAISS):
+        #Reject a segment whose index and docstore do not line up
+        index = store.index
+        if index.ntotal != len(store.index_to_docstore_id):
+            raise ValueError(f"Segment {name}: {index.ntotal} vectors but {len(store.index_to_docstore_id)} docstore ids")
+        if index.ntotal:
+            probe = np.zeros((1, index.d), dtype=np.float32)
+            _, ids = index.search(probe, 1)
+            doc_id = store.index_to_docstore_id[int(ids[0][0])]
+            if store.docstore.search(doc_id) is None:
+                raise ValueError(f"Segment {name}: smoke query hit missing document {doc_id}")
+
+    @contextmanager
+    def snapshot(self):
+        #Pin the current snapshot for the duration of a search
+        with self._swap_lock:
+            snapshot = self._snapshot.acquire()
+        try:
+            yield snapshot
+        finally:
+            snapshot.release()
+
+    def refresh(self) -> Dict[str, int]:
+        #Load segments added since the last refresh, validate them and swap atomically
+        manifest = read_manifest(self.root)
+        loaded = dict(self._snapshot.segments)
+        loaded_lexical = self._snapshot.lexical
+        loaded_facets = self._snapshot.facets
+        segments = []
+        lexical = {}
+        facets = {}
+        new = 0
+        for name in manifest["segments"]:
+            store = loaded.get(name)
+            if store is None:
+                store = self._load_segment(name, mmap=True)
+                self._smoke_test(name, store)
+                new += 1
+            segments.append((name, store))
+            # The inverted index follows exactly the same segment set
+            lexical[name] = loaded_lexical.get(name) or self._load_lexical(name, store)
+            facets[name] = loaded_facets.get(name) or self._load_facets(name, store)
+        dropped = len(set(loaded) - set(manifest["segments"]))
+
+        with self._swap_lock:
+            old = self._snapshot
+            self._snapshot = IndexSnapshot(tuple(segments), manifest["generation"], lexical, facets)
+        old.retire()
+
+        result = {"segments": len(segments), "loaded": new, "dropped": dropped}
+        logger.info(f"Index refreshed: {len(segments)} segment(s), {new} new, {dropped} dropped")
+        for callback in self.on_refresh:
+            callback(result)
+        return result
+
+    def request_refresh(self) -> bool:
+        #Refresh in a background thread; requests during a refresh are coalesced
+        #into one follow-up run. Returns False if it was queued behind a running one.
+        with self._reload_lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                self._reload_again = True
+                return False
+            self._reload_thread = threading.Thread(target=self._reload_loop, name="faiss-reload", daemon=True)
+            self._reload_thread.start()
+            return True
+
+    def _reload_loop(self):
+        while True:
+            started = time.time()
+            try:
+                result = self.refresh()
+                self.last_reload = {"finished": time.time(), "seconds": time.time() - started, **result}
+            except Exception as e:
+                # The previous snapshot stays in service
+                logger.error(f"Index reload failed: {e}")
+                self.last_reload = {"finished": time.time(), "error": str(e)}
+            with self._reload_lock:
+                if not self._reload_again:
+                    self._reload_thread = None
+                    return
+                self._reload_again = False
+
+    @property
+    def generation(self) -> int:
+        return self._snapshot.generation
+
+    @property
+    def segment_names(self) -> List[str]:
+        return [name for name, _ in self._snapshot.segments]
+
+    def __len__(self) -> int:
+        return sum(store.index.ntotal for _, store in self._snapshot.segments)
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        #Search every segment and merge by distance (lower is closer)
+        results = []
+        with self.snapshot() as snapshot:
+            for _, store in snapshot.segments:
+                results.extend(store.similarity_search_with_score_by_vector(embedding, k=k))
+        results.sort(key=lambda pair: pair[1])
+        return results[:k]
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        embedding = self.embeddings.embed_query(query)
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def keyword_search(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        #BM25 over every segment (higher is better)
+        with self.snapshot() as snapshot:
+            stores = dict(snapshot.segments)
+            hits = bm25_search(list(snapshot.lexical.items()), query, k)
+            return [(self._resolve(stores[name], position), score) for name, position, score in hits]
+
+    def hybrid_search(
+        self,
+        query: str,
+        embedding: List[float],
+        k: int = 4,
+        fetch_k: int = HYBRID_FETCH_K,
+        rrf_k: int = RRF_K,
+        filters: Optional[Dict[str, List[str]]] = None,
+    ) -> List[Tuple[Document, float]]:
+        #Reciprocal-rank fusion of the vector and BM25 rankings, both taken from
+        #the same snapshot. Returns (document, fused score), best first.
+        #filters (see recipe_metadata.build_filters) restrict both searches to
+        #chunks whose metadata bitmaps match, before any distance is computed.
+        return self.hybrid_search_batch([query], [embedding], k, fetch_k, rrf_k, filters)[0]
+
+    def hybrid_search_batch(
+        self,
+        queries: List[str],
+        embeddings: List[List[float]],
+        k: int = 4,
+        fetch_k: int = HYBRID_FETCH_K,
+        rrf_k: int = RRF_K,
+        filters: Optional[Dict[str, List[str]]] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        #hybrid_search for several queries at once: one FAISS search per segment
+        #with every query vector as a row, and one facet mask per segment shared
+        #by all queries. Results are in query order.
+        if not queries:
+            return []
+        with self.snapshot() as snapshot:
+            stores = dict(snapshot.segments)
+            vector_hits: List[list] = [[] for _ in queries]
+            masks = {}
+            query_vectors = np.asarray(embeddings, dtype=np.float32)
+            for name, store in snapshot.segments:
+                if not store.index.ntotal:
+                    continue
+                params = None
+                bitmap = snapshot.facets[name].mask(filters) if filters and name in snapshot.facets else None
+                if bitmap is not None:
+                    masks[name] = np.unpackbits(bitmap, count=store.index.ntotal, bitorder="little").astype(bool)
+                    if not masks[name].any():
+                        continue
+                    # bitmap stays referenced until the search returns
+                    params = search_parameters(store.index, faiss.IDSelectorBitmap(store.index.ntotal, faiss.swig_ptr(bitmap)))
+                distances, positions = store.index.search(query_vectors, min(fetch_k, store.index.ntotal), params=params)
+                for hits, row_distances, row_positions in zip(vector_hits, distances, positions):
+                    hits.extend(
+                        (float(distance), name, int(position))
+                        for distance, position in zip(row_distances, row_positions) if position >= 0
+                    )
+            lexical = list(snapshot.lexical.items())
+
+            results = []
+            for query, hits in zip(queries, vector_hits):
+                hits.sort()
+                keyword_hits = bm25_search(lexical, query, fetch_k, masks=masks)
+                fused: Dict[Tuple[str, int], float] = {}
+                for rank, (_, name, position) in enumerate(hits[:fetch_k]):
+                    fused[(name, position)] = fused.get((name, position), 0.0) + 1.0 / (rrf_k + rank + 1)
+                for rank, (name, position, _) in enumerate(keyword_hits):
+                    fused[(name, position)] = fused.get((name, position), 0.0) + 1.0 / (rrf_k + rank + 1)
+                # sorted() is stable, so ties keep vector order
+                best = sorted(fused.items(), key=lambda item: -item[1])[:k]
+                results.append([(self._resolve(stores[name], position), score) for (name, position), score in best])
+            return results
+
+    @staticmethod
+    def _resolve(store: FAISS, position: int) -> Document:
+        return store.docstore.search(store.index_to_docstore_id[position])
+
+    def as_retriever(self, k: int = 3) -> "SegmentedRetriever":
+        return SegmentedRetriever(index=self, k=k)
+
+    def as_hybrid_retriever(self, k: int = 3, fetch_k: int = HYBRID_FETCH_K) -> "HybridRetriever":
+        return HybridRetriever(index=self, k=k, fetch_k=fetch_k)
+
+    def writer(self) -> "SegmentWriter":
+        return SegmentWriter(self)
+
+    # ---- writing ----
+
+    def _write_segment(self, texts: List[str], vectors, metadatas: List[dict]) -> str:
+        store = build_store(self.embeddings, texts, vectors, metadatas, self.index_type)
+        name = os.path.join(SEGMENTS_DIR, f"seg_{time.time_ns()}")
+        path = self._segment_path(name)
+        store.save_local(path)
+        np.save(os.path.join(path, VECTORS_FILE), np.asarray(vectors, dtype=np.float32))
+        BM25Segment.from_texts(texts).save(os.path.join(path, LEXICAL_FILE))
+        FacetBitmaps.from_metadatas(metadatas).save(os.path.join(path, FACETS_FILE))
+        return name
+
+    def _segment_contents(self, name: str, store: FAISS):
+        #Documents and raw vectors of a segment, in index order
+        ids = [store.index_to_docstore_id[i] for i in range(store.index.ntotal)]
+        docs = [store.docstore.search(doc_id) for doc_id in ids]
+        vectors_path = os.path.join(self._segment_path(name), VECTORS_FILE)
+        if os.path.exists(vectors_path):
+            vectors = np.load(vectors_path, mmap_mode="r")
+        else:
+            # Segments written before vectors.npy existed are flat, so this is exact
+            vectors = store.index.reconstruct_n(0, store.index.ntotal)
+        return docs, vectors
+
+    def add_segment(self, texts: List[str], vectors: List[List[float]], metadatas: List[dict]) -> Optional[str]:
+        #Persist one new segment and append it to the manifest
+        if not texts:
+            return None
+        name = self._write_segment(texts, vectors, metadatas)
+        with self._write_lock:
+            manifest = read_manifest(self.root)
+            manifest["segments"] = list(manifest["segments"]) + [name]
+            manifest["sizes"] = {**manifest.get("sizes", {}), name: len(texts)}
+            manifest["generation"] = manifest["generation"] + 1
+            write_manifest(self.root, manifest)
+        logger.info(f"Wrote segment {name} with {len(texts)} vector(s)")
+        return name
+
+    def compact(self, max_segments: int = COMPACT_MAX_SEGMENTS) -> Optional[str]:
+        #Merge the smallest segments until at most max_segments remain
+        manifest = read_manifest(self.root)
+        names = list(manifest["segments"])
+        if len(names) <= max_segments:
+            self._remove_retired()
+            return None
+
+        # Pick from the recorded sizes; only the segments being merged are loaded
+        sizes = {name: self._segment_size(manifest, name) for name in names}
+        by_size = sorted(names, key=lambda name: sizes[name])
+        to_merge = by_size[:len(names) - max_segments + 1]
+        stores = {name: self._load_segment(name, mmap=True) for name in to_merge}
+
+        # Rebuild from raw vectors: the merged segment may be large enough for
+        # an ANN index even if its inputs were flat
+        texts, metadatas, vectors = [], [], []
+        for name in to_merge:
+            docs, segment_vectors = self._segment_contents(name, stores[name])
+            texts.extend(doc.page_content for doc in docs)
+            metadatas.extend(doc.metadata for doc in docs)
+            vectors.append(np.asarray(segment_vectors, dtype=np.float32))
+        merged_name = self._write_segment(texts, np.vstack(vectors), metadatas)
+
+        with self._write_lock:
+            # Re-read: segments may have been appended while merging
+            manifest = read_manifest(self.root)
+            remaining = [name for name in manifest["segments"] if name not in to_merge]
+            manifest["segments"] = [merged_name] + remaining
+            known_sizes = {**manifest.get("sizes", {}), **sizes}
+            manifest["sizes"] = {name: known_sizes[name] for name in remaining if name in known_sizes}
+            manifest["sizes"][merged_name] = len(texts)
+            manifest["generation"] = manifest["generation"] + 1
+            retired = dict(manifest.get("retired", {}))
+            for name in to_merge:
+                if name != LEGACY_SEGMENT:
+                    retired[name] = time.time()
+            manifest["retired"] = retired
+            write_manifest(self.root, manifest)
+        logger.info(f"Compacted {len(to_merge)} segment(s) into {merged_name}")
+        self._remove_retired()
+        return merged_name
+
+    def _remove_retired(self):
+        #Delete merged-away segments once their grace period has passed
+        with self._write_lock:
+            manifest = read_manifest(self.root)
+            retired = dict(manifest.get("retired", {}))
+            now = time.time()
+            expired = [name for name, retired_at in retired.items() if now - retired_at >= COMPACT_GRACE_SECONDS]
+            if not expired:
+                return
+            for name in expired:
+                shutil.rmtree(self._segment_path(name), ignore_errors=True)
+                del retired[name]
+            manifest["retired"] = retired
+            write_manifest(self.root, manifest)
+
+    def start_compactor(self, interval: float = COMPACT_INTERVAL_SECONDS) -> threading.Thread:
+        #Background thread that periodically merges small segments
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.compact()
+                except Exception as e:
+                    logger.error(f"Segment compaction failed: {e}")
+
+        thread = threading.Thread(target=run, name="faiss-compactor", daemon=True)
+        thread.start()
+        return thread
+
+
+class SegmentWriter:
+
+    #Buffers embedded chunks for one ingestion and flushes them as a segment
+    def __init__(self, index: SegmentedIndex):
+        self.index = index
+        self.texts: List[str] = []
+        self.vectors: List[List[float]] = []
+        self.metadatas: List[dict] = []
+
+    def add(self, texts: List[str], vectors: List[List[float]], metadatas: List[dict]):
+        self.texts.extend(texts)
+        self.vectors.extend(vectors)
+        self.metadatas.extend(metadatas)
+
+    def flush(self) -> Optional[str]:
+        name = self.index.add_segment(self.texts, self.vectors, self.metadatas)
+        self.texts, self.vectors, self.metadatas = [], [], []
+        return name
+
+
+class SegmentedRetriever(BaseRetriever):
+
+    #LangChain retriever over a SegmentedIndex, usable directly in retrieval chains
+    index: SegmentedIndex
+    k: int = 3
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        embedding = self.index.embeddings.embed_query(query)
+        return [doc for doc, _ in self.index.similarity_search_with_score_by_vector(embedding, self.k)]
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        embedding = await self.index.embeddings.aembed_query(query)
+        results = await asyncio.to_thread(self.index.similarity_search_with_score_by_vector, embedding, self.k)
+        return [doc for doc, _ in results]
+
+
+class HybridRetriever(BaseRetriever):
+
+    #Vector + BM25 retriever fused by reciprocal rank; exact ingredient names
+    #match lexically even when the embedding ranks them low. filters can be set
+    #per request through configurable_fields (see chef_back).
+    index: SegmentedIndex
+    k: int = 3
+    fetch_k: int = HYBRID_FETCH_K
+    filters: Optional[Dict[str, List[str]]] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        embedding = self.index.embeddings.embed_query(query)
+        results = self.index.hybrid_search(query, embedding, self.k, self.fetch_k, filters=self.filters)
+        return [doc for doc, _ in results]
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        embedding = await self.index.embeddings.aembed_query(query)
+        results = await asyncio.to_thread(
+            self.index.hybrid_search, query, embedding, self.k, self.fetch_k, filters=self.filters
+        )
+        return [doc for doc, _ in results]
@@ -0,0 +1,151 @@
+#Semantic response cache: reuse answers for near-duplicate queries.
+
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("semantic_cache")
+
+DEFAULT_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "1024"))
+DEFAULT_TTL = float(os.environ.get("SEMANTIC_CACHE_TTL", "3600"))
+
+
+class _Entry:
+    __slots__ = ("namespace", "query", "value", "slot", "created")
+
+    def __init__(self, namespace: str, query: str, value: Any, slot: int, created: float):
+        self.namespace = namespace
+        self.query = query
+        self.value = value
+        self.slot = slot
+        self.created = created
+
+
+class SemanticCache:
+
+    #Caches responses keyed on the query embedding. Vectors live in a fixed
+    #(max_entries, dim) float32 matrix, so a lookup is one matrix-vector product;
+    #an OrderedDict over the slots gives LRU order. Entries are namespaced (one per
+    #chain) so a "direct" answer is never served for a "full" request.
+    def __init__(
+        self,
+        embeddings,
+        threshold: float = DEFAULT_THRESHOLD,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._free: List[int] = list(range(max_entries - 1, -1, -1))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, slot: int):
+        self._entries.pop(slot, None)
+        self._valid[slot] = False
+        self._free.append(slot)
+
+    def _expire(self, now: float):
+        # Entries are in LRU order, not insertion order, so scan them all
+        expired = [slot for slot, entry in self._entries.items() if now - entry.created > self.ttl]
+        for slot in expired:
+            self._remove(slot)
+        self.expirations += len(expired)
+
+    def lookup_vector(self, namespace: str, vector) -> Optional[Any]:
+        #Return the cached value of the most similar query above the threshold
+        query = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            if self._vectors is not None and self._entries:
+                scores = self._vectors @ query
+                scores[~self._valid] = -np.inf
+                for slot in np.argsort(scores)[::-1]:
+                    if scores[slot] < self.threshold:
+                        break
+                    entry = self._entries[int(slot)]
+                    if entry.namespace != namespace:
+                        continue
+                    if now - entry.created > self.ttl:
+                        self._remove(entry.slot)
+                        self.expirations += 1
+                        continue
+                    self._entries.move_to_end(entry.slot)
+                    self.hits += 1
+                    return entry.value
+            self.misses += 1
+            return None
+
+    def put_vector(self, namespace: str, query: str, vector, value: Any):
+        vector = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            if not self._free:
+                self._expire(now)
+            if not self._free:
+                # Evict the least recently used entry
+                slot, _ = self._entries.popitem(last=False)
+                self._valid[slot] = False
+                self._free.append(slot)
+                self.evictions += 1
+            slot = self._free.pop()
+            self._vectors[slot] = vector
+            self._valid[slot] = True
+            self._entries[slot] = _Entry(namespace, query, value, slot, now)
+
+    async def alookup(self, namespace: str, query: str) -> Tuple[Optional[Any], List[float]]:
+        #Embed the query and look it up; the embedding is returned for a later aput
+        vector = await self.embeddings.aembed_query(query)
+        return self.lookup_vector(namespace, vector), vector
+
+    async def aput(self, namespace: str, query: str, value: Any, vector=None):
+        if vector is None:
+            vector = await self.embeddings.aembed_query(query)
+        self.put_vector(namespace, query, vector, value)
+
+    def clear(self):
+        #Drop every entry, e.g. when the underlying corpus changes
+        with self._lock:
+            self._entries.clear()
+            self._valid[:] = False
+            self._free = list(range(self.max_entries - 1, -1, -1))
+            self.invalidations += 1
+        logger.info("Semantic cache invalidated")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,47 @@
+#Tests for the verified-token cache in auth.
+#
+#Run from backend/rag_dev:  python -m pytest tests/unit
+
+import asyncio
+import time
+
+import pytest
+
+import auth
+
+
+@pytest.fixture
+def verified_token(monkeypatch):
+    #A token that verifies locally, carries no profile claims and expires in an hour
+    exp = time.time() + 3600
+    calls = []
+
+    async def verify_token_locally(token):
+        return {"sub": "auth0|alice", "exp": exp}
+
+    async def fetch_userinfo(token):
+        calls.append(token)
+        return responses.pop(0)
+
+    responses = []
+    monkeypatch.setattr(auth, "verify_token_locally", verify_token_locally)
+    monkeypatch.setattr(auth, "fetch_userinfo", fetch_userinfo)
+    monkeypatch.setattr(auth, "_token_cache", type(auth._token_cache)())
+    return responses, calls, exp
+
+
+def test_failed_userinfo_is_cached_only_briefly(verified_token):
+    responses, calls, exp = verified_token
+    responses.append(None)
+    user = asyncio.run(auth.get_user(None, "token"))
+    assert user.email is None
+    _, expires_at = auth._token_cache[auth._token_key("token")]
+    assert expires_at <= time.time() + auth.USERINFO_RETRY_TTL < exp
+
+    # Once the short entry lapses the profile is fetched again
+    auth._token_cache[auth._token_key("token")] = (user, time.time() - 1)
+    responses.append({"sub": "auth0|alice", "email": "alice@example.com", "name": "Alice"})
+    user = asyncio.run(auth.get_user(None, "token"))
+    assert user.email == "alice@example.com"
+    assert len(calls) == 2
+    assert auth._token_cache[auth._token_key("token")][1] == exp
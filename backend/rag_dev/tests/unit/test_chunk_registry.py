@@ -0,0 +1,57 @@
+#Tests for exact and near-duplicate chunk skipping.
+#
+#Run from backend/rag_dev:  python -m pytest tests/unit
+
+import random
+
+from langchain_core.documents import Document
+
+from chunk_registry import MINHASH_BANDS, ChunkRegistry
+
+WORDS = [f"word{i}" for i in range(2000)]
+
+
+def chunk(words):
+    return Document(page_content=" ".join(words))
+
+
+def test_near_duplicates_within_a_pass_are_found_through_band_buckets():
+    rng = random.Random(0)
+    registry = ChunkRegistry(":memory:", mode="minhash")
+    chunk_filter = registry.file_filter()
+    originals = [rng.choices(WORDS, k=200) for _ in range(50)]
+    assert len(chunk_filter([chunk(words) for words in originals])) == 50
+
+    # One word changed at the end of each: near-duplicates of their original
+    edited = [words[:-1] + ["changed"] for words in originals[:10]]
+    assert chunk_filter([chunk(words) for words in edited]) == []
+    assert chunk_filter.counts == {"exact": 0, "near": 10}
+    # Every kept chunk sits in one bucket per band
+    assert sum(len(bucket) for bucket in chunk_filter.buckets.values()) == 50 * MINHASH_BANDS
+
+
+def test_registered_chunks_are_skipped_in_later_passes():
+    registry = ChunkRegistry(":memory:", mode="minhash")
+    words = random.Random(1).choices(WORDS, k=200)
+    registry.register([" ".join(words)], "book.pdf")
+
+    kept, counts = registry.filter_new([chunk(words), chunk(words[:-1] + ["changed"])])
+    assert kept == []
+    assert counts == {"exact": 1, "near": 1}
+
+
+def test_prune_keeps_only_unregistered_chunks_in_memory():
+    rng = random.Random(2)
+    registry = ChunkRegistry(":memory:", mode="minhash")
+    chunk_filter = registry.file_filter()
+    flushed, in_flight = ([rng.choices(WORDS, k=200) for _ in range(20)] for _ in range(2))
+    chunk_filter([chunk(words) for words in flushed + in_flight])
+
+    chunk_filter.prune(registry.register([" ".join(words) for words in flushed], "book.pdf"))
+    assert len(chunk_filter.seen) == 20
+    assert sum(len(bucket) for bucket in chunk_filter.buckets.values()) == 20 * MINHASH_BANDS
+
+    # Pruned chunks are still caught by the registry, unflushed ones by the filter
+    repeats = [chunk(words) for words in flushed[:3] + in_flight[:3]]
+    assert chunk_filter(repeats) == []
+    assert chunk_filter.counts == {"exact": 6, "near": 0}
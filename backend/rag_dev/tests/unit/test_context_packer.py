@@ -0,0 +1,65 @@
+#Tests for token-budgeted context packing.
+#
+#Run from backend/rag_dev:  python -m pytest tests/unit
+
+from langchain_core.documents import Document
+
+from context_packer import ContextPacker
+
+CHUNK_CHARS = 1000  # split_and_chunk's chunk_size
+
+
+def full_chunk(source):
+    sentences = []
+    step = 0
+    while len(" ".join(sentences)) < CHUNK_CHARS - 60:
+        sentences.append(f"Step {step} for {source}: stir the sauce and simmer it gently.")
+        step += 1
+    return Document(page_content=" ".join(sentences), metadata={"source": source})
+
+
+def test_default_budget_keeps_three_full_chunks():
+    docs = [full_chunk(f"book-{i}.pdf") for i in range(3)]
+    assert all(len(doc.page_content) > CHUNK_CHARS - 60 for doc in docs)
+
+    result = ContextPacker().pack("tomato sauce", docs)
+    assert [doc.page_content for doc in result["context"]] == [doc.page_content for doc in docs]
+    assert result["packing"]["sentences_dropped"] == 0
+
+
+def test_small_budget_keeps_the_most_relevant_sentences():
+    docs = [
+        Document(page_content="Whisk the eggs. Fold in the basil.", metadata={"source": "a"}),
+        Document(page_content="Oil the pan. Sear the tomato slices.", metadata={"source": "b"}),
+    ]
+    result = ContextPacker(token_budget=14).pack("tomato basil", docs)
+    packed = " ".join(doc.page_content for doc in result["context"])
+    assert "basil" in packed and "tomato" in packed
+    assert "Whisk" not in packed and "Oil" not in packed
+
+
+def test_shared_ingredient_lines_are_kept_in_every_recipe():
+    pancakes = "Pancakes.\n2 eggs.\n1 cup milk.\nSalt to taste.\nWhisk and fry."
+    omelette = "Omelette.\n2 eggs.\n1 cup milk.\nSalt to taste.\nBeat and cook."
+    for sources in (("a.pdf", "b.pdf"), ("book.pdf", "book.pdf")):
+        docs = [Document(page_content=text, metadata={"source": source}) for text, source in zip((pancakes, omelette), sources)]
+        result = ContextPacker().pack("omelette eggs", docs)
+        assert [doc.page_content for doc in result["context"]] == [
+            "Pancakes.\n2 eggs.\n1 cup milk.\nSalt to taste.\nWhisk and fry.",
+            "Omelette.\n2 eggs.\n1 cup milk.\nSalt to taste.\nBeat and cook.",
+        ]
+        assert result["packing"]["duplicate_sentences"] == 0
+
+
+def test_long_sentence_repeated_within_a_source_is_dropped():
+    note = "All recipes in this chapter serve four people unless noted otherwise."
+    docs = [
+        Document(page_content=f"{note} Pancakes need eggs.", metadata={"source": "book.pdf"}),
+        Document(page_content=f"Omelettes need eggs. {note} Fold gently.", metadata={"source": "book.pdf"}),
+        Document(page_content=f"{note} Crepes need eggs.", metadata={"source": "other.pdf"}),
+    ]
+    result = ContextPacker().pack("eggs", docs)
+    assert [doc.page_content for doc in result["context"]] == [
+        f"{note} Pancakes need eggs.", "Omelettes need eggs. Fold gently.", f"{note} Crepes need eggs.",
+    ]
+    assert result["packing"]["duplicate_sentences"] == 1
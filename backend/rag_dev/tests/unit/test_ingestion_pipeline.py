@@ -0,0 +1,103 @@
+#Tests for checkpointed embedding and resuming interrupted files.
+#
+#Run from backend/rag_dev:  python -m pytest tests/unit
+
+import os
+import json
+import shutil
+
+from langchain_core.documents import Document
+
+from ingestion_pipeline import EmbeddingPipeline, file_fingerprint
+
+
+class FlakyEmbeddings:
+    #Fails every call from fail_at on, like a provider outage mid-file
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.fail_at is not None and self.calls >= self.fail_at:
+            raise RuntimeError("provider down")
+        return [[float(len(text))] for text in texts]
+
+
+def make_pipeline(embeddings, checkpoint_dir):
+    return EmbeddingPipeline(
+        embeddings, batch_size=2, max_workers=1, max_retries=0, backoff_seconds=0,
+        checkpoint_every=1, checkpoint_dir=str(checkpoint_dir),
+    )
+
+
+def run(pipeline, file_path, chunks):
+    added = []
+    report = pipeline.run(file_path, chunks, lambda texts, vectors, metadatas: added.extend(texts), lambda: None)
+    return report, added
+
+
+def test_fingerprint_follows_content_not_path_or_mtime(tmp_path):
+    original = tmp_path / "book.csv"
+    original.write_text("name\ntoast\n")
+    fingerprint = file_fingerprint(str(original))
+
+    (tmp_path / "incoming").mkdir()
+    copy = tmp_path / "incoming" / "book.csv"
+    shutil.copy(original, copy)
+    os.utime(copy, (0, 0))
+    assert file_fingerprint(str(copy)) == fingerprint
+
+    copy.write_text("name\nsoup\n")
+    assert file_fingerprint(str(copy)) != fingerprint
+
+
+def test_interrupted_file_is_found_and_resumed_after_a_recopy(tmp_path):
+    folder, checkpoints = tmp_path / "csv_cookbooks", tmp_path / "checkpoints"
+    folder.mkdir()
+    file_path = folder / "book.csv"
+    file_path.write_text("rows\n" * 10)
+    chunks = [Document(page_content=f"chunk {i}") for i in range(10)]
+
+    report, added = run(make_pipeline(FlakyEmbeddings(fail_at=3), checkpoints), str(file_path), chunks)
+    assert "error" in report and added == ["chunk 0", "chunk 1", "chunk 2", "chunk 3"]
+
+    # The file is dropped in again (new mtime), then the service restarts
+    shutil.copy(file_path, tmp_path / "book.csv")
+    os.remove(file_path)
+    shutil.move(str(tmp_path / "book.csv"), str(file_path))
+    os.utime(file_path, None)
+    pipeline = make_pipeline(FlakyEmbeddings(), checkpoints)
+    assert pipeline.interrupted_files([str(folder), str(tmp_path / "missing")], (".pdf", ".csv")) == [str(file_path)]
+
+    report, added = run(pipeline, str(file_path), chunks)
+    assert report["resumed_from"] == 4
+    assert added == [f"chunk {i}" for i in range(4, 10)]
+    assert pipeline.interrupted_files([str(folder)], (".csv",)) == []
+
+
+def test_csv_resumes_at_its_row_after_a_restart(tmp_path):
+    from csv_streaming import CSVChunkStream
+
+    folder, checkpoints = tmp_path / "csv_cookbooks", tmp_path / "checkpoints"
+    folder.mkdir()
+    file_path = folder / "dump.csv"
+    rows = "".join(f"Recipe {i}\tStep one for {i}. Step two for {i}.\n" for i in range(40))
+    file_path.write_text("name\tinstructions\n" + rows)
+
+    def stream():
+        return CSVChunkStream(str(file_path), csv_args={"delimiter": "\t"}, batch_rows=8)
+
+    everything = [chunk.page_content for chunk in stream()]
+    report, first = run(make_pipeline(FlakyEmbeddings(fail_at=6), checkpoints), str(file_path), stream())
+    assert "error" in report and first == everything[:10]
+    (checkpoint,) = checkpoints.iterdir()
+    assert json.loads(checkpoint.read_text())["position"]["byte_offset"] > 0
+
+    # Dropped in again with a new mtime; the restart scan finds it and the stream seeks to the row
+    os.utime(file_path, None)
+    pipeline = make_pipeline(FlakyEmbeddings(), checkpoints)
+    assert pipeline.interrupted_files([str(folder)], (".csv",)) == [str(file_path)]
+    report, rest = run(pipeline, str(file_path), stream())
+    assert report["resumed_from"] == 10
+    assert rest == everything[10:]
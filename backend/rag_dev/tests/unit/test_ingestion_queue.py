@@ -0,0 +1,93 @@
+#Tests for the single-writer ingestion queue.
+#
+#Run from backend/rag_dev:  python -m pytest tests/unit
+
+import threading
+
+from ingestion_queue import IngestionQueue
+
+
+def make_queue(batches, failing=(), **kwargs):
+    def ingest(paths):
+        batches.append(list(paths))
+        return True, [path for path in paths if path in failing]
+
+    reloads = []
+    queue = IngestionQueue(ingest, lambda: reloads.append(1), **kwargs)
+    return queue, reloads
+
+
+def test_stop_drains_pending_files_in_capped_batches():
+    batches = []
+    # A long quiet period keeps everything pending until stop()
+    queue, reloads = make_queue(batches, coalesce_seconds=60, max_batch_files=2, debounce_seconds=60)
+    for i in range(5):
+        queue.submit(f"file_{i}.pdf")
+    queue.start()
+    queue.stop(timeout=5)
+
+    assert not queue._thread.is_alive()
+    assert batches == [["file_0.pdf", "file_1.pdf"], ["file_2.pdf", "file_3.pdf"], ["file_4.pdf"]]
+    stats = queue.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["in_progress"] == 0
+    assert stats["files_ingested"] == 5
+    assert stats["commits"] == 3
+    # The pending reload is sent on the way out
+    assert reloads == [1]
+
+
+def test_stop_with_nothing_pending_exits():
+    batches = []
+    queue, reloads = make_queue(batches, coalesce_seconds=60)
+    queue.start()
+    queue.stop(timeout=5)
+
+    assert not queue._thread.is_alive()
+    assert batches == []
+    assert reloads == []
+
+
+def test_duplicate_submits_are_coalesced():
+    batches = []
+    done = threading.Event()
+    queue, _ = make_queue(batches, coalesce_seconds=0.05, debounce_seconds=0)
+    queue.notify = done.set
+    assert queue.submit("a.pdf")
+    assert not queue.submit("a.pdf")
+    queue.start()
+    assert done.wait(5)
+    queue.stop(timeout=5)
+
+    assert batches == [["a.pdf"]]
+    assert queue.stats()["duplicates_coalesced"] == 1
+
+
+def test_failed_files_are_counted_as_failed():
+    batches = []
+    queue, _ = make_queue(batches, failing={"bad.csv"}, coalesce_seconds=60, max_batch_files=2)
+    for path in ("good.pdf", "bad.csv", "other.pdf"):
+        queue.submit(path)
+    queue.start()
+    queue.stop(timeout=5)
+
+    stats = queue.stats()
+    assert stats["files_ingested"] == 2
+    assert stats["files_failed"] == 1
+    assert stats["last_pass"]["failed"] == 0
+
+
+def test_a_raising_pass_fails_every_file_in_it():
+    def ingest(paths):
+        raise RuntimeError("index writer crashed")
+
+    queue = IngestionQueue(ingest, lambda: None, coalesce_seconds=60)
+    queue.submit("a.pdf")
+    queue.submit("b.pdf")
+    queue.start()
+    queue.stop(timeout=5)
+
+    stats = queue.stats()
+    assert stats["files_ingested"] == 0
+    assert stats["files_failed"] == 2
+    assert stats["last_pass"]["committed"] is False
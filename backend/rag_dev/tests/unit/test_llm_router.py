@@ -0,0 +1,77 @@
+#Tests for the LLM router's per-provider limits and circuit breakers.
+#
+#Run from backend/rag_dev:  python -m pytest tests/unit
+
+import asyncio
+import random
+import time
+
+import pytest
+
+from llm_limiter import ConcurrencyLimiter, LimiterOverloaded
+from llm_router import HALF_OPEN, OPEN, LLMRouter
+
+
+class SlowModel:
+    #Stands in for a chat model; the router only hands it to the call
+    def __init__(self, name, delay, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+
+def make_router(models, max_concurrency=1, mode="queue", **kwargs):
+    limiters = {name: ConcurrencyLimiter(name, max_concurrency=max_concurrency, mode=mode) for name in models}
+    peak = {name: 0 for name in models}
+
+    async def call(model):
+        model.calls += 1
+        peak[model.name] = max(peak[model.name], limiters[model.name].in_flight)
+        await asyncio.sleep(model.delay)
+        if model.fail:
+            raise RuntimeError(f"{model.name} failed")
+        return model.name
+
+    router = LLMRouter(models, limiter=limiters.__getitem__, rng=random.Random(0), **kwargs)
+    return router, call, limiters, peak
+
+
+def test_hedges_and_fallbacks_hold_their_own_provider_slot():
+    async def scenario():
+        models = {"a": SlowModel("a", 0.05), "b": SlowModel("b", 0.01)}
+        router, call, limiters, peak = make_router(models, default_hedge_delay=0.01, max_hedges=1)
+        results = await asyncio.gather(*(router.arun("full", call) for _ in range(6)))
+        assert set(results) <= {"a", "b"}
+        assert router.hedged > 0
+        # Every attempt, hedges included, went through its provider's limiter of one slot
+        assert peak == {"a": 1, "b": 1}
+        assert all(limiter.completed == model.calls for limiter, model in zip(limiters.values(), models.values()))
+
+    asyncio.run(scenario())
+
+
+def test_overloaded_provider_falls_through_to_the_next():
+    async def scenario():
+        models = {"a": SlowModel("a", 0.05), "b": SlowModel("b", 0.01)}
+        router, call, limiters, _ = make_router(models, mode="reject", max_hedges=0)
+        results = await asyncio.gather(*(router.arun("full", call) for _ in range(2)))
+        assert sorted(results) == ["a", "b"]
+        with pytest.raises(LimiterOverloaded):
+            await asyncio.gather(*(router.arun("full", call) for _ in range(3)))
+
+    asyncio.run(scenario())
+
+
+def test_half_open_breaker_admits_a_single_probe():
+    async def scenario():
+        models = {"a": SlowModel("a", 0.05)}
+        router, call, _, _ = make_router(models, max_concurrency=8, max_hedges=0)
+        health = router.health["a"]
+        health.state, health.opened_at = OPEN, time.time() - health.cooldown - 1
+        outcomes = await asyncio.gather(*(router.arun("full", call) for _ in range(5)), return_exceptions=True)
+        assert models["a"].calls == 1
+        assert outcomes.count("a") == 1
+        assert health.state != HALF_OPEN
+
+    asyncio.run(scenario())
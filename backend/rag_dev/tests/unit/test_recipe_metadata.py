@@ -0,0 +1,47 @@
+#Tests for the chunk metadata classifier and the bitmap pre-filters it feeds.
+#
+#Run from backend/rag_dev:  python -m pytest tests/unit
+
+from recipe_metadata import FacetBitmaps, build_filters, classify_text
+
+TEXTS = [
+    "Tom roasted the chicken with rosemary and garlic.",
+    "Grandma's apple pie: bake with sugar and serve with ice cream.",
+    "Chicken wrap with a yogurt dip.",
+    "Keto gluten-free lemon cheesecake with almond flour.",
+    "Tom yum soup with lemongrass and lime.",
+]
+
+
+def allowed(texts, **request):
+    filters = build_filters(request.get("meal_type", ""), request.get("cuisine", ""), request.get("diet", ""), None)
+    bitmaps = FacetBitmaps.from_metadatas([classify_text(text) for text in texts])
+    return [texts[position] for position in bitmaps.positions(bitmaps.mask(filters))]
+
+
+def test_ambiguous_words_do_not_assign_cuisine_or_meal():
+    assert "cuisine" not in classify_text(TEXTS[0])
+    assert "meal_type" not in classify_text(TEXTS[2])
+    assert classify_text(TEXTS[4])["cuisine"] == "thai"
+
+
+def test_diets_need_a_label():
+    pie, wrap, cheesecake = (classify_text(text) for text in TEXTS[1:4])
+    assert pie["diets"] == [] and wrap["diets"] == []
+    assert "gluten-free" in pie["diets_unknown"] and "keto" not in pie["diets_unknown"]
+    assert cheesecake["diets"] == ["gluten-free", "keto", "low-carb"]
+
+
+def test_diet_filter_keeps_labelled_and_undecided_chunks_only():
+    # The pie's sugar rules keto out; nothing in the others does
+    assert allowed(TEXTS, diet="keto") == [TEXTS[0], TEXTS[2], TEXTS[3], TEXTS[4]]
+    assert allowed(TEXTS, diet="vegetarian") == [TEXTS[1], TEXTS[3], TEXTS[4]]
+    assert allowed(TEXTS, cuisine="italian") == [TEXTS[0], TEXTS[1], TEXTS[2], TEXTS[3]]
+
+
+def test_bitmaps_round_trip(tmp_path):
+    bitmaps = FacetBitmaps.from_metadatas([classify_text(text) for text in TEXTS])
+    bitmaps.save(str(tmp_path / "facets.npz"))
+    loaded = FacetBitmaps.load(str(tmp_path / "facets.npz"))
+    filters = build_filters("", "", "gluten-free", None)
+    assert list(loaded.positions(loaded.mask(filters))) == list(bitmaps.positions(bitmaps.mask(filters)))
@@ -0,0 +1,58 @@
+#Tests for the indexed file-based recipe store.
+#
+#Run from backend/rag_dev:  python -m pytest tests/unit
+
+import pytest
+
+from database import recipe_storage
+from database.models import Recipe
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(recipe_storage, "USER_RECIPES_DIR", tmp_path)
+    recipe_storage._index_cache.clear()
+    return recipe_storage
+
+
+def save(store, name, user_id="auth0|alice", **kwargs):
+    return store.save_recipe(Recipe(name, ["egg"], ["cook it"], user_id=user_id, **kwargs))
+
+
+def test_toggle_shared_and_community_listing(store):
+    toast = save(store, "Toast", saved_date="2024-01-01")
+    soup = save(store, "Soup", user_id="auth0|bob", saved_date="2024-02-01")
+    save(store, "Salad")
+
+    assert store.get_shared_recipes() == []
+    assert store.toggle_shared("auth0|alice", toast.id, True).is_shared
+    assert store.toggle_shared("auth0|bob", soup.id, True).is_shared
+    assert store.toggle_shared("auth0|alice", "missing", True) is None
+
+    assert [r.recipe_name for r in store.get_shared_recipes()] == ["Soup", "Toast"]
+    store.toggle_shared("auth0|bob", soup.id, False)
+    assert [r.recipe_name for r in store.get_shared_recipes()] == ["Toast"]
+
+
+def test_index_is_rebuilt_when_missing(store):
+    toast = save(store, "Toast")
+    user_dir = store.get_user_directory("auth0|alice")
+    (user_dir / store.INDEX_FILENAME).unlink()
+    store._index_cache.clear()
+
+    assert store.get_recipe_by_id("auth0|alice", toast.id).recipe_name == "Toast"
+    assert (user_dir / store.INDEX_FILENAME).exists()
+
+
+def test_summaries_are_served_through_the_registry(store):
+    from database import storage_factory
+    save(store, "Toast", saved_date="2024-01-01")
+    soup = save(store, "Soup", saved_date="2024-02-01", is_favorite=True)
+
+    with storage_factory.use_storage(storage_factory.ModuleStorage("file", store)):
+        summaries = storage_factory.get_user_recipe_summaries("auth0|alice")
+    assert [s["recipe_name"] for s in summaries] == ["Soup", "Toast"]
+    assert summaries[0] == {
+        "id": soup.id, "recipe_name": "Soup", "is_favorite": True,
+        "saved_date": "2024-02-01", "is_shared": False,
+    }
@@ -0,0 +1,36 @@
+#Tests for the incremental recipe stream parser.
+#
+#Run from backend/rag_dev:  python -m pytest tests/unit
+
+from recipe_streaming import RecipeStreamParser
+
+RECIPE_TEXT = (
+    '{"recipe_name": "Toast", "ingredients": ["bread", "butter"], '
+    '"instructions": ["toast", "spread"], "cooking_tips": ["serve warm"]}'
+)
+
+
+def feed_in_chunks(parser, text, size=7):
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return events
+
+
+def test_fields_stream_as_events():
+    parser = RecipeStreamParser()
+    events = feed_in_chunks(parser, RECIPE_TEXT)
+    assert events[0] == ("recipe_name", {"value": "Toast"})
+    assert ("ingredient", {"index": 1, "value": "butter"}) in events
+    assert parser.recipe().cooking_tips == ["serve warm"]
+
+
+def test_invalid_scalar_is_skipped_and_left_to_repair():
+    # Python-style True is not JSON; the stream must carry on rather than raise
+    text = RECIPE_TEXT[:-1] + ', "vegetarian": True, "serves": 2}'
+    parser = RecipeStreamParser()
+    events = feed_in_chunks(parser, text)
+    assert ("vegetarian", {"value": True}) not in events
+    assert ("serves", {"value": 2}) in events
+    assert parser._parser.malformed
+    assert parser.recipe().recipe_name == "Toast"